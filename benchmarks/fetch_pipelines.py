@@ -0,0 +1,145 @@
+"""
+Load test the download pipelines of the backends against the stand-in server.
+
+A local StandinServer plays the part of every results site, with the given
+latency, page size and error rate, and each backend is run over the given
+date range through real sockets.  The wall time and the number of requests
+for each backend are written out as JSON, so that different numbers of jobs
+and connection pool sizes can be compared.
+
+Usage:
+
+    python benchmarks/fetch_pipelines.py [--days N] [--races-per-day N]
+                                         [--finishers N] [--pages N]
+                                         [--latency S] [--error-rate F]
+                                         [--jobs N] [--pool-size N]
+                                         [--json path]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from raceresults.active import ActiveRR  # noqa: E402
+from raceresults.brrr import BestRace  # noqa: E402
+from raceresults.client import HttpClient  # noqa: E402
+from raceresults.crrr import CoolRunning  # noqa: E402
+from raceresults.csrr import CompuScore  # noqa: E402
+from raceresults.nyrr import NewYorkRR  # noqa: E402
+from raceresults.standin import StandinServer  # noqa: E402
+
+MEMBERS = [('Jeff', 'Pellis'), ('Leah', 'Redona'), ('Ann', 'Tomasi')]
+
+
+def backends(args, tdir, client):
+    """
+    Construct each backend, keyed by the name of its console script.
+    """
+    start = datetime.date(2015, 1, 1)
+    stop = start + datetime.timedelta(days=args.days - 1)
+    roster = os.path.join(tdir, 'roster.csv')
+    with open(roster, 'w') as fptr:
+        fptr.write('FName,LName\n')
+        for first, last in MEMBERS:
+            fptr.write('{},{}\n'.format(first, last))
+
+    def output(name):
+        return os.path.join(tdir, name + '.html')
+
+    kwargs = {'membership_list': roster,
+              'membership_cache': os.path.join(tdir, 'cache'),
+              'verbose': 'error', 'http_client': client}
+    return {
+        'crrr': lambda: CoolRunning(start_date=start, stop_date=stop,
+                                    states=['ma'], output_file=output('crrr'),
+                                    jobs=args.jobs, **kwargs),
+        'csrr': lambda: CompuScore(start_date=start, stop_date=stop,
+                                   output_file=output('csrr'), jobs=args.jobs,
+                                   **kwargs),
+        'brrr': lambda: BestRace(start_date=start, stop_date=stop,
+                                 output_file=output('brrr'), **kwargs),
+        'activerr': lambda: ActiveRR(date_range=[start, stop],
+                                     membership_list=roster, states=['NJ'],
+                                     output_file=output('activerr'),
+                                     verbose='error', http_client=client,
+                                     jobs=args.jobs),
+        'nyrr': lambda: NewYorkRR(start_date=start, stop_date=stop,
+                                  team='RARI', output_file=output('nyrr'),
+                                  verbose='error', http_client=client,
+                                  jobs=args.jobs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--days', type=int, default=7,
+                        help='days of races to process, default is 7')
+    parser.add_argument('--races-per-day', type=int, default=4,
+                        help='races listed for each day, default is 4')
+    parser.add_argument('--finishers', type=int, default=2000,
+                        help='finishers in each race, default is 2000')
+    parser.add_argument('--pages', type=int, default=5,
+                        help='pages of Active results per race, default 5')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds before each answer, default is 0.05')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with a 503')
+    parser.add_argument('--jobs', type=int, default=4,
+                        help='downloads in flight per backend, default is 4')
+    parser.add_argument('--pool-size', type=int, default=4,
+                        help='connections kept alive per host, default is 4')
+    parser.add_argument('--json', dest='json_file',
+                        help='write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    server = StandinServer(latency=args.latency, error_rate=args.error_rate,
+                           finishers=args.finishers,
+                           races_per_day=args.races_per_day,
+                           pages=args.pages, members=MEMBERS)
+    with server, tempfile.TemporaryDirectory() as tdir:
+        client = HttpClient(pool_maxsize=args.pool_size)
+        client.session.proxies.update(server.proxies)
+        for name, backend in backends(args, tdir, client).items():
+            requests_before = sum(server.hits.values())
+            start = time.perf_counter()
+            try:
+                backend().run()
+                error = None
+            except Exception as e:
+                error = repr(e)
+            elapsed = time.perf_counter() - start
+            requests = sum(server.hits.values()) - requests_before
+            results[name] = {'wall_s': elapsed, 'requests': requests,
+                             'requests_per_s': requests / elapsed,
+                             'error': error}
+        client.close()
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now().isoformat(),
+        'parameters': vars(args),
+        'benchmarks': results,
+    }
+
+    for name, result in results.items():
+        print('{:10s} {:9.4f} s {:6d} requests {:8.1f}/s{}'.format(
+            name, result['wall_s'], result['requests'],
+            result['requests_per_s'],
+            '' if result['error'] is None else '  ' + result['error']))
+
+    if args.json_file is not None:
+        with open(args.json_file, 'w') as fptr:
+            json.dump(report, fptr, indent=2)
+
+
+if __name__ == '__main__':
+    main()
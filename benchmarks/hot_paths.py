@@ -0,0 +1,254 @@
+"""
+Benchmarks for the matching, parsing and output hot paths.
+
+The CoolRunning fixtures in test/data are scaled up into synthetic result
+pages with many finishers, and matched against a synthetic roster.  Each
+benchmark is run several times and the timings are written out as JSON, so
+that runs from different releases can be compared.
+
+Usage:
+
+    python benchmarks/hot_paths.py [--finishers N] [--members N]
+                                   [--races N] [--repeat N] [--processes N]
+                                   [--json path]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from lxml import etree
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from raceresults.crrr import CoolRunning  # noqa: E402
+from raceresults.csrr import CompuScore  # noqa: E402
+from raceresults.page import RacePage  # noqa: E402
+
+DATA = os.path.join(os.path.dirname(HERE), 'test', 'data')
+
+_SYLLABLES = ['an', 'bel', 'car', 'dan', 'el', 'fra', 'gus', 'hal', 'ing',
+              'jo', 'kel', 'lo', 'mar', 'ni', 'ol', 'pe', 'qui', 'ros',
+              'sam', 'ter', 'ul', 'vin', 'wal', 'xa', 'yor', 'zel']
+
+
+def make_names(count, rng):
+    """
+    Return a list of count distinct synthetic (first, last) names.
+    """
+    names = set()
+    while len(names) < count:
+        first = ''.join(rng.choice(_SYLLABLES)
+                        for _ in range(rng.randint(1, 2)))
+        last = ''.join(rng.choice(_SYLLABLES)
+                       for _ in range(rng.randint(2, 3)))
+        names.add((first.title(), last.title()))
+    return sorted(names)
+
+
+def write_roster(path, names):
+    with open(path, 'w') as fptr:
+        fptr.write('FName,LName\n')
+        for first, last in names:
+            fptr.write('{},{}\n'.format(first, last))
+
+
+def vanilla_page(runners):
+    """
+    Scale up the Landmark School 5K fixture to the given runners.
+    """
+    with open(os.path.join(DATA, 'Oct17_Landma_set1.shtml')) as fptr:
+        markup = fptr.read()
+    head, _, tail = markup.partition('===== === ')
+    head += '===== === =================== == = ======== ===== ======= =====\n'
+    tail = tail[tail.index('</PRE>'):]
+
+    lines = []
+    for place, (first, last) in enumerate(runners, start=1):
+        name = '{} {}'.format(first, last)[:19]
+        lines.append('{:5d} {:3d} {:19s} 31 M   1/5    M3039   17:29  5:38 '
+                     .format(place, place % 1000, name))
+    return head + '\n'.join(lines) + '\n' + tail
+
+
+def ccrr_page(runners):
+    """
+    Synthetic page in the Cape Cod Road Runners table format.
+    """
+    rows = ['<tr><th>Place</th><th>Name</th><th>Time</th></tr>']
+    for place, (first, last) in enumerate(runners, start=1):
+        rows.append('<tr><td>{}</td><td>{} {}</td><td>17:29</td></tr>'
+                    .format(place, first, last))
+    return ('<html><head><meta name="Author" content="CapeCodRoadRunners">'
+            '</head><body><h1>Cape Cod 5K</h1><h2>Falmouth, MA</h2>'
+            '<h3>Saturday</h3><p class="subhead">Results</p><table>'
+            + ''.join(rows) + '</table></body></html>')
+
+
+def compuscore_page(runners):
+    """
+    Synthetic page in the Compuscore format.
+    """
+    lines = []
+    for place, (first, last) in enumerate(runners, start=1):
+        lines.append('{:5d}.{:22s} North Plainfiel,NJ 53 M U  17:29'
+                     .format(place, '{} {}'.format(first, last)))
+    return ('<html><body><h2>CJRRC HANGOVER 5K RUN</h2><h3>Jan 1</h3>'
+            '<strong><a name="overall">CJRRC HANGOVER 5K RUN</a></strong>'
+            '<pre><strong>Overall</strong>\n<strong>Place Name</strong>\n'
+            '<strong>===== ====</strong>\n'
+            + '\n'.join(lines) + '\n</pre></body></html>')
+
+
+def timeit(func, repeat):
+    """
+    Run func repeat times, returning the timings in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings, **extra):
+    result = {'min_s': min(timings),
+              'median_s': statistics.median(timings),
+              'max_s': max(timings),
+              'runs': len(timings)}
+    result.update(extra)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--finishers', type=int, default=50000,
+                        help='finishers per synthetic page, default is 50000')
+    parser.add_argument('--members', type=int, default=5000,
+                        help='members in the synthetic roster, default 5000')
+    parser.add_argument('--races', type=int, default=200,
+                        help='races written to the output file, default 200')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per benchmark, default is 3')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help=('processes for the parallel matching benchmark, '
+                              'default is the number of CPUs'))
+    parser.add_argument('--json', dest='json_file',
+                        help='write the results to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = make_names(args.members + args.finishers, rng)
+    rng.shuffle(names)
+    roster = names[:args.members]
+
+    # One finisher in fifty is a club member.
+    runners = names[args.members:args.members + args.finishers]
+    for j in range(0, len(runners), 50):
+        runners[j] = roster[j % len(roster)]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tdir:
+        roster_file = os.path.join(tdir, 'roster.csv')
+        write_roster(roster_file, roster)
+        kwargs = {'membership_list': roster_file,
+                  'membership_cache': os.path.join(tdir, 'cache'),
+                  'output_file': os.path.join(tdir, 'results.html'),
+                  'verbose': 'error'}
+        start = time.perf_counter()
+        crrr = CoolRunning(**kwargs)
+        results['load_membership_list'] = summarize(
+            [time.perf_counter() - start], members=len(roster))
+        csrr = CompuScore(start_date=datetime.date.today(),
+                          stop_date=datetime.date.today(), **kwargs)
+
+        page = RacePage(vanilla_page(runners))
+        lines = page.text.split('\n')
+
+        def match_lines():
+            for line in lines:
+                crrr.match_against_membership(line)
+
+        results['match_against_membership'] = summarize(
+            timeit(match_lines, args.repeat), lines=len(lines))
+
+        results['compile_vanilla_results'] = summarize(
+            timeit(lambda: crrr.compile_vanilla_results(page), args.repeat),
+            finishers=len(runners),
+            hits=len(crrr.compile_vanilla_results(page)[0]))
+
+        crrr.processes = args.processes
+        crrr.parallel_threshold = 0
+        crrr.match_pool()
+        results['club_lines_parallel'] = summarize(
+            timeit(lambda: crrr.club_lines(page.text), args.repeat),
+            finishers=len(runners), processes=args.processes,
+            hits=len(crrr.club_lines(page.text)[0]))
+        crrr.close_match_pools()
+        crrr.processes = 1
+
+        markup = vanilla_page(runners)
+        results['parse_vanilla_page'] = summarize(
+            timeit(lambda: RacePage(markup).text, args.repeat),
+            bytes=len(markup))
+
+        markup = ccrr_page(runners)
+
+        def ccrr():
+            return crrr.compile_ccrr_race_results(RacePage(markup))
+
+        results['compile_ccrr_race_results'] = summarize(
+            timeit(ccrr, args.repeat), finishers=len(runners),
+            bytes=len(markup), hits=len(ccrr()[0]))
+
+        content = compuscore_page(runners).encode('utf-8')
+        csrr.initialize_output_file()
+        results['compuscore_compile_race_results'] = summarize(
+            timeit(lambda: csrr.compile_race_results(
+                csrr.new_race(content=content)), args.repeat),
+            finishers=len(runners), bytes=len(content))
+        csrr.finalize_output_file()
+
+        # A typical race <div>, written out races times.
+        hits = crrr.compile_vanilla_results(page)[0][:20]
+        race = crrr.new_race()
+        race.page = page
+        div = crrr.webify_vanilla_results(hits, race)
+
+        def insert():
+            crrr.initialize_output_file()
+            for _ in range(args.races):
+                crrr.insert_race_results(div)
+            crrr.finalize_output_file()
+
+        results['insert_race_results'] = summarize(
+            timeit(insert, args.repeat), races=args.races,
+            output_bytes=os.path.getsize(kwargs['output_file']))
+
+    report = {
+        'python': platform.python_version(),
+        'lxml': '.'.join(str(x) for x in etree.LXML_VERSION),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now().isoformat(),
+        'parameters': vars(args),
+        'benchmarks': results,
+    }
+
+    for name, result in results.items():
+        print('{:35s} {:9.4f} s'.format(name, result['median_s']))
+
+    if args.json_file is not None:
+        with open(args.json_file, 'w') as fptr:
+            json.dump(report, fptr, indent=2)
+
+
+if __name__ == '__main__':
+    main()
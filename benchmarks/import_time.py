@@ -0,0 +1,83 @@
+"""
+Measure how long each console script takes to start up.
+
+Each measurement runs in a fresh interpreter.  "startup" is the time to
+import the command line module and parse the arguments, which is all that
+"--help" pays for.  "ready" adds the import of the backend module(s) that
+the script goes on to use, i.e. everything that happens before the first
+download.  Interpreter startup itself is not included in either number.
+
+Usage:
+
+    python benchmarks/import_time.py [--repeat N] [--json path]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Backend modules used by each console script.
+SCRIPTS = {
+    'activerr': ['raceresults.active'],
+    'brrr': ['raceresults.brrr'],
+    'crrr': ['raceresults.crrr'],
+    'csrr': ['raceresults.csrr'],
+    'njrr': ['raceresults.active', 'raceresults.brrr', 'raceresults.csrr',
+             'raceresults.nyrr', 'raceresults.orchestrator'],
+    'nyrr': ['raceresults.nyrr'],
+}
+
+_CODE = """
+import sys, time
+t0 = time.perf_counter()
+import argparse
+import raceresults.command_line
+t1 = time.perf_counter()
+import importlib
+for module in {modules!r}:
+    importlib.import_module(module)
+importlib.import_module('raceresults.client')
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t0, 'pandas' in sys.modules)
+"""
+
+
+def measure(modules):
+    """
+    Return (startup, ready, pandas imported) in seconds for one run.
+    """
+    code = _CODE.format(modules=modules)
+    out = subprocess.check_output([sys.executable, '-c', code],
+                                  universal_newlines=True)
+    startup, ready, pandas = out.split()
+    return float(startup), float(ready), pandas == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per script, default is 5')
+    parser.add_argument('--json', dest='json_file',
+                        help='also write the results to this file')
+    args = parser.parse_args()
+
+    report = {}
+    for script, modules in sorted(SCRIPTS.items()):
+        runs = [measure(modules) for _ in range(args.repeat)]
+        report[script] = {
+            'startup_ms': 1000 * statistics.median(r[0] for r in runs),
+            'ready_ms': 1000 * statistics.median(r[1] for r in runs),
+            'imports_pandas': any(r[2] for r in runs),
+        }
+        print('{:10s} startup {:7.1f} ms   ready {:7.1f} ms   pandas {}'.format(
+            script, report[script]['startup_ms'], report[script]['ready_ms'],
+            report[script]['imports_pandas']))
+
+    if args.json_file is not None:
+        with open(args.json_file, 'w') as fptr:
+            json.dump(report, fptr, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,14 @@
 """
 RaceResults package
 """
-from . import command_line
+__all__ = ['command_line']
 
-__all__ = [command_line]
+
+def __getattr__(name):
+    # Submodules are imported on first use so that "import raceresults" does
+    # not drag in every backend and its dependencies.
+    if name in __all__:
+        import importlib
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__,
+                                                                    name))
@@ -1,11 +1,66 @@
 """
 Module for parsing Active race results.
 """
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import datetime as dt
+import re
+
 from lxml import etree, html
-import requests
 
 from .common import RaceResults
 
+# Pages of results are numbered by a query parameter, e.g.
+#
+#     /events/95690/results?page=3
+_PAGE_REGEX = re.compile(r'[?&]page=(?P<page>\d+)')
+
+
+def predict_page_urls(links):
+    """
+    Work out the URLs of the pages of results from the pagination links of
+    the first page.
+
+    Parameters
+    ----------
+    links : list
+        Pagination <A> elements.
+
+    Returns
+    -------
+    list
+        Relative URLs of the 2nd through the highest numbered page linked to,
+        or an empty list if the pages are not numbered.
+    """
+    highest = None
+    for link in links:
+        href = link.get('href')
+        matchobj = _PAGE_REGEX.search(href)
+        if matchobj is None:
+            continue
+        page = int(matchobj.group('page'))
+        if highest is None or page > highest[0]:
+            highest = (page, href, matchobj)
+
+    if highest is None:
+        return []
+
+    last, href, matchobj = highest
+    start, stop = matchobj.span('page')
+    return [href[:start] + str(page) + href[stop:]
+            for page in range(2, last + 1)]
+
+
+def next_page_url(doc):
+    """
+    Relative URL of the "Next" page of results, or None on the last page.
+    """
+    for link in doc.cssselect('.pagination a[rel]'):
+        if link.text is not None and link.text.startswith('Next'):
+            return link.get('href')
+    return None
+
 
 class ActiveRR(RaceResults):
     """
@@ -16,8 +71,11 @@ class ActiveRR(RaceResults):
     states : list
         List of states in which to search. Default is ['NJ']
     """
+    source = 'Active'
+
     def __init__(self, date_range=None, membership_list=None,
-                 output_file=None, states=None, verbose='INFO'):
+                 output_file=None, states=None, verbose='INFO',
+                 http_client=None, records=None, jobs=1):
         """
         Parameters
         ----------
@@ -31,16 +89,23 @@ class ActiveRR(RaceResults):
             List of states in which to search. Default is ['NJ']
         verbose : str
             Level of verbosity.
+        http_client : HttpClient
+            Client through which all downloads go.
+        records : record writer
+            Each member's result is also written to this.
+        jobs : int
+            Number of pages of results to download ahead.
         """
         RaceResults.__init__(self, verbose=verbose,
                              membership_list=membership_list,
                              start_date=date_range[0],
                              stop_date=date_range[1],
-                             output_file=output_file)
+                             output_file=output_file,
+                             http_client=http_client,
+                             records=records,
+                             jobs=jobs)
 
-        # Need to remember the current URL.
         self.states = states
-        self._downloaded_url = None
 
     def compile_web_results(self):
         """
@@ -48,7 +113,6 @@ class ActiveRR(RaceResults):
         """
         for state in self.states:
             print("Searching for results in {}...".format(state))
-            self.state = state
             url = 'http://results.active.com/search'
             params = {
                 'search[source]': 'event',
@@ -56,16 +120,16 @@ class ActiveRR(RaceResults):
                 'search[start_date]': self.start_date.strftime('%Y-%m-%d'),
                 'search[end_date]': self.stop_date.strftime('%Y-%m-%d')
             }
-            response = requests.get(url, params=params)
+            response = self.client.get(url, params=params)
 
             # Go thru the list of events.  They are identified by DIV tags with
             # "result-rows" class.
             doc = html.document_fromstring(response.content)
             results = doc.find_class('result-row')
             for result in results:
-                self.process_event(result)
+                self.process_event(result, state)
 
-    def process_event(self, event):
+    def process_event(self, event, state):
         """
         Parameters
         ----------
@@ -92,19 +156,26 @@ class ActiveRR(RaceResults):
             <br class="clear"/>
           </div>
 
+        state : str
+            State that was searched.  Events elsewhere are skipped.
         """
         name = event.cssselect('.result-title a')[0].text.strip()
         place = event.cssselect('.result-sub-location')[0].text.strip()
         date = event.cssselect('.result-extras .title')[0].tail.strip()
         print('Looking at {}, {}, {}'.format(name, place, date))
-        if self.state not in place.split():
+        if state not in place.split():
             print("\tSkipping, state mismatch.")
             return
 
+        try:
+            race_date = dt.datetime.strptime(date, '%m/%d/%Y').date()
+        except ValueError:
+            race_date = None
+
         link = event.cssselect('.result-title a[href]')[0].get('href')
         url = 'http://results.active.com' + link
 
-        r = requests.get(url)
+        r = self.client.get(url)
         if r.status_code != 200:
             raise RuntimeError("Could not retrieve {}".format(url))
 
@@ -125,75 +196,149 @@ class ActiveRR(RaceResults):
                 continue
             print('\tLooking at {}'.format(elt.text))
             url = 'http://results.active.com' + elt.get('href')
-            self.process_results_page(url)
+            self.process_results_page(url, date=race_date)
 
-    def process_results_page(self, url):
+    def results_pages(self, url, leadin_doc):
         """
+        Download the pages of results following the lead-in page.
+
+        Where the pages are numbered, the following pages are downloaded
+        ahead of time, up to "jobs" of them at once.  Otherwise each page is
+        requested as soon as the link to it is found, so that it downloads
+        while the page before it is searched.
+
         Parameters
         ----------
         url : str
             URL of the lead-in results page
+        leadin_doc : lxml.html.HtmlElement
+            Element tree of the lead-in page.
+
+        Yields
+        ------
+        lxml.html.HtmlElement
+            Element tree of each following page, in order.
         """
-        r = requests.get(url)
-        if r.status_code != 200:
-            raise RuntimeError("Could not retrieve {}".format(url))
-        leadin_doc = html.document_fromstring(r.content)
-        tables = leadin_doc.cssselect('.participant-list')
+        pending = collections.deque(predict_page_urls(
+            leadin_doc.cssselect('.pagination a[href]')))
+        if len(pending) == 0 and next_page_url(leadin_doc) is not None:
+            pending.append(next_page_url(leadin_doc))
+        seen = set(pending)
 
-        # Get any following pages.
-        links = leadin_doc.cssselect('.pagination a[rel]')
-        while True:
-            if len(links) == 0:
-                break
+        in_flight = collections.deque()
+        read_ahead = max(self.jobs, 1)
+        with ThreadPoolExecutor(max_workers=read_ahead) as executor:
+            while True:
+                while len(pending) > 0 and len(in_flight) < read_ahead:
+                    next_rel_url = pending.popleft()
+                    print('\t\t{}'.format(next_rel_url))
+                    future = executor.submit(
+                        self.client.get,
+                        'http://results.active.com' + next_rel_url)
+                    in_flight.append(future)
 
-            lst = [link for link in links if link.text.startswith('Next')]
-            if len(lst) == 0:
-                break
+                if len(in_flight) == 0:
+                    break
 
-            anchor = lst[0]
-            next_rel_url = anchor.get('href')
-            print('\t\t{}'.format(next_rel_url))
-            r = requests.get('http://results.active.com' + next_rel_url)
-            doc = html.document_fromstring(r.content)
-            table = doc.cssselect('.participant-list')[0]
-            tables.append(table)
+                r = in_flight.popleft().result()
+                with self.profiler.span('parse', url=url,
+                                        bytes=len(r.content)):
+                    doc = html.document_fromstring(r.content)
 
-            links = doc.cssselect('.pagination a[rel]')
+                # More pages than the lead-in page linked to?
+                next_rel_url = next_page_url(doc)
+                if next_rel_url is not None and next_rel_url not in seen:
+                    seen.add(next_rel_url)
+                    pending.append(next_rel_url)
 
-        # Search the tables.
+                yield doc
+
+    def matching_rows(self, table):
+        """
+        Search a table of results for members.
+
+        Returns
+        -------
+        list
+            Copies of the matching <TR> elements, so that the page they were
+            found on need not be kept.
+        """
         lst = []
-        for table in tables:
-            trs = table.cssselect('tr')
-            # first row has stuff we don't want
-            for tr in trs[1:]:
-                tds = tr.getchildren()
-                if len(tds) < 2:
-                    continue
-                for _, regex in self.df['fname_lname_regex'].iteritems():
-                    if regex.match(tds[2].text_content()):
-                        lst.append(tr)
+        trs = table.cssselect('tr')
+        # first row has stuff we don't want
+        for tr in trs[1:]:
+            tds = tr.getchildren()
+            if len(tds) < 2:
+                continue
+            if self.matcher.match(tds[2].text_content()) is not None:
+                lst.append(copy.deepcopy(tr))
+        return lst
+
+    def process_results_page(self, url, date=None):
+        """
+        Each page of results is searched as soon as it is downloaded, and only
+        the matching rows are kept.
+
+        Parameters
+        ----------
+        url : str
+            URL of the lead-in results page
+        date : datetime.date
+            Date of the race, if known.
+        """
+        r = self.client.get(url)
+        if r.status_code != 200:
+            raise RuntimeError("Could not retrieve {}".format(url))
+        race = self.new_race(url, content=r.content, date=date)
+        with self.profiler.span('parse', url=url, bytes=len(r.content)):
+            leadin_doc = race.doc = html.document_fromstring(r.content)
+
+        header_row = None
+        lst = []
+
+        tables = leadin_doc.cssselect('.participant-list')
+        pages = self.results_pages(url, leadin_doc)
+        while True:
+            if len(tables) > 0 and header_row is None:
+                header_row = copy.deepcopy(tables[0].cssselect('tr')[0])
+
+            with self.profiler.span('match', url=url):
+                for table in tables:
+                    lst.extend(self.matching_rows(table))
+
+            try:
+                doc = next(pages)
+            except StopIteration:
+                break
+            tables = doc.cssselect('.participant-list')[:1]
 
         if len(lst) > 0:
             # Ok we found some results.  Insert the header for the first table.
-            header_row = tables[0].cssselect('tr')[0]
             lst.insert(0, header_row)
-            self.webify_results(leadin_doc, lst, url)
+            with self.profiler.span('write', url=url):
+                div = self.webify_results(lst, race)
+                self.record_results(0, lst, div, race)
 
-    def webify_results(self, leadin_doc, lst, url):
+    def webify_results(self, lst, race):
         """
         Take the list of results and turn it into output HTML.
 
         Parameters
         ----------
-        leadin_doc : lxml.html.HtmlElement
-            Element tree of lead in page of race results from active.com
         lst : list
             List of <TR> elements consisting of results.
-        url : str
-            URL of the lead-in results page
+        race : RaceContext
+            The race, whose URL and parsed document are those of the lead-in
+            page of race results from active.com
+
+        Returns
+        -------
+        div : element tree
+            DIV element containing "finished" race results.
         """
         div = etree.Element('div')
         div.set('class', 'race')
+        leadin_doc = race.doc
 
         hr_elt = etree.Element('hr')
         hr_elt.set('class', 'race_header')
@@ -217,7 +362,7 @@ class ActiveRR(RaceResults):
         span.text = 'Complete results '
         p.append(span)
         link = etree.Element('a')
-        link.set('href', url)
+        link.set('href', race.url)
         link.text = 'here'
         p.append(link)
         span = etree.Element('span')
@@ -238,3 +383,4 @@ class ActiveRR(RaceResults):
 
         div.append(table)
         self.insert_race_results(div)
+        return div
@@ -0,0 +1,174 @@
+"""
+Archive of HTTP traffic, for recording a crawl and replaying it offline.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+
+import requests
+import requests.cookies
+import requests.structures
+
+from .cache import HttpCache
+
+# Name of the file listing the exchanges, one JSON object per line.
+INDEX = 'index.jsonl'
+
+
+def request_body(data):
+    """
+    Canonical form of the body of a POST, so that the same form posted with
+    its fields in a different order is recognized.
+    """
+    if data is None:
+        return None
+    if isinstance(data, bytes):
+        return data.decode('latin1')
+    if isinstance(data, str):
+        return data
+    if isinstance(data, dict):
+        data = sorted(data.items())
+    return urllib.parse.urlencode(list(data))
+
+
+class HttpArchive:
+    """
+    Directory of recorded HTTP exchanges.
+
+    Each exchange is a line of the index file, holding the method, the full
+    URL, any POST body, the cookies sent and received, and the response
+    status and headers.  Bodies are stored gzipped, once for each distinct
+    body, named by their SHA-256 digest.
+
+    When replaying, each request gets the response recorded for the same
+    method, URL and body.  A request made several times gets the recorded
+    responses in the order in which they were recorded, the last one being
+    repeated if need be.
+
+    Attributes
+    ----------
+    directory : str
+        Where the archive is kept.
+    replaying : bool
+        True if the archive is being replayed, False if it is being recorded.
+    """
+    def __init__(self, directory, replay=False):
+        """
+        Parameters
+        ----------
+        directory : str
+            Where the archive is kept.  Created if recording.
+        replay : bool
+            Replay the archive rather than record into it.
+        """
+        self.directory = directory
+        self.replaying = replay
+        self._lock = threading.Lock()
+
+        if replay:
+            self._exchanges = {}
+            self._next = {}
+            with open(os.path.join(directory, INDEX), 'rt') as fptr:
+                for line in fptr:
+                    exchange = json.loads(line)
+                    key = self._key(exchange['method'], exchange['url'],
+                                    exchange['body'])
+                    self._exchanges.setdefault(key, []).append(exchange)
+            self._index = None
+        else:
+            os.makedirs(os.path.join(directory, 'bodies'), exist_ok=True)
+            self._index = open(os.path.join(directory, INDEX), 'at')
+
+    @staticmethod
+    def _key(method, url, body):
+        return method, url, body
+
+    def _body_path(self, digest):
+        return os.path.join(self.directory, 'bodies', digest + '.gz')
+
+    def record(self, method, url, response, params=None, data=None,
+               cookies=None):
+        """
+        Add an exchange to the archive.
+
+        Parameters
+        ----------
+        method : str
+            'GET' or 'POST'.
+        url : str
+            URL requested, without any query parameters given separately.
+        response : requests.Response
+            The response received.
+        params : dict
+            Query parameters.
+        data : dict
+            POST parameters.
+        cookies : dict
+            Cookies sent with the request.
+        """
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        exchange = {'method': method,
+                    'url': HttpCache.url_for(url, params),
+                    'body': request_body(data),
+                    'request_cookies': cookies or {},
+                    'status': response.status_code,
+                    'reason': response.reason,
+                    'headers': dict(response.headers),
+                    'encoding': response.encoding,
+                    'cookies': response.cookies.get_dict(),
+                    'content': digest}
+
+        with self._lock:
+            path = self._body_path(digest)
+            if not os.path.exists(path):
+                with gzip.open(path + '.tmp', 'wb') as fptr:
+                    fptr.write(content)
+                os.replace(path + '.tmp', path)
+            self._index.write(json.dumps(exchange) + '\n')
+            self._index.flush()
+
+    def replay(self, method, url, params=None, data=None):
+        """
+        Return the recorded response to a request.
+
+        Raises
+        ------
+        RuntimeError
+            If the request was never recorded.
+        """
+        full_url = HttpCache.url_for(url, params)
+        key = self._key(method, full_url, request_body(data))
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if exchanges is None:
+                msg = '{} {} is not in the archive at {}.'
+                raise RuntimeError(msg.format(method, full_url,
+                                              self.directory))
+            j = self._next.get(key, 0)
+            self._next[key] = min(j + 1, len(exchanges) - 1)
+            exchange = exchanges[j]
+
+        with gzip.open(self._body_path(exchange['content']), 'rb') as fptr:
+            content = fptr.read()
+
+        response = requests.Response()
+        response.status_code = exchange['status']
+        response.reason = exchange['reason']
+        response.url = full_url
+        response.headers = requests.structures.CaseInsensitiveDict(
+            exchange['headers'])
+        response.encoding = exchange['encoding']
+        response.cookies = requests.cookies.cookiejar_from_dict(
+            exchange['cookies'])
+        response._content = content
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
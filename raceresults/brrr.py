@@ -1,18 +1,19 @@
 """
 Module for BestRace.
 """
-import re
+import copy
 
 from lxml import etree, html
-import requests
 
 from .common import RaceResults
+from .index import RaceIndex, bestrace_races
 
 
 class BestRace(RaceResults):
     """
     Process races found on BestRace.com.
     """
+    source = 'BestRace'
 
     def __init__(self, **kwargs):
         RaceResults.__init__(self, **kwargs)
@@ -21,64 +22,66 @@ class BestRace(RaceResults):
         """
         Download the requested results and compile them.
         """
-        # The URL for the "master" list will have the pattern
-        #
-        # http://www.bestrace.com/YYYYschedule.shtml
-        url = 'http://www.bestrace.com/{year}schedule.html'
-        url = url.format(year=self.start_date.strftime('%Y'))
-        self.logger.info('Downloading {}'.format(url))
-        self.response = requests.get(url)
-
-        # Look for the following pattern in the "master" list.
-        #
-        # http://www.bestrace.com/results/YY/YYMMDDXXX.HTM
-        pattern = 'http://www.bestrace.com/results/{}/{}{}'
-        pattern = pattern.format(self.start_date.strftime('%y'),
-                                 self.start_date.strftime('%y'),
-                                 self.start_date.strftime('%m'))
-
-        ndays = self.stop_date.day - self.start_date.day + 1
-        fmt = '|'.join(['{:02d}' for r in range(ndays)])
-        pargs = [x for x in range(self.start_date.day, self.stop_date.day + 1)]
-        day_range = fmt.format(*pargs)
-
-        pattern += '(' + day_range + ')'
-
-        pattern += r"\w+\.HTM"
-        self.logger.debug('pattern is "{}"'.format(pattern))
-
-        matchiter = re.finditer(pattern, self.response.text)
-        urls = [matchobj.group() for matchobj in matchiter]
-
-        for url in urls:
+        index = self.race_index()
+        for race in index.between(self.start_date, self.stop_date):
+            url = race.url
             self.logger.info('Downloading {}...'.format(url))
-            response = requests.get(url)
-            self.downloaded_url = url
-            self.html = response.text
-            self.compile_race_results(response)
+            response = self.client.get(url)
+            if self.is_processed(url, response.content):
+                continue
+            context = self.new_race(url, content=response.content,
+                                    text=response.text, date=race.date)
+            self.compile_race_results(context)
+            self.mark_processed(url, response.content)
+
+    def race_index(self):
+        """
+        Index the races over the requested date range.
+
+        The schedule for each year in the range is downloaded and parsed just
+        once.
 
-    def compile_race_results(self, resp):
+        Returns
+        -------
+        RaceIndex
+        """
+        # The URL for the "master" list will have the pattern
+        #
+        # http://www.bestrace.com/YYYYschedule.html
+        index = RaceIndex()
+        for year in range(self.start_date.year, self.stop_date.year + 1):
+            url = 'http://www.bestrace.com/{year}schedule.html'
+            url = url.format(year=year)
+            self.logger.info('Downloading {}'.format(url))
+            response = self.client.get(url)
+            index.update(bestrace_races(response.text))
+        return index
+
+    def compile_race_results(self, race):
         """
+        Parameters
+        ----------
+        race : RaceContext
+            The race, with the page as downloaded.
         """
-        doc = html.document_fromstring(resp.text)
-        self.html = resp.text
+        with self.profiler.span('parse', url=race.url,
+                                bytes=len(race.content)):
+            race.doc = html.document_fromstring(race.text)
 
         # We are looking for a <PRE> element.  That element is preceded by
         # a <PRE><A NAME="overall"></PRE> set of tags.
-        pre = doc.cssselect('pre + pre')[0]
+        pre = race.doc.cssselect('pre + pre')[0]
 
         # OK, we are properly positioned.
-        results = []
-        for line in pre.text_content().split('\n'):
-            for _, regex in self.df['fname_lname_regex'].iteritems():
-                if regex.search(line):
-                    results.append(line)
+        with self.profiler.span('match', url=race.url):
+            text = pre.text_content()
+            club_results = self.club_lines(text)
 
-        if len(results) > 0:
-            results = self.webify_results(results)
-            self.insert_race_results(results)
+        self.insert_club_results(
+            club_results, lambda results: self.webify_results(results, race),
+            race)
 
-    def webify_results(self, results_lst):
+    def webify_results(self, results_lst, race):
         """
         Take the list of results and turn it into output HTML.
         """
@@ -90,7 +93,7 @@ class BestRace(RaceResults):
 
         # Get the title, but don't bother with the date information.
         # <title>  Purple Stride 5K     - November 10, 2013   </title>
-        doc = html.document_fromstring(self.html)
+        doc = race.doc
         title = doc.cssselect('title')[0]
         title_string = title.text.split('-')[0]
 
@@ -99,12 +102,14 @@ class BestRace(RaceResults):
         div.append(h1_elt)
 
         # Append the URL if possible.
-        if self.downloaded_url is not None:
-            div.append(self.construct_source_url_reference('BestRace'))
+        if race.url is not None:
+            div.append(self.construct_source_url_reference('BestRace',
+                                                           race.url))
 
         # Parse out the banner.  The banner has 'tail' content, however, so we
-        # have to be careful.
-        banner = doc.cssselect('pre + pre > b')[0]
+        # have to be careful.  It is copied, as the same page may be webified
+        # for several clubs.
+        banner = copy.deepcopy(doc.cssselect('pre + pre > b')[0])
         pre = etree.Element('pre')
         pre.append(banner)
         banner.tail = '\n' + '\n'.join(results_lst)
@@ -0,0 +1,243 @@
+"""
+Persistent on-disk cache of downloaded web pages.
+"""
+import email.utils
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+import requests.structures
+import requests.utils
+
+# Only these response headers are kept with a cached page.
+_KEPT_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Date']
+
+
+class CacheEntry:
+    """
+    A single cached page.
+
+    Attributes
+    ----------
+    url : str
+        URL of the page, including any query string.
+    headers : dict
+        Subset of the response headers.
+    encoding : str
+        Text encoding of the page as determined by requests.
+    stored : float
+        Time at which the page was last downloaded or revalidated.
+    content : bytes
+        Body of the page.
+    """
+    def __init__(self, url, headers, encoding, stored, content):
+        self.url = url
+        self.headers = headers
+        self.encoding = encoding
+        self.stored = stored
+        self.content = content
+
+    def last_modified(self):
+        """
+        Return the Last-Modified header as seconds since the epoch, or None.
+        """
+        value = self.headers.get('Last-Modified')
+        if value is None:
+            return None
+        try:
+            return email.utils.parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+
+    def is_fresh(self, ttl, now=None):
+        """
+        Can the page be served without asking the server?
+
+        A page is fresh for ttl seconds after it was stored.  Pages that had
+        not changed for a long time when they were downloaded, such as race
+        results from last week, stay fresh for a tenth of that time if that
+        is longer, as suggested by RFC 7234 for heuristic freshness.
+        """
+        if now is None:
+            now = time.time()
+        lifetime = ttl
+        last_modified = self.last_modified()
+        if last_modified is not None:
+            lifetime = max(lifetime, (self.stored - last_modified) / 10)
+        return now - self.stored < lifetime
+
+    def conditional_headers(self):
+        """
+        Request headers for revalidating the page with the server.
+        """
+        headers = {}
+        if 'ETag' in self.headers:
+            headers['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        return headers
+
+    def to_response(self):
+        """
+        Reconstitute a requests.Response from the entry.
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = self.url
+        response.headers = requests.structures.CaseInsensitiveDict(
+            self.headers)
+        response.encoding = self.encoding
+        response._content = self.content
+        # So that iter_content serves the body rather than reading a stream.
+        response._content_consumed = True
+        return response
+
+
+class HttpCache:
+    """
+    Directory of cached pages, each stored as a body file plus a small JSON
+    file of metadata.  The least recently used pages are evicted once the
+    total size of the bodies goes over a limit.
+
+    Attributes
+    ----------
+    directory : str
+        Where the pages are kept.
+    ttl : float
+        Seconds for which a page is served without revalidation.
+    max_size : int
+        Maximum total size in bytes of the cached pages.
+    """
+    def __init__(self, directory, ttl=3600, max_size=256 * 1024 * 1024):
+        """
+        Parameters
+        ----------
+        directory : str
+            Where the pages are kept.  Created if necessary.
+        ttl : float
+            Seconds for which a page is served without revalidation.
+        max_size : int
+            Maximum total size in bytes of the cached pages.
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(os.path.getsize(os.path.join(directory, name))
+                         for name in os.listdir(directory)
+                         if name.endswith('.body'))
+
+    @staticmethod
+    def url_for(url, params=None):
+        """
+        Full URL of a GET request, including the query string.
+        """
+        if params is None:
+            return url
+        return requests.Request('GET', url, params=params).prepare().url
+
+    def _path(self, url, suffix):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + suffix)
+
+    def lookup(self, url):
+        """
+        Return the CacheEntry for a URL, or None if it is not cached.
+        """
+        try:
+            with open(self._path(url, '.json'), 'rt') as fptr:
+                meta = json.load(fptr)
+            with open(self._path(url, '.body'), 'rb') as fptr:
+                content = fptr.read()
+        except (OSError, ValueError):
+            return None
+
+        # Mark the entry as recently used.  Another thread may have evicted
+        # it since it was read, which does not matter, as the content is in
+        # hand.
+        try:
+            os.utime(self._path(url, '.body'))
+        except OSError:
+            pass
+        return CacheEntry(url, meta['headers'], meta['encoding'],
+                          meta['stored'], content)
+
+    def store(self, url, response):
+        """
+        Store a successful response.
+
+        Returns
+        -------
+        CacheEntry
+        """
+        headers = {name: response.headers[name] for name in _KEPT_HEADERS
+                   if name in response.headers}
+        encoding = response.encoding
+        if encoding is None:
+            encoding = requests.utils.get_encoding_from_headers(headers)
+        entry = CacheEntry(url, headers, encoding, time.time(),
+                           response.content)
+        self._write(entry)
+        return entry
+
+    def refresh(self, entry):
+        """
+        The server says that the page has not changed, so restart its clock.
+        """
+        entry.stored = time.time()
+        self._write(entry, content=False)
+
+    def _write(self, entry, content=True):
+        body_path = self._path(entry.url, '.body')
+        meta = {'url': entry.url,
+                'headers': entry.headers,
+                'encoding': entry.encoding,
+                'stored': entry.stored}
+
+        with self._lock:
+            if content:
+                try:
+                    self._size -= os.path.getsize(body_path)
+                except OSError:
+                    pass
+                tmp_path = body_path + '.tmp'
+                with open(tmp_path, 'wb') as fptr:
+                    fptr.write(entry.content)
+                os.replace(tmp_path, body_path)
+                self._size += len(entry.content)
+
+            tmp_path = self._path(entry.url, '.json.tmp')
+            with open(tmp_path, 'wt') as fptr:
+                json.dump(meta, fptr)
+            os.replace(tmp_path, self._path(entry.url, '.json'))
+
+            if self._size > self.max_size:
+                self._evict(body_path)
+
+    def _evict(self, keep):
+        """
+        Remove the least recently used pages, other than the one just
+        written, until the cache fits.
+        """
+        bodies = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.body') and path != keep:
+                stat = os.stat(path)
+                bodies.append((stat.st_mtime, stat.st_size, path))
+
+        for _, size, path in sorted(bodies):
+            if self._size <= self.max_size:
+                break
+            for victim in [path, path[:-len('.body')] + '.json']:
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            self._size -= size
@@ -0,0 +1,264 @@
+"""
+HTTP client shared by all the backends.
+"""
+import threading
+import urllib.parse
+
+import requests
+import requests.adapters
+
+from .profiling import Profiler
+
+
+class HttpClient:
+    """
+    Thin wrapper around a requests session with keep-alive connection pooling
+    and default timeouts.  The client may be shared between threads, and the
+    number of simultaneous requests to any one host is capped.
+
+    Attributes
+    ----------
+    session : requests.Session
+        All downloads go through this session, so connections to a host are
+        reused from one race page to the next.
+    timeout : float
+        Default timeout in seconds for each request.
+    cache : HttpCache
+        If not None, GET requests are served from and stored in this cache.
+    archive : HttpArchive
+        If not None, every exchange is either recorded into this archive or
+        replayed from it without touching the network.
+    profiler : Profiler
+        Each request is recorded as a "download" span.
+    peek_chunk_size : int
+        Size of the pieces in which a body is read while it is peeked at.
+    """
+    peek_chunk_size = 4096
+
+    def __init__(self, pool_connections=10, pool_maxsize=4, timeout=30,
+                 max_retries=2, host_pool_sizes=None, max_per_host=None,
+                 cache=None, archive=None, profiler=None):
+        """
+        Parameters
+        ----------
+        pool_connections : int
+            Number of hosts for which to keep a connection pool.
+        pool_maxsize : int
+            Default number of connections kept alive for each host.
+        timeout : float
+            Default timeout in seconds for each request.
+        max_retries : int
+            Number of times to retry failed connections.
+        host_pool_sizes : dict
+            Maps host names, such as 'www.coolrunning.com', to the number of
+            connections kept alive for that host.
+        max_per_host : int
+            Maximum number of simultaneous requests to a single host.  The
+            default is the host's pool size.
+        cache : HttpCache
+            On-disk cache for GET requests.
+        archive : HttpArchive
+            Archive in which to record all traffic, or from which to replay
+            it.
+        profiler : Profiler
+            Records the time spent on each request.  One is created if not
+            provided.
+        """
+        self.timeout = timeout
+        self.cache = cache
+        self.archive = archive
+        if profiler is None:
+            profiler = Profiler()
+        self.profiler = profiler
+        self.max_retries = max_retries
+        self.max_per_host = max_per_host
+
+        # Per-host connection limits and the semaphores enforcing them.
+        self._host_limits = {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._default_limit = pool_maxsize
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        if host_pool_sizes is not None:
+            for host, maxsize in host_pool_sizes.items():
+                self.set_host_pool_size(host, maxsize)
+
+    def set_host_pool_size(self, host, maxsize):
+        """
+        Give a single host its own connection pool size.
+
+        Parameters
+        ----------
+        host : str
+            Host name, such as 'www.coolrunning.com'.
+        maxsize : int
+            Number of connections to keep alive for the host.
+        """
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=maxsize,
+                                                max_retries=self.max_retries)
+        for scheme in ['http', 'https']:
+            self.session.mount('{}://{}/'.format(scheme, host), adapter)
+        self._host_limits[host] = maxsize
+
+    def _slot(self, url):
+        """
+        Return the semaphore guarding the host of a URL.
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                limit = self.max_per_host
+                if limit is None:
+                    limit = self._host_limits.get(host, self._default_limit)
+                semaphore = threading.BoundedSemaphore(limit)
+                self._semaphores[host] = semaphore
+        return semaphore
+
+    def get(self, url, peek=None, **kwargs):
+        """
+        Issue a GET request.  Other keyword arguments are passed along to
+        requests.Session.get.
+
+        If there is a cache, fresh pages are served straight from it, and
+        stale pages are revalidated with a conditional request.
+
+        Parameters
+        ----------
+        url : str
+            The URL to retrieve.
+        peek : callable
+            If given, it is called with the start of the body as each piece
+            arrives, until it returns True or False.  True abandons the
+            download, in which case None is returned instead of a response.
+
+        Returns
+        -------
+        requests.Response
+        """
+        with self.profiler.span('download', url=url) as tags:
+            if peek is None:
+                response = self._get(url, **kwargs)
+            else:
+                response = self._peek(url, peek, **kwargs)
+            if response is None:
+                tags['aborted'] = True
+            elif not kwargs.get('stream'):
+                tags['bytes'] = len(response.content)
+        return response
+
+    def _peek(self, url, peek, **kwargs):
+        if self.cache is not None or self.archive is not None:
+            # Cached and replayed pages cost nothing to read in full, and
+            # recorded pages must be read in full anyway.
+            response = self._get(url, **kwargs)
+            if peek(response.content):
+                return None
+            return response
+
+        kwargs['stream'] = True
+        response = self._get(url, **kwargs)
+        chunks = response.iter_content(self.peek_chunk_size)
+        head = b''
+        for chunk in chunks:
+            head += chunk
+            verdict = peek(head)
+            if verdict is True:
+                response.close()
+                return None
+            if verdict is False:
+                break
+
+        # Read the rest of the body as if the response had not been
+        # streamed.
+        response._content = head + b''.join(chunks)
+        response._content_consumed = True
+        response.close()
+        return response
+
+    def _get(self, url, **kwargs):
+        if self.archive is None:
+            return self._fetch(url, **kwargs)
+        if self.archive.replaying:
+            return self._replay('GET', url, params=kwargs.get('params'))
+
+        cookies = self.session.cookies.get_dict()
+        response = self._fetch(url, **kwargs)
+        self.archive.record('GET', url, response,
+                            params=kwargs.get('params'), cookies=cookies)
+        return response
+
+    def _replay(self, method, url, params=None, data=None):
+        response = self.archive.replay(method, url, params=params, data=data)
+        # Keep the cookie jar as it would have been had the request been
+        # made.
+        self.session.cookies.update(response.cookies)
+        return response
+
+    def _fetch(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        if self.cache is None or kwargs.get('stream'):
+            with self._slot(url):
+                return self.session.get(url, **kwargs)
+
+        full_url = self.cache.url_for(url, kwargs.get('params'))
+        entry = self.cache.lookup(full_url)
+        if entry is not None:
+            if entry.is_fresh(self.cache.ttl):
+                return entry.to_response()
+            headers = dict(kwargs.get('headers') or {})
+            headers.update(entry.conditional_headers())
+            kwargs['headers'] = headers
+
+        with self._slot(url):
+            response = self.session.get(url, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(entry)
+            return entry.to_response()
+        if response.status_code == 200:
+            self.cache.store(full_url, response)
+        return response
+
+    def post(self, url, data=None, **kwargs):
+        """
+        Issue a POST request.  Keyword arguments are passed along to
+        requests.Session.post.
+
+        Returns
+        -------
+        requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        with self.profiler.span('download', url=url) as tags:
+            if self.archive is not None and self.archive.replaying:
+                response = self._replay('POST', url,
+                                        params=kwargs.get('params'),
+                                        data=data)
+            else:
+                cookies = self.session.cookies.get_dict()
+                with self._slot(url):
+                    response = self.session.post(url, data=data, **kwargs)
+                if self.archive is not None:
+                    self.archive.record('POST', url, response,
+                                        params=kwargs.get('params'),
+                                        data=data, cookies=cookies)
+            tags['bytes'] = len(response.content)
+        return response
+
+    def close(self):
+        """
+        Release all pooled connections, and finish writing any archive.
+        """
+        self.session.close()
+        if self.archive is not None:
+            self.archive.close()
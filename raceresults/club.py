@@ -0,0 +1,28 @@
+"""
+Clubs for which race results are compiled.
+"""
+
+
+class Club:
+    """
+    A club whose members are searched for, and the report to which its races
+    are written.
+
+    Attributes
+    ----------
+    membership : Membership
+        The club's membership list, or None if results are not matched
+        against a membership list (e.g. NYRR team searches).
+    output_file : str
+        All of the club's race results are written to this file.
+    writer : ResultsWriter
+        Appends each race to the output file as it is produced.
+    name : str
+        Used when logging.
+    """
+    def __init__(self, membership, output_file, name=None):
+        self.membership = membership
+        self.output_file = output_file
+        self.writer = None
+        self.name = name
+
@@ -1,19 +1,214 @@
 """
 Command line interface to RR.
+
+The backends, and the libraries they depend upon, are only imported once a
+script has parsed its arguments, and then only the ones it actually uses.
+This keeps startup fast for cron-driven invocations.
 """
 
 import argparse
+import calendar
 import datetime
-import tempfile
 
-from lxml import etree, html
 
-from .active import ActiveRR
-from .brrr import BestRace
-from .crrr import CoolRunning
-from .csrr import CompuScore
-from .nyrr import NewYorkRR
-from .common import RaceResults
+def _add_http_arguments(parser):
+    """
+    Options controlling the shared HTTP client.
+    """
+    parser.add_argument('--timeout',
+                        dest='timeout',
+                        default=30,
+                        type=float,
+                        help='seconds to wait on each download, default is 30')
+    parser.add_argument('--pool-size',
+                        dest='pool_size',
+                        default=4,
+                        type=int,
+                        help=('connections to keep alive and simultaneous '
+                              'requests per host, default is 4'))
+    parser.add_argument('--cache-dir',
+                        dest='cache_dir',
+                        help='keep downloaded pages in this directory')
+    parser.add_argument('--cache-ttl',
+                        dest='cache_ttl',
+                        default=3600,
+                        type=float,
+                        help=('seconds before a cached page is revalidated, '
+                              'default is 3600'))
+    parser.add_argument('--cache-size',
+                        dest='cache_size',
+                        default=256,
+                        type=int,
+                        help='maximum size of the cache in MB, default is 256')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--record',
+                       dest='record',
+                       metavar='DIR',
+                       help='record all HTTP traffic into this directory')
+    group.add_argument('--replay',
+                       dest='replay',
+                       metavar='DIR',
+                       help=('replay HTTP traffic recorded with --record '
+                             'instead of using the network'))
+
+
+def _add_profile_arguments(parser):
+    """
+    Options controlling the timing report.
+    """
+    parser.add_argument('--profile-report',
+                        dest='profile_report',
+                        help=('write the time spent downloading, parsing, '
+                              'matching and writing each page to this JSON '
+                              'file'))
+
+
+def _add_ledger_arguments(parser):
+    """
+    Options controlling incremental runs.
+    """
+    parser.add_argument('--incremental',
+                        dest='incremental',
+                        action='store_true',
+                        help=('skip races already processed against the same '
+                              'membership list(s)'))
+    parser.add_argument('--ledger',
+                        dest='ledger',
+                        help=('record of processed races used by '
+                              '--incremental, default is '
+                              '~/.cache/raceresults/ledger.sqlite'))
+
+
+def _ledger(args):
+    """
+    Open the ledger of processed races if running incrementally.
+    """
+    if not args.incremental:
+        return None
+
+    from .ledger import Ledger
+    return Ledger(args.ledger)
+
+
+def _add_date_range_arguments(parser):
+    """
+    Options for date ranges spanning several months or years.
+    """
+    parser.add_argument('--start-date',
+                        dest='start_date',
+                        type=_iso_date,
+                        help=('first day of a date range, such as 2015-11-28, '
+                              'overriding -y, -m and -d'))
+    parser.add_argument('--stop-date',
+                        dest='stop_date',
+                        type=_iso_date,
+                        help=('last day of a date range, such as 2016-01-03, '
+                              'overriding -y, -m and -d'))
+
+
+def _iso_date(value):
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _date_range(args, start_date, stop_date):
+    """
+    Apply --start-date and --stop-date to a date range.
+    """
+    if args.start_date is not None:
+        start_date = args.start_date
+    if args.stop_date is not None:
+        stop_date = args.stop_date
+    return start_date, stop_date
+
+
+def _add_records_arguments(parser):
+    """
+    Options for exporting structured results.
+    """
+    parser.add_argument('--records',
+                        dest='records',
+                        help=('also write each result to this .csv, .jsonl '
+                              'or .parquet file'))
+
+
+def _add_parallel_arguments(parser):
+    """
+    Options for matching large pages on several processes.
+    """
+    parser.add_argument('--processes',
+                        dest='processes',
+                        default=1,
+                        type=int,
+                        help=('match large pages on this many processes, '
+                              'default is 1'))
+    parser.add_argument('--parallel-threshold',
+                        dest='parallel_threshold',
+                        default=1000000,
+                        type=int,
+                        help=('size in characters of the results text above '
+                              'which a page is matched on several processes, '
+                              'default is 1000000'))
+
+
+def _records(args):
+    """
+    Open the records file, if one was asked for.
+    """
+    if args.records is None:
+        return None
+
+    from .records import open_record_writer
+    return open_record_writer(args.records)
+
+
+def _clubs(parser, args):
+    """
+    Pair up the membership lists with the output files.
+    """
+    output_files = args.output_file
+    if output_files is None:
+        output_files = ['results.html']
+    if len(output_files) != len(args.membership_list):
+        parser.error('Each membership list (--ml) needs its own output file '
+                     '(-o).')
+    return list(zip(args.membership_list, output_files))
+
+
+def _run(func, args, profiler, client):
+    """
+    Run a backend, writing the timing report afterwards if one was asked for.
+    The HTTP client is closed at the end, finishing any archive being
+    recorded.
+    """
+    try:
+        func()
+    finally:
+        try:
+            if args.profile_report is not None:
+                profiler.write_report(args.profile_report)
+        finally:
+            client.close()
+
+
+def _http_client(args):
+    """
+    Construct the HTTP client shared by the backends.
+    """
+    from .archive import HttpArchive
+    from .cache import HttpCache
+    from .client import HttpClient
+
+    cache = None
+    if args.cache_dir is not None:
+        cache = HttpCache(args.cache_dir, ttl=args.cache_ttl,
+                          max_size=args.cache_size * 1024 * 1024)
+    archive = None
+    if args.record is not None:
+        archive = HttpArchive(args.record)
+    elif args.replay is not None:
+        archive = HttpArchive(args.replay, replay=True)
+    return HttpClient(pool_maxsize=args.pool_size, timeout=args.timeout,
+                      cache=cache, archive=archive)
 
 
 def run_active():
@@ -43,6 +238,15 @@ def run_active():
                                  'critical'],
                         default='info',
                         help='verbosity level, default is "info"')
+    parser.add_argument('-j', '--jobs',
+                        dest='jobs',
+                        default=4,
+                        type=int,
+                        help=('pages of results to download ahead, '
+                              'default is 4'))
+    _add_http_arguments(parser)
+    _add_profile_arguments(parser)
+    _add_records_arguments(parser)
     args = parser.parse_args()
 
     year = int(args.year)
@@ -59,12 +263,17 @@ def run_active():
         start_date = datetime.date(year, month, 1)
         stop_date = datetime.date(year, month, datetime.datetime.now().day)
 
+    from .active import ActiveRR
+
     o = ActiveRR(date_range=[start_date, stop_date],
                  membership_list=args.membership_list,
                  verbose=args.verbose,
                  states=states,
-                 output_file=args.output_file)
-    o.run()
+                 output_file=args.output_file,
+                 http_client=_http_client(args),
+                 records=_records(args),
+                 jobs=args.jobs)
+    _run(o.run, args, o.profiler, o.client)
 
 
 def run_bestrace():
@@ -87,13 +296,24 @@ def run_bestrace():
                         type=int,
                         help='month')
     parser.add_argument('-o', '--output', dest='output_file',
-                        default='results.html',
-                        help='output file, default is results.html')
+                        action='append',
+                        help=('output file, one for each membership list, '
+                              'default is results.html'))
     parser.add_argument('-y', '--year', dest='year',
                         default=datetime.date.today().year, help='year')
     parser.add_argument('--ml', dest='membership_list',
-                        help='membership list', required=True)
+                        action='append',
+                        help=('membership list, may be repeated to compile '
+                              'results for several clubs at once'),
+                        required=True)
+    _add_http_arguments(parser)
+    _add_profile_arguments(parser)
+    _add_records_arguments(parser)
+    _add_ledger_arguments(parser)
+    _add_parallel_arguments(parser)
+    _add_date_range_arguments(parser)
     args = parser.parse_args()
+    clubs = _clubs(parser, args)
 
     year = int(args.year)
     month = int(args.month)
@@ -106,13 +326,20 @@ def run_bestrace():
         # Make the range the entire month up until now.
         start_date = datetime.date(year, month, 1)
         stop_date = datetime.date(year, month, datetime.datetime.now().day)
+    start_date, stop_date = _date_range(args, start_date, stop_date)
+
+    from .brrr import BestRace
 
     o = BestRace(start_date=start_date,
                  stop_date=stop_date,
-                 membership_list=args.membership_list,
-                 output_file=args.output_file,
-                 verbose=args.verbose)
-    o.run()
+                 clubs=clubs,
+                 verbose=args.verbose,
+                 http_client=_http_client(args),
+                 ledger=_ledger(args),
+                 records=_records(args),
+                 processes=args.processes,
+                 parallel_threshold=args.parallel_threshold)
+    _run(o.run, args, o.profiler, o.client)
 
 
 def run_coolrunning():
@@ -142,8 +369,9 @@ def run_coolrunning():
                         help='verbosity level, default is "info"')
     parser.add_argument('-o', '--output',
                         dest='output_file',
-                        default='results.html',
-                        help='output file, default is results.html')
+                        action='append',
+                        help=('output file, one for each membership list, '
+                              'default is results.html'))
     parser.add_argument('-s', '--states',
                         dest='states',
                         nargs='+',
@@ -151,9 +379,23 @@ def run_coolrunning():
                         help='state, default is ma')
     parser.add_argument('--ml',
                         dest='membership_list',
-                        help='membership list',
+                        action='append',
+                        help=('membership list, may be repeated to compile '
+                              'results for several clubs at once'),
                         required=True)
+    parser.add_argument('-j', '--jobs',
+                        dest='jobs',
+                        default=4,
+                        type=int,
+                        help='race pages to download at once, default is 4')
+    _add_http_arguments(parser)
+    _add_profile_arguments(parser)
+    _add_records_arguments(parser)
+    _add_ledger_arguments(parser)
+    _add_parallel_arguments(parser)
+    _add_date_range_arguments(parser)
     args = parser.parse_args()
+    clubs = _clubs(parser, args)
 
     year = int(args.year)
     month = int(args.month)
@@ -163,16 +405,26 @@ def run_coolrunning():
         start_date = datetime.date(year, month, int(day[0]))
         stop_date = datetime.date(year, month, int(day[1]))
     else:
-        start_date = None
-        stop_date = None
+        # Make the range the entire month.
+        start_date = datetime.date(year, month, 1)
+        ndays = calendar.monthrange(year, month)[1]
+        stop_date = datetime.date(year, month, ndays)
+    start_date, stop_date = _date_range(args, start_date, stop_date)
+
+    from .crrr import CoolRunning
 
     o = CoolRunning(start_date=start_date,
                     stop_date=stop_date,
-                    membership_list=args.membership_list,
-                    output_file=args.output_file,
+                    clubs=clubs,
                     states=args.states,
-                    verbose=args.verbose)
-    o.run()
+                    verbose=args.verbose,
+                    http_client=_http_client(args),
+                    jobs=args.jobs,
+                    ledger=_ledger(args),
+                    records=_records(args),
+                    processes=args.processes,
+                    parallel_threshold=args.parallel_threshold)
+    _run(o.run, args, o.profiler, o.client)
 
 
 def run_compuscore():
@@ -204,12 +456,26 @@ def run_compuscore():
                         help='verbosity level, default is "info"')
     parser.add_argument('-o', '--output',
                         dest='output_file',
-                        default='results.html',
-                        help='output file, default is results.html')
+                        action='append',
+                        help=('output file, one for each membership list, '
+                              'default is results.html'))
     parser.add_argument('--ml', dest='membership_list',
-                        help='membership list', required=True)
-
+                        action='append',
+                        help=('membership list, may be repeated to compile '
+                              'results for several clubs at once'),
+                        required=True)
+    parser.add_argument('-j', '--jobs',
+                        dest='jobs',
+                        default=4,
+                        type=int,
+                        help='result files to download at once, default is 4')
+    _add_http_arguments(parser)
+    _add_profile_arguments(parser)
+    _add_records_arguments(parser)
+    _add_ledger_arguments(parser)
+    _add_parallel_arguments(parser)
     args = parser.parse_args()
+    clubs = _clubs(parser, args)
 
     year = int(args.year)
     month = int(args.month)
@@ -218,12 +484,19 @@ def run_compuscore():
     start_date = datetime.date(year, month, int(day[0]))
     stop_date = datetime.date(year, month, int(day[1]))
 
+    from .csrr import CompuScore
+
     o = CompuScore(start_date=start_date,
                    stop_date=stop_date,
-                   membership_list=args.membership_list,
-                   output_file=args.output_file,
-                   verbose=args.verbose)
-    o.run()
+                   clubs=clubs,
+                   verbose=args.verbose,
+                   http_client=_http_client(args),
+                   jobs=args.jobs,
+                   ledger=_ledger(args),
+                   records=_records(args),
+                   processes=args.processes,
+                   parallel_threshold=args.parallel_threshold)
+    _run(o.run, args, o.profiler, o.client)
 
 
 def run_new_jersey():
@@ -259,10 +532,11 @@ def run_new_jersey():
                         help='output file, default is results.html')
     parser.add_argument('--ml', dest='membership_list',
                         help='membership list', required=True)
-
+    _add_http_arguments(parser)
+    _add_profile_arguments(parser)
     args = parser.parse_args()
 
-    rrobj = RaceResults(output_file=args.output_file)
+    http_client = _http_client(args)
 
     year = int(args.year)
     month = int(args.month)
@@ -271,52 +545,33 @@ def run_new_jersey():
     start_date = datetime.date(year, month, int(day[0]))
     stop_date = datetime.date(year, month, int(day[1]))
 
-    with tempfile.NamedTemporaryFile() as afile:
-        with tempfile.NamedTemporaryFile() as bfile:
-            with tempfile.NamedTemporaryFile() as cfile:
-                with tempfile.NamedTemporaryFile() as dfile:
-
-                    CompuScore(start_date=start_date,
-                               stop_date=stop_date,
-                               membership_list=args.membership_list,
-                               output_file=afile.name,
-                               verbose=args.verbose).run()
-                    BestRace(start_date=start_date,
-                             stop_date=stop_date,
-                             membership_list=args.membership_list,
-                             output_file=bfile.name,
-                             verbose=args.verbose).run()
-                    ActiveRR(date_range=[start_date, stop_date],
-                             membership_list=args.membership_list,
-                             verbose=args.verbose,
-                             states=['NY', 'NJ', 'PA'],
-                             output_file=cfile.name).run()
-                    NewYorkRR(start_date=start_date,
-                              stop_date=stop_date,
-                              team='RARI',
-                              output_file=dfile.name).run()
-
-                    # Rewind all four files.
-                    afile.seek(0)
-                    bfile.seek(0)
-                    cfile.seek(0)
-                    dfile.seek(0)
-
-                    rrobj.initialize_output_file()
-
-                    with open(args.output_file, 'rt') as ofile:
-                        odoc = html.document_fromstring(ofile.read())
-                    for tfile in [afile, bfile, cfile, dfile]:
-                        doc = html.document_fromstring(tfile.read())
-                        divs = doc.cssselect('div.race')
-                        for div in divs:
-                            odoc.append(div)
-
-                    result = etree.tostring(odoc, pretty_print=True,
-                                            method="html", encoding='unicode')
-
-                    with open(rrobj.output_file, 'w') as fptr:
-                        fptr.write(result)
+    from .active import ActiveRR
+    from .brrr import BestRace
+    from .csrr import CompuScore
+    from .nyrr import NewYorkRR
+    from .orchestrator import run_backends
+
+    backends = [CompuScore(start_date=start_date,
+                           stop_date=stop_date,
+                           membership_list=args.membership_list,
+                           verbose=args.verbose,
+                           http_client=http_client),
+                BestRace(start_date=start_date,
+                         stop_date=stop_date,
+                         membership_list=args.membership_list,
+                         verbose=args.verbose,
+                         http_client=http_client),
+                ActiveRR(date_range=[start_date, stop_date],
+                         membership_list=args.membership_list,
+                         verbose=args.verbose,
+                         states=['NY', 'NJ', 'PA'],
+                         http_client=http_client),
+                NewYorkRR(start_date=start_date,
+                          stop_date=stop_date,
+                          team='RARI',
+                          http_client=http_client)]
+    _run(lambda: run_backends(backends, args.output_file), args,
+         http_client.profiler, http_client)
 
 
 def run_nyrr():
@@ -354,7 +609,13 @@ def run_nyrr():
                         dest='team',
                         default='RARI',
                         help='team code (i.e. "RARI")')
-
+    parser.add_argument('-j', '--jobs',
+                        dest='jobs',
+                        default=4,
+                        type=int,
+                        help='events to search at once, default is 4')
+    _add_http_arguments(parser)
+    _add_profile_arguments(parser)
     args = parser.parse_args()
 
     year = int(args.year)
@@ -364,9 +625,13 @@ def run_nyrr():
     start_date = datetime.date(year, month, int(day[0]))
     stop_date = datetime.date(year, month, int(day[1]))
 
+    from .nyrr import NewYorkRR
+
     o = NewYorkRR(start_date=start_date,
                   stop_date=stop_date,
                   team=args.team,
                   output_file=args.output_file,
-                  verbose=args.verbose)
-    o.run()
+                  verbose=args.verbose,
+                  http_client=_http_client(args),
+                  jobs=args.jobs)
+    _run(o.run, args, o.profiler, o.client)
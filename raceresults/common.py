@@ -2,10 +2,19 @@
 """
 import datetime as dt
 import logging
-import re
+import os
+import threading
 
 from lxml import etree, html
-import pandas as pd
+
+from .client import HttpClient
+from .club import Club
+from .matcher import MembershipMatcher
+from .membership import Membership
+from .output import ResultsCollector, ResultsWriter, skeleton
+from .parallel import MatchPool
+from .race import RaceContext
+from .records import ResultRecord, parse_place, parse_time
 
 logging.basicConfig()
 
@@ -14,27 +23,60 @@ class RaceResults:
     """
     Attributes
     ----------
+    source : str
+        Name of the results site, recorded with each result.
     start_date, stop_date : datetime.datetime
         date range to restrict race searches
-    df : pandas dataframe
-        contains membership list information, including regular expressions
+    members : list
+        first and last names of each club member
+    membership : Membership
+        the loaded membership list, including its content digest
+    matcher : MembershipMatcher
+        finds members of the membership list in race results
     output_file : str
         All race results written to this file
+    clubs : list
+        Club objects.  Each page is downloaded and parsed once, matched
+        against all of the clubs at once, and each club's races are written
+        to its own output file.  The first club's membership list is also
+        available as the membership, members and matcher attributes.
     logger : logging.logger
         Handles verbosity of program execution.  All is logged
         to standard output.
     states : list
         List of states to search.  Not all subclasses use this.
-    html : str
-        HTML from downloaded web page
-    downloaded_url:  URL to a race that has been downloaded.  We link back
-        to it in the resulting output.
+    client : HttpClient
+        Pooled HTTP client through which all downloads go.
+    jobs : int
+        Number of pages that may be downloaded concurrently.
+    profiler : Profiler
+        Records the time spent downloading, parsing, matching and writing
+        each race page.
+    ledger : Ledger
+        If not None, races already processed against the same roster are
+        skipped.
+    records : record writer
+        If not None, each member's result is also written to it as a
+        ResultRecord.
+    processes : int
+        Number of processes over which the text of a large page is matched.
+    parallel_threshold : int
+        Pages with at least this many characters of results text are matched
+        on several processes, if there is more than one.
+
+    Nothing about the race being processed is kept here.  It travels in a
+    RaceContext instead, and the output is written under a lock, so that one
+    instance may process races from several threads at once.
     """
+    source = None
 
     def __init__(self, verbose='INFO', membership_list=None,
                  start_date=dt.datetime.now() - dt.timedelta(days=7),
                  stop_date=dt.datetime.now(), states=None,
-                 output_file=None):
+                 output_file=None, http_client=None, jobs=1,
+                 membership_cache=None, profiler=None, clubs=None,
+                 ledger=None, records=None, processes=1,
+                 parallel_threshold=1000000):
         """
         Parameters
         ----------
@@ -46,72 +88,261 @@ class RaceResults:
             Path to output file of race results.
         verbose : str
             Level of verbosity
+        http_client : HttpClient
+            Client through which all downloads go.  One is created if not
+            provided.
+        jobs : int
+            Number of pages that may be downloaded concurrently.
+        membership_cache : str
+            Directory in which compiled membership lists are cached.
+        profiler : Profiler
+            Records the time spent in each phase.  The HTTP client's profiler
+            is used if not provided, so that downloads are recorded with the
+            other phases.
+        clubs : list
+            (membership list, output file) pairs, one for each club.  If
+            provided, this takes the place of membership_list and
+            output_file.
+        ledger : Ledger
+            Record of the races already processed.  Supplying one turns on
+            incremental mode.
+        records : record writer
+            Such as a CsvRecordWriter, see records.open_record_writer.  It is
+            closed along with the output file.
+        processes : int
+            Number of processes over which the text of a large page is
+            matched.
+        parallel_threshold : int
+            Size in characters of the results text above which a page is
+            matched on several processes.
         """
         self.start_date = start_date
         self.stop_date = stop_date
-        self.output_file = output_file
         self.states = states
 
+        if clubs is None:
+            clubs = [(membership_list, output_file)]
+        self.clubs = []
+        for membership_file, club_output_file in clubs:
+            name = None
+            if membership_file is not None:
+                name = os.path.splitext(os.path.basename(membership_file))[0]
+            self.clubs.append(Club(None, club_output_file, name=name))
+        self.output_file = self.clubs[0].output_file
+
+        # Matchers combining the membership lists of all of the clubs, keyed
+        # by matcher class.
+        self._club_matchers = {}
+
+        if http_client is None:
+            http_client = HttpClient(profiler=profiler)
+        self.client = http_client
+        if profiler is None:
+            profiler = http_client.profiler
+        self.profiler = profiler
+        self.jobs = jobs
+        self.ledger = ledger
+        self.records = records
+
+        # Races written from different threads must not interleave.
+        self._write_lock = threading.RLock()
+
+        # Process pools for matching large pages, keyed by matcher class.
+        self.processes = processes
+        self.parallel_threshold = parallel_threshold
+        self._match_pools = {}
+        self._pool_lock = threading.Lock()
+
         # Set up a logger for relaying progress back to the user.
         self.logger = logging.getLogger('race_results')
         self.logger.setLevel(getattr(logging, verbose.upper()))
 
-        if membership_list is not None:
-            self.load_membership_list(membership_list)
+        self.membership_cache = membership_cache
+        for club, (membership_file, _) in zip(self.clubs, clubs):
+            if membership_file is None:
+                continue
+            if club is self.clubs[0]:
+                self.load_membership_list(membership_file)
+            else:
+                club.membership = Membership.load(
+                    membership_file, cache_dir=self.membership_cache)
 
-        # This may be overridden by a subclass run time.
-        self.downloaded_url = None
+    def new_race(self, url=None, content=None, text=None, date=None):
+        """
+        Start the context for a race from this results site.
 
-        self.html = None
+        Parameters
+        ----------
+        url : str
+            URL of the race page.
+        content : bytes
+            The page as downloaded.
+        text : str
+            The page as decoded text.
+        date : datetime.date
+            Date of the race, if known.
+
+        Returns
+        -------
+        RaceContext
+        """
+        return RaceContext(url=url, content=content, text=text,
+                           source=self.source, date=date)
 
     def match_against_membership(self, line):
         """
         We have a line of text from the race file.  Match it against the
         membership list.
         """
-        for _, regex in self.df['fname_lname_regex'].iteritems():
-            if regex.search(line):
-                return(True)
-        return(False)
+        return self.matcher.search(line) is not None
 
     def load_membership_list(self, membership_file):
         """
         Load the membership file.
 
-        In addition, construct regular expressions for each member that we use
-        to search for race results.
+        In addition, construct a matcher for all the members that we use to
+        search for race results.  The compiled matcher is cached on disk, so
+        this is cheap unless the file has changed since it was last loaded.
 
         Parameters
         ----------
         membership_list : str
             CSV or Excel spreadsheet file of club membership
         """
-        try:
-            df = pd.read_csv(membership_file)
-        except:
-            df = pd.read_excel(membership_file)
-        cols = [col.lower() for col in df]
-        df.columns = cols
-
-        if 'fname' not in df.columns and 'lname' not in df.columns:
-            msg = 'The membership file must have both "FName" and '
-            msg += '"LName" columns (first name and last name).'
-            raise RuntimeError(msg)
-
-        df['fname_lname_regex'] = None
-        for j in range(len(df)):
-            # Use word boundaries to prevent false positives, e.g. "Ed Ford"
-            # does not cause every fricking person from "New Bedford" to
-            # match.  Here's an example line to match.
-            #   '60 Gene Gugliotta       North Plainfiel,NJ 53 M U '
-            # The first and last names must be separated by just white space.
-            pattern = r'\b(?:{first}\s{last})|(?:{last}\s+{first})\b'
-            pattern = pattern.format(first=df['fname'][j],
-                                     last=df['lname'][j])
-
-            df['fname_lname_regex'][j] = re.compile(pattern, re.IGNORECASE)
-
-        self.df = df
+        # Use word boundaries to prevent false positives, e.g. "Ed Ford"
+        # does not cause every fricking person from "New Bedford" to
+        # match.  Here's an example line to match.
+        #   '60 Gene Gugliotta       North Plainfiel,NJ 53 M U '
+        # The first and last names must be separated by just white space.
+        # All the members are compiled into a single automaton so that the
+        # cost of searching a line does not depend on the size of the club.
+        self.membership = Membership.load(membership_file,
+                                          cache_dir=self.membership_cache)
+        self.members = self.membership.members
+        self.matcher = self.membership.matcher()
+        self.clubs[0].membership = self.membership
+        self._club_matchers = {}
+        self.close_match_pools()
+
+    def club_matcher(self, cls=MembershipMatcher):
+        """
+        Return a matcher of the given class for the members of every club,
+        each member being tagged by the index of the club.
+        """
+        matcher = self._club_matchers.get(cls)
+        if matcher is None:
+            matcher = cls.combine([club.membership.matcher(cls)
+                                   for club in self.clubs])
+            self._club_matchers[cls] = matcher
+        return matcher
+
+    def club_lines(self, text, cls=MembershipMatcher):
+        """
+        Scan a whole document once for the members of all of the clubs.
+
+        Parameters
+        ----------
+        text : str
+            Text of an entire results file.
+        cls : class
+            Matcher class to use.
+
+        Returns
+        -------
+        list
+            For each club, the lines of the text mentioning its members, in
+            page order.
+        """
+        if self.processes > 1 and len(text) >= self.parallel_threshold:
+            return self._parallel_club_lines(text, cls)
+
+        if len(self.clubs) == 1:
+            matcher = self.clubs[0].membership.matcher(cls)
+            return [list(matcher.matching_lines(text))]
+
+        club_lines = [[] for club in self.clubs]
+        for start, end, tags in self.club_matcher(cls).tagged_lines(text):
+            for tag in tags:
+                club_lines[tag].append(text[start:end])
+        return club_lines
+
+    def _parallel_club_lines(self, text, cls):
+        pool = self.match_pool(cls)
+        if len(self.clubs) == 1:
+            return [pool.matching_lines(text)]
+
+        club_lines = [[] for club in self.clubs]
+        for line, tags in pool.tagged_lines(text):
+            for tag in tags:
+                club_lines[tag].append(line)
+        return club_lines
+
+    def match_pool(self, cls=MembershipMatcher):
+        """
+        Return the process pool matching large pages with a matcher of the
+        given class, starting it the first time it is needed.
+        """
+        with self._pool_lock:
+            pool = self._match_pools.get(cls)
+            if pool is None:
+                if len(self.clubs) == 1:
+                    matcher = self.clubs[0].membership.matcher(cls)
+                else:
+                    matcher = self.club_matcher(cls)
+                pool = MatchPool(matcher, processes=self.processes)
+                self._match_pools[cls] = pool
+        return pool
+
+    def close_match_pools(self):
+        """
+        Shut down any processes started for matching.
+        """
+        with self._pool_lock:
+            for pool in self._match_pools.values():
+                pool.close()
+            self._match_pools = {}
+
+    def club_hits(self, text):
+        """
+        Return the indices of the clubs having a member mentioned in a short
+        piece of text, such as a runner's name.
+        """
+        if len(self.clubs) == 1:
+            return [0] if self.match_against_membership(text) else []
+        return sorted(self.club_matcher().tags(text))
+
+    def roster(self):
+        """
+        Identify the versions of the membership lists being matched against.
+        """
+        return ','.join(club.membership.digest for club in self.clubs
+                        if club.membership is not None)
+
+    def is_processed(self, url, content):
+        """
+        In incremental mode, has this version of a race page already been
+        processed against the current roster?
+
+        Parameters
+        ----------
+        url : str
+            URL of the race page.
+        content : str or bytes
+            The page as downloaded.
+        """
+        if self.ledger is None:
+            return False
+        if self.ledger.is_processed(url, content, self.roster()):
+            self.logger.info('Already processed {}, skipping.'.format(url))
+            return True
+        return False
+
+    def mark_processed(self, url, content):
+        """
+        In incremental mode, record that a race page has been processed.
+        """
+        if self.ledger is not None:
+            self.ledger.record(url, content, self.roster())
 
     def run(self):
         """
@@ -119,31 +350,124 @@ class RaceResults:
         provided list.
         """
         self.initialize_output_file()
-        self.compile_web_results()
+        try:
+            self.compile_web_results()
+        finally:
+            self.finalize_output_file()
 
-    def insert_race_results(self, results):
+    def collect(self):
         """
-        Insert HTML-ized results into the output file.
+        Compile the requested results in memory instead of writing them to
+        the output file.
+
+        Returns
+        -------
+        list
+            Serialized race <div> elements, in the order produced.
         """
-        parser = etree.HTMLParser()
-        tree = etree.parse(self.output_file, parser)
-        root = tree.getroot()
-        body = root.findall('.//body')[0]
-        body.append(results)
+        for club in self.clubs:
+            club.writer = ResultsCollector()
+        try:
+            self.compile_web_results()
+        finally:
+            self.close_match_pools()
+        return self.clubs[0].writer.fragments
 
-        result = etree.tostring(root, pretty_print=True, method="html",
-                                encoding='unicode')
+    def insert_race_results(self, results, club=0):
+        """
+        Append HTML-ized results to the output file.
 
-        # Aids in readability.
-        result = result.replace('\r', '\n')
+        Parameters
+        ----------
+        results : lxml.etree.Element
+            DIV element containing "finished" race results.
+        club : int
+            Index of the club whose output file gets the race.
+        """
+        with self._write_lock:
+            self.clubs[club].writer.write(results)
 
-        # Replace latin-1 non-breaking space with a space.
-        result = result.replace('\xa0', ' ')
+    def insert_club_results(self, club_results, webify, race,
+                            cls=MembershipMatcher):
+        """
+        Webify and write out each club's results for a race.
 
-        with open(self.output_file, 'w') as fptr:
-            fptr.write(result)
+        Parameters
+        ----------
+        club_results : list
+            For each club, its results from the race.
+        webify : callable
+            Turns a list of results into a race DIV element.
+        race : RaceContext
+            The race.
+        cls : type
+            Class of the matcher that found the results.
+        """
+        for club, results in enumerate(club_results):
+            if len(results) > 0:
+                with self.profiler.span('write', url=race.url,
+                                        club=self.clubs[club].name):
+                    div = webify(results)
+                    with self._write_lock:
+                        self.insert_race_results(div, club=club)
+                        self.record_results(club, results, div, race,
+                                            cls=cls)
+
+    def record_results(self, club, results, div, race, cls=MembershipMatcher):
+        """
+        Write each member's result in a race to the records file, if there
+        is one.
+
+        Parameters
+        ----------
+        club : int
+            Index of the club.
+        results : list
+            Lines of text or <TR> elements, as passed to the webify method.
+            Those not mentioning a member, such as header rows, are ignored.
+        div : lxml.etree.Element
+            The webified race, from which the race name is taken.
+        race : RaceContext
+            The race.
+        cls : type
+            Class of the matcher that found the results, with which the
+            member in each result is found again.
+        """
+        if self.records is None:
+            return
+
+        race_name = None
+        for tag in ['h1', 'h2', 'h3']:
+            heading = div.find('.//' + tag)
+            if heading is not None and heading.text is not None:
+                race_name = heading.text.strip()
+                break
 
-    def construct_source_url_reference(self, source):
+        membership = self.clubs[club].membership
+        matcher = membership.matcher(cls)
+        for result in results:
+            if isinstance(result, str):
+                raw = result.rstrip()
+                place = parse_place(raw)
+            else:
+                cells = [cell.text_content().strip() for cell in result]
+                raw = ' | '.join(cells)
+                place = parse_place(cells[0]) if len(cells) > 0 else None
+
+            matchobj = matcher.search(raw)
+            if matchobj is None:
+                continue
+            member = membership.members[matchobj.member]
+
+            record = ResultRecord(self.clubs[club].name, matchobj.member,
+                                  '{} {}'.format(member.fname, member.lname),
+                                  race_name, race.date, race.source, race.url,
+                                  raw, place=place,
+                                  time=parse_time(raw, matchobj.end))
+            with self._write_lock:
+                self.records.write(record)
+
+    def construct_source_url_reference(self, source, url):
         """
         Construct HTML that references the source of the race information.
 
@@ -152,13 +476,15 @@ class RaceResults:
         source : str
             Name for web site from which the information comes, such as
             "CoolRunning" or "Compuscore".
+        url : str
+            URL of the race results.
         """
         p = etree.Element('p')
         span = etree.Element('span')
         span.text = 'Complete results '
         p.append(span)
         a = etree.Element('a')
-        a.set('href', self.downloaded_url)
+        a.set('href', url)
         a.text = 'here'
         p.append(a)
         span = etree.Element('span')
@@ -166,18 +492,21 @@ class RaceResults:
         p.append(span)
         return p
 
-    def compile_race_results(self):
+    def compile_race_results(self, race):
         """
         Go through a single race file and collect results.
+
+        Parameters
+        ----------
+        race : RaceContext
+            The race, with the text of the page.
         """
-        results = []
-        for line in self.html.split('\n'):
-            if self.match_against_membership(line):
-                results.append(line)
+        with self.profiler.span('match', url=race.url, bytes=len(race.text)):
+            club_results = self.club_lines(race.text)
 
-        if len(results) > 0:
-            results = self.webify_results(results)
-            self.insert_race_results(results)
+        self.insert_club_results(
+            club_results, lambda results: self.webify_results(results, race),
+            race)
 
     def initialize_output_file(self):
         """
@@ -193,11 +522,16 @@ class RaceResults:
             </body>
         </html>
         """
-        ofile = etree.Element('html')
-        head = etree.SubElement(ofile, 'head')
-        link = etree.SubElement(head, 'link')
-        link.set('rel', 'stylesheet')
-        link.set('href', 'rr.css')
-        link.set('type', 'text/css')
-        etree.SubElement(ofile, 'body')
-        etree.ElementTree(ofile).write(self.output_file, pretty_print=True)
+        for club in self.clubs:
+            club.writer = ResultsWriter(club.output_file, skeleton())
+
+    def finalize_output_file(self):
+        """
+        Close off the output file once all the races have been written.
+        """
+        for club in self.clubs:
+            if club.writer is not None:
+                club.writer.close()
+        if self.records is not None:
+            self.records.close()
+        self.close_match_pools()
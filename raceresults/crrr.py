@@ -1,14 +1,63 @@
 """
 Backend class for handling CoolRunning race results.
 """
-import itertools
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import copy
 import re
 import warnings
 
-from lxml import etree, html
-import requests
+from lxml import etree
 
 from .common import RaceResults
+from .index import RaceIndex, coolrunning_races
+from .page import RacePage
+
+# The race company identifier in the head of a page, e.g.
+#
+#     <meta name="Author" content="colonial" />
+_AUTHOR_META_REGEX = re.compile(
+    rb"""<meta\s[^>]*name\s*=\s*["']?author\b[^>]*>""", re.IGNORECASE)
+_CONTENT_REGEX = re.compile(rb"""content\s*=\s*["']([^"']*)["']""",
+                            re.IGNORECASE)
+_END_OF_HEAD_REGEX = re.compile(rb'</head\s*>|<body\b', re.IGNORECASE)
+
+# Give up looking for the Author meta tag this far into a page.
+MAX_HEAD_SIZE = 64 * 1024
+
+
+def head_author(head):
+    """
+    Read the race company identifier from the start of a page.
+
+    Parameters
+    ----------
+    head : bytes
+        The page as far as it has been downloaded.
+
+    Returns
+    -------
+    str
+        The author, or None if the Author meta tag has not turned up yet.
+    """
+    matchobj = _AUTHOR_META_REGEX.search(head)
+    if matchobj is None:
+        return None
+    matchobj = _CONTENT_REGEX.search(matchobj.group())
+    if matchobj is None:
+        return None
+    return matchobj.group(1).decode('latin1')
+
+
+def race_prefix(url):
+    """
+    The part of a race URL common to all its result files, e.g.
+
+        http://www.coolrunning.com/results/15/ma/Oct17_Landma_set
+
+    for http://www.coolrunning.com/results/15/ma/Oct17_Landma_set2.shtml
+    """
+    return re.sub(r'\d*\.shtml$', '', url)
 
 
 class CoolRunning(RaceResults):
@@ -17,38 +66,52 @@ class CoolRunning(RaceResults):
 
     Attributes
     ----------
-    author : str
-        Identifier for the authority or racing company that produced the
-        results.
+    skip_authors : dict
+        Authors whose results are not parsed, with the message logged when
+        one of their races is skipped.
+    skipped : dict
+        Maps the URL prefixes of the races skipped so far to their authors.
     """
+    source = 'CoolRunning'
+
+    skip_authors = {
+        # 'colonial' is a local race series.  Gawd-awful
+        # excel-to-bastardized-html.  The hell with it.
+        #
+        # 'opportunity' seems to be CMS 52 Week Series
+        'colonial': 'Skipping {0} race series.',
+        'opportunity': 'Skipping {0} race series.',
+        'Harriers': 'Skipping harriers (snowstorm classic?) series.',
+        'jalfano': 'Skipping CMS(?) series.',
+        'DavidWill': 'Skipping {0} pattern (unhandled XML pattern).',
+        'FFAST': 'Skipping {0} pattern (unhandled XML pattern).',
+        'lungne': 'Skipping {0} pattern (unhandled XML pattern).',
+        'northeastracers': 'Skipping {0} pattern (unhandled XML pattern).',
+        'sri': 'Skipping {0} pattern (unhandled XML pattern).',
+        'WCRCSCOTT': 'Skipping {0} XML pattern (looks like a race series).',
+    }
+
     def __init__(self, **kwargs):
         RaceResults.__init__(self, **kwargs)
 
-        self.author = None
+        self.skipped = {}
 
     def compile_web_results(self):
         """
         Compile race results for all the requested states.
         """
         for state in self.states:
-
-            # Download state "master" list
             self.logger.info('Processing {}...'.format(state))
-            state_file = state + '.shtml'
-            url = 'http://www.coolrunning.com/results/{0}/{1}'
-            url = url.format(self.start_date.strftime('%y'), state_file)
-            response = requests.get(url)
+            index = self.state_index(state)
+            self.process_races(index.between(self.start_date,
+                                             self.stop_date))
 
-            self.process_state_master_list(state, response)
-
-    def construct_state_match_pattern(self, state):
+    def state_index(self, state):
         """
-        Want to match strings like
-
-        http://www.coolrunning.com/results/07/ma/Jan16_Coloni_set1.shtml
+        Index the races in a state over the requested date range.
 
-        So we construct a regular expression to match against
-        all the dates in the specified range.
+        The state "master" list for each year in the range is downloaded and
+        parsed just once.
 
         Parameters
         ----------
@@ -57,135 +120,248 @@ class CoolRunning(RaceResults):
 
         Returns
         -------
-        regex : pattern object
-            Matches a pattern like
+        RaceIndex
+        """
+        index = RaceIndex()
+        for year in range(self.start_date.year, self.stop_date.year + 1):
+            url = 'http://www.coolrunning.com/results/{0:02d}/{1}.shtml'
+            url = url.format(year % 100, state)
+            response = self.client.get(url)
+            index.update(coolrunning_races(response.text))
+        return index
+
+    def process_races(self, races):
+        """
+        Compile results for a list of races.
 
-            http://www.coolrunning.com/results/MM/ST/MMMDDXXXXX.shtml
+        Parameters
+        ----------
+        races : list
+            Race tuples from a RaceIndex.
+        """
+        top_level_urls = [race.url for race in races]
+
+        # Secondary result files that are themselves listed are processed
+        # in their own right.
+        listed = set(top_level_urls)
+
+        # The race pages are downloaded concurrently, but processed in the
+        # order in which they appear in the index.  Only a few races are
+        # downloaded ahead of the one being processed, so that the pages
+        # waiting their turn are not all held in memory at once.
+        pending = collections.deque(races)
+        in_flight = collections.deque()
+        read_ahead = 2 * max(self.jobs, 1)
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while True:
+                while len(pending) > 0 and len(in_flight) < read_ahead:
+                    race = pending.popleft()
+                    future = executor.submit(self.fetch_race, executor,
+                                             race.url, listed)
+                    in_flight.append((race, future))
+
+                if len(in_flight) == 0:
+                    break
+
+                race, future = in_flight.popleft()
+                top_level_url = race.url
+                self.logger.info(top_level_url)
+                response, inner_futures = future.result()
+                if response is None:
+                    continue
+                if not self.is_processed(top_level_url, response.text):
+                    context = self.new_race(top_level_url, text=response.text,
+                                            date=race.date)
+                    self.compile_race_results(context)
+                    self.mark_processed(top_level_url, response.text)
+
+                for inner_url, inner_future in inner_futures:
+                    self.logger.info(inner_url)
+                    inner_response = inner_future.result()
+                    if self.is_processed(inner_url, inner_response.text):
+                        continue
+                    context = self.new_race(inner_url,
+                                            text=inner_response.text,
+                                            date=race.date)
+                    self.compile_race_results(context)
+                    self.mark_processed(inner_url, inner_response.text)
+
+    def fetch_race(self, executor, top_level_url, skip=()):
         """
-        pattern = '/results/'
-        pattern += self.start_date.strftime('%y')
-        pattern += '/'
-        pattern += state
-        pattern += '/'
-        pattern += self.start_date.strftime('%b')
+        Download a race page and queue up downloads of any secondary result
+        files it links to.
 
-        # continue with a regexp to match any of the days in the date range.
-        # It's a non-capturing group.
-        day_range = '(?:'
-        for day in range(self.start_date.day, self.stop_date.day):
-            day_range += "%d_|" % day
-        day_range += '%d_)' % self.stop_date.day
+        Parameters
+        ----------
+        executor : concurrent.futures.Executor
+            Pool on which the secondary downloads are queued.
+        top_level_url : str
+            URL of the race, such as
+            http://www.coolrunning.com/results/15/ma/Oct17_Landma_set1.shtml
+        skip : set
+            URLs of secondary result files not to download.
 
-        pattern += day_range
+        Returns
+        -------
+        tuple
+            The response for the race page, plus a list of (url, future)
+            pairs for the secondary result files.  The response is None if
+            the race is by an author whose results are skipped.
+        """
+        author = self.skipped_author(top_level_url)
+        if author is not None:
+            msg = 'Not downloading {0}, a {1} race.'
+            self.logger.info(msg.format(top_level_url, author))
+            return None, []
+
+        # Stop the download as soon as the Author meta tag shows that the
+        # race is one we skip, and never ask for its other result files.
+        response = self.client.get(top_level_url,
+                                   peek=self.author_peek(top_level_url))
+        if response is None:
+            return None, []
+
+        inner_futures = [(url, executor.submit(self.client.get, url))
+                         for url in self.secondary_urls(top_level_url,
+                                                        response.text)
+                         if url not in skip]
+        return response, inner_futures
+
+    def author_peek(self, url):
+        """
+        Make a callable for HttpClient.get that abandons the download of a
+        race page once its Author meta tag shows that it would be skipped.
 
-        pattern += '.*shtml'
-        self.logger.debug('Match pattern is %s' % pattern)
-        regex = re.compile(pattern)
-        return regex
+        Parameters
+        ----------
+        url : str
+            URL of the race page.
+        """
+        def peek(head):
+            author = head_author(head)
+            if author is None:
+                if (_END_OF_HEAD_REGEX.search(head) is not None
+                        or len(head) > MAX_HEAD_SIZE):
+                    # No Author meta tag, so read the whole page.
+                    return False
+                return None
+            if author in self.skip_authors:
+                self.logger.info(self.skip_authors[author].format(author))
+                self.remember_skipped(url, author)
+                return True
+            return False
+
+        return peek
+
+    def skipped_author(self, url):
+        """
+        Author of the race at a URL, if it is known to be one that is skipped.
+        """
+        prefix = race_prefix(url)
+        author = self.skipped.get(prefix)
+        if author is None and self.ledger is not None:
+            author = self.ledger.skipped_author(prefix)
+            if author is not None:
+                self.skipped[prefix] = author
+        return author
+
+    def remember_skipped(self, url, author):
+        """
+        Remember that the race at a URL is by an author that is skipped, for
+        the rest of this run and, with a ledger, for later runs.
+        """
+        prefix = race_prefix(url)
+        self.skipped[prefix] = author
+        if self.ledger is not None:
+            self.ledger.record_skipped(prefix, author)
 
-    def process_state_master_list(self, state, response):
+    def secondary_urls(self, top_level_url, markup):
         """
-        Compile results for the specified state.
+        Collect the URLs of any secondary result files.
 
         Parameters
         ----------
-        state : str
-            Two-letter state code, such as 'ma'
-        response : Response object from requests package
-            What's on the other side of the state master list URL
-        """
-        regex = self.construct_state_match_pattern(state)
-
-        relative_urls = regex.findall(response.text)
-
-        for relative_url in relative_urls:
-
-            top_level_url = 'http://www.coolrunning.com' + relative_url
-            race_file = top_level_url.split('/')[-1]
-            self.logger.info(top_level_url)
-
-            response = requests.get(top_level_url)
-            self.downloaded_url = top_level_url
-            html = response.text
-            self.compile_race_results(html)
-
-            # Now collect any secondary result files.
-            #
-            # construct the secondary pattern.  If the race name is something
-            # like "TheRaceSet1.shtml", then the secondary races will be
-            # "TheRaceSet[2345].shmtl" etc.
-            parts = race_file.split('.')
-            base = parts[-2][0:-1]
-            pat = r'<a href="(?P<inner_url>\.\/' + base + r'\d+\.shtml)">'
-            inner_regex = re.compile(pat)
-            for matchobj in inner_regex.finditer(html):
-
-                relative_inner_url = matchobj.group('inner_url')
-                if relative_inner_url in top_level_url:
-                    # Already seen this one.
-                    continue
+        top_level_url : str
+            URL of the race.
+        markup : str
+            HTML from the race web page.
+
+        Returns
+        -------
+        list
+            URLs of the secondary result files.
+        """
+        race_file = top_level_url.split('/')[-1]
+
+        # construct the secondary pattern.  If the race name is something
+        # like "TheRaceSet1.shtml", then the secondary races will be
+        # "TheRaceSet[2345].shmtl" etc.
+        parts = race_file.split('.')
+        base = parts[-2][0:-1]
+        pat = r'<a href="(?P<inner_url>\.\/' + base + r'\d+\.shtml)">'
+        inner_regex = re.compile(pat)
+
+        urls = []
+        for matchobj in inner_regex.finditer(markup):
+
+            relative_inner_url = matchobj.group('inner_url')
+            if relative_inner_url in top_level_url:
+                # Already seen this one.
+                continue
 
-                # Strip off the leading "./" to get the name we use for the
-                # local file.
-                race_file = relative_inner_url[2:]
+            # Strip off the leading "./" to get the name we use for the
+            # local file.
+            race_file = relative_inner_url[2:]
 
-                # Form the full inner url by swapping out the top level
-                # url
-                lst = top_level_url.split('/')
-                lst[-1] = race_file
-                inner_url = '/'.join(lst)
-                self.logger.info(inner_url)
+            # Form the full inner url by swapping out the top level
+            # url
+            lst = top_level_url.split('/')
+            lst[-1] = race_file
+            urls.append('/'.join(lst))
 
-                inner_response = requests.get(inner_url)
-                self.compile_race_results(inner_response.text)
+        return urls
 
-    def compile_vanilla_results(self, markup):
+    def compile_vanilla_results(self, page):
         """
         Compile race results for vanilla CoolRunning races.
 
         Parameters
         ----------
-        markup : str
-            HTML from a race web page.
-        """
-        results = []
+        page : RacePage
+            Parsed race web page.
 
-        doc = html.document_fromstring(markup)
-        try:
-            pre = doc.cssselect('pre')[0]
-        except IndexError:
+        Returns
+        -------
+        list
+            For each club, the lines of the results mentioning its members.
+        """
+        if page.pre is None:
             warnings.warn("No <PRE> element found.  Skipping...")
-            return results
-
-        text = pre.text_content()
-        for line in text.split('\n'):
-            if self.match_against_membership(line):
-                results.append(line)
+            return [[] for club in self.clubs]
 
-        return results
+        return self.club_lines(page.text)
 
-    def compile_ccrr_race_results(self, markup):
+    def compile_ccrr_race_results(self, page):
         """
         This is the format generally used by Cape Cod
         Road Runners.
 
         Parameters
         ----------
-        markup : str
-            HTML from a race web page.
+        page : RacePage
+            Parsed race web page.
 
         Returns
         -------
-        results : list:
-            List of <TR> elements, each row containing an individual result.
+        list
+            For each club, a list of <TR> elements, each row containing an
+            individual result.
         """
-        doc = html.document_fromstring(markup)
-
         # The table rows follow a set of H1, H2, H3, and P tags.  This seems
         # a bit brittle.
-        trs = doc.cssselect('h1 + h2 + h3 + p.subhead + table tr')
+        trs = page.cssselect('h1 + h2 + h3 + p.subhead + table tr')
 
-        results = []
+        club_results = [[] for club in self.clubs]
         for tr in trs:
             tds = tr.getchildren()
 
@@ -196,17 +372,17 @@ class CoolRunning(RaceResults):
             runner_name = tds[1].text
             if runner_name is None:
                 continue
-            for _, regex in self.df['fname_lname_regex'].iteritems():
-                if regex.search(runner_name):
-                    results.append(tr)
+            for club in self.club_hits(runner_name):
+                club_results[club].append(tr)
 
-        if len(results) > 0:
-            # Prepend the header.
-            results.insert(0, trs[0])
+        for results in club_results:
+            if len(results) > 0:
+                # Prepend the header.
+                results.insert(0, trs[0])
 
-        return results
+        return club_results
 
-    def get_author(self, markup):
+    def get_author(self, page):
         """
         Get the race company identifier.
 
@@ -216,89 +392,89 @@ class CoolRunning(RaceResults):
 
         Parameters
         ----------
-        markup : str
-            HTML from a race web page.
+        page : RacePage
+            Parsed race web page.
+
+        Returns
+        -------
+        str
+            The race company identifier.
         """
-        doc = html.document_fromstring(markup)
-        elts = doc.cssselect('meta[name="Author"]')
+        elts = page.cssselect('meta[name="Author"]')
         if len(elts) == 0:
             msg = "Could not parse the race company identifier"
             raise RuntimeError(msg)
-        self.author = elts[0].get('content')
+        return elts[0].get('content')
 
-    def compile_race_results(self, markup):
+    def compile_race_results(self, race):
         """
         Go through a race file and collect results.
 
         Parameters
         ----------
-        markup : str
-            HTML from a race web page.
+        race : RaceContext
+            The race, with the HTML of the page.
         """
-        html = None
-        self.get_author(markup)
-        if self.author in ['CapeCodRoadRunners', 'GreenfieldRecreation']:
+        url = race.url
+
+        # The page is parsed just this once.
+        with self.profiler.span('parse', url=url, bytes=len(race.text)):
+            race.page = RacePage(race.text, url=url)
+            race.doc = race.page.doc
+        page = race.page
+
+        with self.profiler.span('author', url=url) as tags:
+            race.author = author = self.get_author(page)
+            tags['author'] = author
+
+        if author in ['CapeCodRoadRunners', 'GreenfieldRecreation']:
             self.logger.debug('Cape Cod Road Runners pattern')
-            results = self.compile_ccrr_race_results(markup)
-            if len(results) > 0:
-                html = self.webify_ccrr_results(results, markup)
-                self.insert_race_results(html)
-        elif self.author in ['ACCU', 'baystate', 'charlie', 'gstate',
+            compile_results = self.compile_ccrr_race_results
+            webify_results = self.webify_ccrr_results
+        elif author in ['ACCU', 'baystate', 'charlie', 'gstate',
                              'Harrier', 'netiming', 'JFRC', 'mmg1214',
                              'mooserd', 'Spitler', 'SWCL', 'yk']:
             # These cases are verified in the test suite.
             # "charlie" is "Last Mile"
             # "mmg1214" is "Wilbur Racing Systems"
             # "SWCL" is also "Wilbur Racing Systems"
-            results = self.compile_vanilla_results(markup)
-            if len(results) > 0:
-                html = self.webify_vanilla_results(results, markup)
-                self.insert_race_results(html)
-        elif self.author in ['kick610', 'JB Race', 'ab-mac', 'FTO',
+            compile_results = self.compile_vanilla_results
+            webify_results = self.webify_vanilla_results
+        elif author in ['kick610', 'JB Race', 'ab-mac', 'FTO',
                              'NSTC', 'ndatrackxc', 'wcrc']:
             # Assume the usual coolrunning pattern.
             msg = '{0} ==> assuming vanilla Coolrunning pattern'
-            self.logger.debug(msg.format(self.author))
-            results = self.compile_vanilla_results(markup)
-            if len(results) > 0:
-                html = self.webify_vanilla_results(results, markup)
-                self.insert_race_results(html)
-        elif self.author in ['colonial', 'opportunity']:
-            # 'colonial' is a local race series.  Gawd-awful
-            # excel-to-bastardized-html.  The hell with it.
-            #
-            # 'opportunity' seems to be CMS 52 Week Series
-            self.logger.info('Skipping {0} race series.'.format(self.author))
-        elif self.author in ['Harriers']:
-            self.logger.info('Skipping harriers (snowstorm classic?) series.')
-        elif self.author in ['jalfano']:
-            self.logger.info('Skipping CMS(?) series.')
-        elif self.author in ['DavidWill', 'FFAST', 'lungne', 'northeastracers',
-                             'sri']:
-            msg = 'Skipping {0} pattern (unhandled XML pattern).'
-            self.logger.info(msg.format(self.author))
-        elif self.author in ['WCRCSCOTT']:
-            msg = 'Skipping {0} XML pattern (looks like a race series).'
-            self.logger.info(msg.format(self.author))
+            self.logger.debug(msg.format(author))
+            compile_results = self.compile_vanilla_results
+            webify_results = self.webify_vanilla_results
+        elif author in self.skip_authors:
+            msg = self.skip_authors[author]
+            self.logger.info(msg.format(author))
+            self.remember_skipped(url, author)
+            return
         else:
             msg = 'Unknown pattern (\"{0}\"), going to try vanilla CR parsing.'
-            self.logger.warning(msg.format(self.author))
-            results = self.compile_vanilla_results(markup)
-            if len(results) > 0:
-                html = self.webify_vanilla_results(results, markup)
-                self.insert_race_results(html)
+            self.logger.warning(msg.format(author))
+            compile_results = self.compile_vanilla_results
+            webify_results = self.webify_vanilla_results
+
+        with self.profiler.span('match', url=url, author=author):
+            club_results = compile_results(page)
+
+        self.insert_club_results(club_results,
+                                 lambda results: webify_results(results, race),
+                                 race)
 
-    def construct_common_div(self, markup):
+    def construct_common_div(self, race):
         """
         Construct an XHTML element to contain race results.
 
         Parameters
         ----------
-        markup : str
-            HTML from a race web page.
+        race : RaceContext
+            The race, with its parsed page.
         """
-        doc = html.document_fromstring(markup)
-
+        page = race.page
         div = etree.Element('div')
         div.set('class', 'race')
         hr_elt = etree.Element('hr')
@@ -307,23 +483,24 @@ class CoolRunning(RaceResults):
 
         # The H1 tag has the race name.  The H2 tag has the location and date.
         # Both are the only such tabs in the file.
-        h1 = doc.cssselect('h1')[0]
+        h1 = page.cssselect('h1')[0]
         h1_elt = etree.Element('h1')
         h1_elt.text = h1.text
         div.append(h1_elt)
 
-        h2 = doc.cssselect('h2')[0]
+        h2 = page.cssselect('h2')[0]
         h2_elt = etree.Element('h2')
         h2_elt.text = h2.text
         div.append(h2_elt)
 
         # Append the URL if possible.
-        if self.downloaded_url is not None:
-            div.append(self.construct_source_url_reference('Coolrunning'))
+        if race.url is not None:
+            div.append(self.construct_source_url_reference('Coolrunning',
+                                                           race.url))
 
         return(div)
 
-    def webify_ccrr_results(self, results, markup):
+    def webify_ccrr_results(self, results, race):
         """
         Turn the list of results into full HTML.
         This works for Cape Cod Road Runners formatted results.
@@ -332,25 +509,26 @@ class CoolRunning(RaceResults):
         ----------
         results : list
             List of HTML TR rows containing individual race results
-        markup : str
-            HTML from a race web page.
+        race : RaceContext
+            The race, with its parsed page.
 
         Returns
         -------
         div : element tree
             DIV element containing "finished" race results.
         """
-        div = self.construct_common_div(markup)
+        div = self.construct_common_div(race)
 
+        # The rows are copied, as the same row may go to several clubs.
         table = etree.Element('table')
         for tr_elt in results:
             if tr_elt is not None:
-                table.append(tr_elt)
+                table.append(copy.deepcopy(tr_elt))
 
         div.append(table)
         return div
 
-    def webify_vanilla_results(self, result_lst, markup):
+    def webify_vanilla_results(self, result_lst, race):
         """
         Insert CoolRunning results into the output file.
 
@@ -358,17 +536,17 @@ class CoolRunning(RaceResults):
         ----------
         results_lst : list
             List of HTML TR rows containing individual race results
-        markup : str
-            HTML from a race web page.
+        race : RaceContext
+            The race, with its parsed page.
 
         Returns
         -------
         div : element tree
             DIV element containing "finished" race results.
         """
-        div = self.construct_common_div(markup)
+        div = self.construct_common_div(race)
 
-        banner_text = self.parse_banner(markup)
+        banner_text = self.parse_banner(race.page)
 
         pre = etree.Element('pre')
         pre.attrib['class'] = 'actual_results'
@@ -377,7 +555,7 @@ class CoolRunning(RaceResults):
 
         return div
 
-    def parse_banner(self, markup):
+    def parse_banner(self, page):
         """
         Tease out the "banner" from the race file.
 
@@ -386,23 +564,24 @@ class CoolRunning(RaceResults):
 
         Parameters
         ----------
-        markup : str
-            HTML from a race web page.
+        page : RacePage
+            Parsed race web page.
 
         Returns
         -------
         banner : str
             Text to use as a banner.
         """
-        doc = html.document_fromstring(markup)
-        pre = doc.cssselect('pre')[0]
-        text = pre.text_content()
-
-        lines = text.split('\n')
+        text = page.text
 
         # accumulate lines of text until we hit a start of line followed by
         # whitespace followed by a 1 (for 1st place) followed by white space.
-        regex = re.compile(r'^\s*1\b')
-        lst = itertools.takewhile(lambda x: regex.match(x) is None, lines)
-        banner = '\n'.join(lst)
+        regex = re.compile(r'^[^\S\n]*1\b', re.MULTILINE)
+        matchobj = regex.search(text)
+        if matchobj is None:
+            return text
+        lineno = page.line_number(matchobj.start())
+        if lineno == 0:
+            return ''
+        banner = text[:page.line_offsets[lineno] - 1]
         return banner
@@ -1,73 +1,163 @@
 """
 Module for parsing Compuscore race results.
 """
-import gzip
-import io
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import itertools
 import json
-import re
-import tempfile
 import warnings
+import zlib
 
-import requests
 from lxml import etree, html
+import requests
 
 from .common import RaceResults
+from .matcher import PlaceMatcher
+
+# Compuscore serves some files gzipped without saying so in the headers, but
+# gzip streams always begin with these two bytes.
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Size of the pieces in which a response body is decompressed and parsed.
+CHUNK_SIZE = 64 * 1024
+
+
+def gunzip(chunks):
+    """
+    Decompress a gzip stream one chunk at a time.  Several gzip members
+    written back to back are decompressed one after another.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+            chunk = decompressor.unused_data
+            if chunk:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+def read_body(chunks):
+    """
+    Sniff a response body for the gzip magic number.
+
+    Parameters
+    ----------
+    chunks : iterable
+        The body in pieces, such as from requests.Response.iter_content.
+
+    Returns
+    -------
+    tuple
+        Whether the body is gzipped, and an iterator over the body in
+        pieces, decompressed if need be.
+    """
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= len(GZIP_MAGIC):
+            break
+    chunks = itertools.chain([head], chunks)
+    if head.startswith(GZIP_MAGIC):
+        return True, gunzip(chunks)
+    return False, chunks
 
 
 class CompuScore(RaceResults):
     """
     Class for handling compuscore results.
+
+    Attributes
+    ----------
+    detail_batch_size : int
+        Number of events whose details are looked up in a single request.
     """
+    source = 'Compuscore'
+    detail_batch_size = 20
+
     def __init__(self, **kwargs):
         RaceResults.__init__(self, **kwargs)
 
-        # Need to remember the current URL.
-        self.downloaded_url = None
-
-        # Customize the regular expressions.
-        # Use word boundaries to prevent false positives, e.g. "Ed Ford"
-        # does not cause every fricking person from "New Bedford" to
-        # match.  Here's an example line to match.
-        #   '60.Gene Gugliotta       North Plainfiel,NJ 53 M U '
-        # The first and last names must be separated by just white space.
-        #
-        # So, match the following:
-        #     start of line
-        #     place (like first, 2nd, etc.)
-        #     '.'
-        #     First name
-        #     space
-        #     Last name
-        self.df['regex'] = None
-        for _, row in self.df.iterrows():
-            pattern = (r'^\s*(?P<place>\d+)\.' +
-                       row['fname'] + '\s+' + row['lname'] + r'\b')
-            row['regex'] = re.compile(pattern, re.IGNORECASE)
+    def read_body(self, chunks):
+        """
+        Iterate over a body given in pieces, decompressing it on the fly if it
+        is gzipped.
+        """
+        gzipped, chunks = read_body(chunks)
+        if gzipped:
+            self.logger.debug('Content was gzipped')
+        else:
+            self.logger.debug('Content was not gzipped')
+        return chunks
 
     def get_json_from_url(self, url):
         """
         Parameters
         ----------
         url : str
-            URL with embedded gzipped json data
+            URL with embedded json data, which may be gzipped
+
+        The whole payload is downloaded, decompressed and decoded at once.
+        The payloads are small, and the json module has no incremental
+        decoder.
         """
-        response = requests.get(url)
+        response = self.client.get(url)
+        response.raise_for_status()
+        return json.loads(b''.join(self.read_body([response.content])))
 
-        # Get the list of races from the json dump.  The json is gzipped.
-        try:
-            with gzip.GzipFile(fileobj=io.BytesIO(response.content)) as gzf:
-                the_json = json.loads(gzf.read().decode('utf-8'))
-            self.logger.debug('Content was gzipped')
-        except OSError:
-            # Ok, not gzipped.
-            the_json = response.json()
-            self.logger.debug('Content was not gzipped')
+    def get_event_details(self, event_ids):
+        """
+        Look up the details of events, several events to a request.
 
-        return the_json
+        Parameters
+        ----------
+        event_ids : list
+            Event identifiers from the event listing.
+
+        Returns
+        -------
+        list
+            Details of each event, in the order of event_ids.
+        """
+        fmt = 'http://www.compuscore.com/api/races/event-detail?ids={}'
+
+        details = {}
+        for j in range(0, len(event_ids), self.detail_batch_size):
+            batch = event_ids[j:j + self.detail_batch_size]
+            url = fmt.format(','.join(str(event_id) for event_id in batch))
+            try:
+                batch_details = self.get_json_from_url(url)['events']
+            except (requests.HTTPError, ValueError, KeyError) as e:
+                # The events of a batch that is turned down are looked up
+                # one at a time below.
+                msg = 'Could not look up events {} together ({}).'
+                self.logger.warning(msg.format(batch, e))
+                continue
+            for detail in batch_details:
+                details[str(detail.get('id'))] = detail
+
+        lst = []
+        for event_id in event_ids:
+            detail = details.get(str(event_id))
+            if detail is None:
+                # Not in a batched response, so ask for it on its own.
+                url = fmt.format(event_id)
+                detail = self.get_json_from_url(url)['events'][0]
+            lst.append(detail)
+        return lst
 
     def compile_web_results(self):
         """
         Download the race results in the requested time frame.
+
+        The result files are downloaded concurrently, but processed in event
+        order.
         """
         fmt = 'http://www.compuscore.com/api/races/events?date_range={},{}'
         url = fmt.format(self.start_date.strftime('%Y-%m-%d'),
@@ -75,16 +165,15 @@ class CompuScore(RaceResults):
 
         the_json = self.get_json_from_url(url)
 
+        # Now get the race details, from where we get the race URLs.
         events = the_json['events']
-        for event in events:
+        details = self.get_event_details([event['id'] for event in events])
 
-            # Now get the race details, from where we get the race URL.
-            url2 = 'http://www.compuscore.com/api/races/event-detail?ids={}'
-            url2 = url2.format(event['id'])
-            details = self.get_json_from_url(url2)
-            race_name = details['events'][0]['name']
+        urls = []
+        for detail in details:
+            race_name = detail['name']
             print('Examining {}'.format(race_name))
-            for sub_event in details['events'][0]['races']:
+            for sub_event in detail['races']:
                 print('    Examining {}'.format(sub_event['name']))
                 try:
                     web_details = sub_event['result_files'][0]
@@ -92,31 +181,57 @@ class CompuScore(RaceResults):
                     print('Skipping {}'.format(race_name))
                     continue
 
-                # And finally, download the race itself.
                 url3 = 'http://{site}{rel_url}'
                 kwargs = {'site': web_details['webfile']['domain'],
                           'rel_url': web_details['webfile']['resource']}
-                url3 = url3.format(**kwargs)
-                race_resp = requests.get(url3)
-                self.downloaded_url = url3
+                urls.append(url3.format(**kwargs))
+
+        # And finally, download the races themselves.  Only a few result
+        # files are downloaded ahead of the one being processed, so that the
+        # files waiting their turn are not all held in memory at once.
+        pending = collections.deque(urls)
+        in_flight = collections.deque()
+        read_ahead = 2 * max(self.jobs, 1)
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while True:
+                while len(pending) > 0 and len(in_flight) < read_ahead:
+                    url3 = pending.popleft()
+                    future = executor.submit(self.client.get, url3)
+                    in_flight.append((url3, future))
 
-                self.compile_race_results(race_resp)
+                if len(in_flight) == 0:
+                    break
 
-    def compile_race_results(self, resp):
+                url3, future = in_flight.popleft()
+                race_resp = future.result()
+                if self.is_processed(url3, race_resp.content):
+                    continue
+
+                race = self.new_race(url3, content=race_resp.content)
+                self.compile_race_results(race)
+                self.mark_processed(url3, race_resp.content)
+
+    def compile_race_results(self, race):
         """
+        Parameters
+        ----------
+        race : RaceContext
+            The race, with the result file as downloaded.  The file may be
+            gzipped.  It is decompressed and fed to the parser a piece at a
+            time, so the decompressed text is never held as one string.
         """
-        try:
-            # Gzipped content.
-            with gzip.GzipFile(fileobj=io.BytesIO(resp.content)) as gzf:
-                content = gzf.read()
-            self.logger.debug('Content was gzipped')
-        except OSError:
-            # Ok, not gzipped
-            content = resp.content
-            self.logger.debug('Content was not gzipped')
-
-        doc = html.document_fromstring(content)
-        self.html = resp.text
+        url = race.url
+        content = race.content
+        with self.profiler.span('parse', url=url) as tags:
+            parser = html.HTMLParser()
+            nbytes = 0
+            chunks = (content[j:j + CHUNK_SIZE]
+                      for j in range(0, len(content), CHUNK_SIZE))
+            for chunk in self.read_body(chunks):
+                parser.feed(chunk)
+                nbytes += len(chunk)
+            doc = race.doc = parser.close()
+            tags['bytes'] = nbytes
 
         # The prior <STRONG> element should have a <A NAME="overall"> element
         # <strong><big><font face="Arial Narrow">
@@ -136,21 +251,22 @@ class CompuScore(RaceResults):
             raise RuntimeError(msg)
 
         # OK, we are properly positioned.
-        results = []
-        for line in pre.text_content().split('\n'):
-            for _, regex in self.df['regex'].iteritems():
-                if regex.search(line):
-                    # Get rid of carriage returns '\r'
-                    results.append(line.rstrip())
-
-        if len(results) > 0:
-            results = self.webify_results(doc, results)
-            self.insert_race_results(results)
-
-    def webify_results(self, doc, results):
+        with self.profiler.span('match', url=url):
+            text = pre.text_content()
+            club_results = []
+            for lines in self.club_lines(text, PlaceMatcher):
+                # Get rid of carriage returns '\r'
+                club_results.append([line.rstrip() for line in lines])
+
+        self.insert_club_results(
+            club_results, lambda results: self.webify_results(results, race),
+            race, cls=PlaceMatcher)
+
+    def webify_results(self, results, race):
         """
         Take the list of results and turn it into output HTML.
         """
+        doc = race.doc
         div = etree.Element('div')
         div.set('class', 'race')
 
@@ -171,8 +287,9 @@ class CompuScore(RaceResults):
         h3_elt.text = h3.text
         div.append(h3_elt)
 
-        if self.downloaded_url is not None:
-            div.append(self.construct_source_url_reference('Compuscore'))
+        if race.url is not None:
+            div.append(self.construct_source_url_reference('Compuscore',
+                                                           race.url))
 
         # Append the actual race results.  Consists of the column headings
         # (banner) plus the individual results.
@@ -180,11 +297,13 @@ class CompuScore(RaceResults):
         pre.set('class', 'actual_results')
 
         # Get the banner.  Consists of two STRONG elements inside the <PRE>
-        # element with the race results.
+        # element with the race results.  They are copied, as the same page
+        # may be webified for several clubs.
         strongs = doc.cssselect('strong + pre')[0].cssselect('strong')
-        pre.append(strongs[1])
-        strongs[2].tail = '\n' + '\n'.join(results)
-        pre.append(strongs[2])
+        pre.append(copy.deepcopy(strongs[1]))
+        banner = copy.deepcopy(strongs[2])
+        banner.tail = '\n' + '\n'.join(results)
+        pre.append(banner)
 
         div.append(pre)
         return div
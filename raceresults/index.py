@@ -0,0 +1,166 @@
+"""
+Index of the races listed on the master list pages of the results sites.
+"""
+import bisect
+import collections
+import datetime as dt
+import re
+
+Race = collections.namedtuple('Race', ['date', 'state', 'url', 'set_number'])
+
+_MONTHS = {name: number for number, name in
+           enumerate(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug',
+                      'Sep', 'Oct', 'Nov', 'Dec'], start=1)}
+
+# Race pages on CoolRunning look like
+#
+#     /results/15/ma/Oct17_Landma_set1.shtml
+_COOLRUNNING_REGEX = re.compile(r'''/results/(?P<year>\d{2})/(?P<state>[a-z]{2})/
+                                    (?P<month>[A-Z][a-z]{2})(?P<day>\d{1,2})_
+                                    (?P<name>[^"'<>\s/]*?)\.shtml''',
+                                re.VERBOSE)
+
+_SET_REGEX = re.compile(r'set(?P<set_number>\d+)$')
+
+# Race pages on BestRace look like
+#
+#     http://www.bestrace.com/results/15/150101HANGOVER.HTM
+_BESTRACE_REGEX = re.compile(r'''http://www\.bestrace\.com/results/\d{2}/
+                                 (?P<year>\d{2})(?P<month>\d{2})(?P<day>\d{2})
+                                 \w+\.HTM''',
+                             re.VERBOSE)
+
+
+def as_date(value):
+    """
+    Reduce a datetime to a date, so that either may be used in a query.
+    """
+    if isinstance(value, dt.datetime):
+        return value.date()
+    return value
+
+
+def coolrunning_races(markup, base='http://www.coolrunning.com'):
+    """
+    Parse the races out of a CoolRunning state master list.
+
+    Parameters
+    ----------
+    markup : str
+        HTML of a master list, such as
+        http://www.coolrunning.com/results/15/ma.shtml
+    base : str
+        Prepended to the relative race URLs.
+
+    Returns
+    -------
+    list
+        Race tuples.
+    """
+    races = []
+    for matchobj in _COOLRUNNING_REGEX.finditer(markup):
+        try:
+            date = dt.date(2000 + int(matchobj.group('year')),
+                           _MONTHS[matchobj.group('month')],
+                           int(matchobj.group('day')))
+        except (KeyError, ValueError):
+            continue
+
+        set_number = None
+        setobj = _SET_REGEX.search(matchobj.group('name'))
+        if setobj is not None:
+            set_number = int(setobj.group('set_number'))
+
+        races.append(Race(date, matchobj.group('state'),
+                          base + matchobj.group(), set_number))
+    return races
+
+
+def bestrace_races(markup):
+    """
+    Parse the races out of a BestRace schedule, such as
+    http://www.bestrace.com/2015schedule.html
+
+    Returns
+    -------
+    list
+        Race tuples.
+    """
+    races = []
+    for matchobj in _BESTRACE_REGEX.finditer(markup):
+        try:
+            date = dt.date(2000 + int(matchobj.group('year')),
+                           int(matchobj.group('month')),
+                           int(matchobj.group('day')))
+        except ValueError:
+            continue
+        races.append(Race(date, None, matchobj.group(), None))
+    return races
+
+
+class RaceIndex:
+    """
+    Races sorted by date, answering date range queries by bisection.
+
+    Each master list need only be downloaded and parsed once, after which
+    any number of date ranges, spanning any number of months or years, can be
+    looked up.
+    """
+    def __init__(self, races=()):
+        """
+        Parameters
+        ----------
+        races : iterable
+            Race tuples.  A race listed more than once is indexed just once.
+        """
+        self._races = []
+        self._dates = []
+        self._urls = set()
+        self.update(races)
+
+    def __len__(self):
+        return len(self._races)
+
+    def __iter__(self):
+        return iter(self._races)
+
+    def update(self, races):
+        """
+        Add races to the index.
+        """
+        added = False
+        for race in races:
+            if race.url in self._urls:
+                continue
+            self._urls.add(race.url)
+            self._races.append(race)
+            added = True
+
+        if added:
+            # Races on the same day stay in the order in which they were
+            # listed.
+            self._races.sort(key=lambda race: race.date)
+            self._dates = [race.date for race in self._races]
+
+    def between(self, start_date, stop_date, state=None):
+        """
+        Races from start_date through stop_date, inclusive.
+
+        Parameters
+        ----------
+        start_date, stop_date : datetime.date
+            Date range.
+        state : str
+            If given, only races in this state.
+
+        Returns
+        -------
+        list
+            Race tuples in date order.
+        """
+        lo = bisect.bisect_left(self._dates, as_date(start_date))
+        hi = bisect.bisect_right(self._dates, as_date(stop_date))
+        races = self._races[lo:hi]
+        if state is not None:
+            races = [race for race in races if race.state == state]
+        return races
@@ -0,0 +1,138 @@
+"""
+Ledger of the races already processed, for incremental runs.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+def default_ledger_path():
+    """
+    Location of the ledger if none is given.
+    """
+    root = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(root, 'raceresults', 'ledger.sqlite')
+
+
+def content_hash(content):
+    """
+    SHA-256 digest of a page, given as either text or bytes.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+class Ledger:
+    """
+    SQLite database of the race pages that have been processed.
+
+    Each page is recorded with a hash of its content, the time it was
+    processed, and the version of the membership list it was matched
+    against.  A page need not be processed again unless it or the roster has
+    changed since.
+
+    Races by authors whose results are never parsed are also remembered, so
+    that their pages need not be downloaded again.
+
+    Attributes
+    ----------
+    path : str
+        Path to the database file.
+    """
+    def __init__(self, path=None):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the database file.  Defaults to default_ledger_path().
+        """
+        if path is None:
+            path = default_ledger_path()
+        self.path = path
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS races ('
+                '    url TEXT NOT NULL,'
+                '    roster TEXT NOT NULL,'
+                '    content_hash TEXT NOT NULL,'
+                '    processed REAL NOT NULL,'
+                '    PRIMARY KEY (url, roster))')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS skipped ('
+                '    prefix TEXT PRIMARY KEY,'
+                '    author TEXT NOT NULL,'
+                '    recorded REAL NOT NULL)')
+
+    def is_processed(self, url, content, roster):
+        """
+        Has this version of the page already been processed against this
+        version of the roster?
+
+        Parameters
+        ----------
+        url : str
+            URL of the race page.
+        content : str or bytes
+            The page as just downloaded.
+        roster : str
+            Digest of the membership list(s).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT content_hash FROM races WHERE url = ? AND roster = ?',
+                (url, roster)).fetchone()
+        return row is not None and row[0] == content_hash(content)
+
+    def record(self, url, content, roster):
+        """
+        Record that a page has been processed.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO races '
+                '(url, roster, content_hash, processed) VALUES (?, ?, ?, ?)',
+                (url, roster, content_hash(content), time.time()))
+
+    def skipped_author(self, prefix):
+        """
+        Author of the races under a URL prefix, if they are never parsed.
+
+        Parameters
+        ----------
+        prefix : str
+            URL prefix shared by all the result pages of a race.
+
+        Returns
+        -------
+        str
+            The author, or None if the race has not been skipped.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT author FROM skipped WHERE prefix = ?',
+                (prefix,)).fetchone()
+        return None if row is None else row[0]
+
+    def record_skipped(self, prefix, author):
+        """
+        Record that the races under a URL prefix are by an author whose
+        results are never parsed.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO skipped (prefix, author, recorded) '
+                'VALUES (?, ?, ?)', (prefix, author, time.time()))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -3,7 +3,6 @@ Module for L & M Computer Sports timing company.
 """
 import datetime
 import re
-import urllib
 
 from lxml import etree as ET
 
@@ -23,13 +22,11 @@ class LMSports(RaceResults):
     output_file:  final race results file
     verbose:  how much output to produce
     logger: handles verbosity of program execution
-    downloaded_url:  If a race retrieved from a URL has results for anyone
-            in the membership list, then we want to record that URL in the
-            output.
     """
+    source = 'L&M Sports'
 
     def __init__(self, verbose='INFO', membership_list=None,
-                 output_file=None, **kwargs):
+                 output_file=None, http_client=None, **kwargs):
         """
         Parameters
         ----------
@@ -37,10 +34,13 @@ class LMSports(RaceResults):
             CSV membership list
         verbose : str
             How much verbosity.
+        http_client : HttpClient
+            Client through which all downloads go.
         """
         RaceResults.__init__(self, verbose=verbose,
                              membership_list=membership_list,
-                             output_file=output_file)
+                             output_file=output_file,
+                             http_client=http_client)
         self.__dict__.update(**kwargs)
 
         self.base_url = 'http://www.lmsports.com/'
@@ -49,13 +49,18 @@ class LMSports(RaceResults):
         """
         Download the requested results and compile them.
         """
-        self.download_master_file()
-        self.process_master_file()
+        markup = self.download_master_file()
+        self.process_master_file(markup)
 
-    def process_master_file(self):
+    def process_master_file(self, markup):
         """
         We have the full year of results, now fish out the ones that are in
         the specified time range.
+
+        Parameters
+        ----------
+        markup : str
+            HTML of the results for the entire year.
         """
         # <a href="trail13.htm">Trail of Two Cities 5k Run</a>
         # - Saturday, November 2, 2013 - OC/Somers Point, NJ -
@@ -71,7 +76,7 @@ class LMSports(RaceResults):
                       (?P<year>\d+)\s*-"""
         pattern = pattern.format(year=self.start_date.strftime('%y'))
         regex = re.compile(pattern, re.VERBOSE | re.DOTALL | re.IGNORECASE)
-        for matchobj in regex.finditer(self.html):
+        for matchobj in regex.finditer(markup):
             datestring = '{0} {1:02d}, {2}'.format(matchobj.group('month'),
                                                    int(matchobj.group('day')),
                                                    matchobj.group('year'))
@@ -85,12 +90,13 @@ class LMSports(RaceResults):
             url = self.base_url + matchobj.group('href')
             self.logger.info('Downloading {0}.'.format(url))
 
-            self.downloaded_url = url
-            response = urllib.request.urlopen(url)
-            self.html = response.readall().decode('utf-8')
-            self.compile_race_results()
+            response = self.client.get(url)
+            race = self.new_race(url, content=response.content,
+                                 text=response.content.decode('utf-8'),
+                                 date=dt)
+            self.compile_race_results(race)
 
-    def webify_results(self, results_lst):
+    def webify_results(self, results_lst, race):
         """
         Take the list of results and turn it into output HTML.
         """
@@ -103,7 +109,7 @@ class LMSports(RaceResults):
         # <TITLE>Cooper Norcross Run the Bridge 10k</TITLE>
         regex = re.compile(r"""<title>(?P<the_title>.*)</title>""",
                            re.VERBOSE | re.IGNORECASE)
-        matchobj = regex.search(self.html)
+        matchobj = regex.search(race.text)
         if matchobj is None:
             raise RuntimeError("Could not find the title.")
 
@@ -112,8 +118,9 @@ class LMSports(RaceResults):
         div.append(h1)
 
         # Append the URL if possible.
-        if self.downloaded_url is not None:
-            div.append(self.construct_source_url_reference('L&amp;M Sports'))
+        if race.url is not None:
+            div.append(self.construct_source_url_reference('L&amp;M Sports',
+                                                           race.url))
 
         pre = ET.Element('pre')
         pre.set('class', 'actual_results')
@@ -122,7 +129,7 @@ class LMSports(RaceResults):
         # age|#in
         regex = re.compile(r"""\r\n(?P<banner>\s*age.*?=====)\r\n""",
                            re.DOTALL)
-        matchobj = regex.search(self.html)
+        matchobj = regex.search(race.text)
         if matchobj is None:
             raise RuntimeError("Could not parse out the banner.")
 
@@ -146,9 +153,14 @@ class LMSports(RaceResults):
         http://www.lmsports.com/resultsYY.htm
 
         where YY is the two-digit year.
+
+        Returns
+        -------
+        str
+            HTML of the results for the entire year.
         """
         url = 'http://www.lmsports.com/results{0}.htm'
         url = url.format(self.start_date.strftime('%y'))
         self.logger.info('Downloading {0}.'.format(url))
-        response = urllib.request.urlopen(url)
-        self.html = response.read().decode('utf-8')
+        response = self.client.get(url)
+        return response.content.decode('utf-8')
@@ -0,0 +1,397 @@
+"""
+Multi-pattern matching of membership names against race results.
+"""
+import collections
+import re
+
+# Every whitespace character other than a newline is folded into a plain
+# space before the automaton sees the text.  Newlines are kept so that a
+# match can never straddle two lines of a result file.
+_WHITESPACE = {code: ' ' for code in range(0x3001)
+               if chr(code).isspace() and chr(code) != '\n'}
+
+FIRST_LAST = 'first_last'
+LAST_FIRST = 'last_first'
+
+MemberMatch = collections.namedtuple('MemberMatch',
+                                     ['start', 'end', 'member', 'order'])
+
+
+def _isword(char):
+    return char.isalnum() or char == '_'
+
+
+def _boundary(text, pos):
+    """
+    Emulate the regular expression "\\b" assertion at position pos.
+    """
+    before = pos > 0 and _isword(text[pos - 1])
+    after = pos < len(text) and _isword(text[pos])
+    return before != after
+
+
+def _fold(text):
+    """
+    Lowercase and whitespace-normalize text without changing its length, so
+    that offsets into the folded text are offsets into the original.
+    """
+    folded = text.lower()
+    if len(folded) != len(text):
+        # A few characters lowercase to more than one character.
+        folded = ''.join(char.lower()[0] for char in text)
+    return folded.translate(_WHITESPACE)
+
+
+class MembershipMatcher:
+    """
+    Aho-Corasick automaton over the "First Last" and "Last First" names of
+    every club member.
+
+    The text is scanned once no matter how many members there are.  Runs of
+    whitespace are collapsed before being fed to the automaton, and the exact
+    rules of the original per-member regular expression
+
+        \\b(?:First\\sLast)|(?:Last\\s+First)\\b
+
+    are then checked on each candidate, i.e. case is ignored, "First Last"
+    must be separated by a single whitespace character and be preceded by a
+    word boundary, and "Last First" may be separated by any amount of
+    whitespace and must be followed by a word boundary.
+
+    Attributes
+    ----------
+    orders : tuple
+        Name orders to search for.
+    """
+    orders = (FIRST_LAST, LAST_FIRST)
+
+    def __init__(self, names=()):
+        """
+        Parameters
+        ----------
+        names : iterable
+            (first name, last name) pairs.  Each member is reported by its
+            position in this sequence unless added with add().
+        """
+        # Pattern table, each entry is (member, order, symbols, separator)
+        # where separator is the index of the space between the two names.
+        self._patterns = []
+        self._goto = None
+        self._fail = None
+        self._out = None
+
+        for member, (first, last) in enumerate(names):
+            self.add(first, last, member)
+
+    @classmethod
+    def combine(cls, matchers):
+        """
+        Merge several matchers into a single automaton, so that a text can be
+        searched for the members of several clubs in one pass.
+
+        Parameters
+        ----------
+        matchers : sequence
+            Matchers of this class.
+
+        Returns
+        -------
+        MembershipMatcher
+            Each member is reported as a (tag, member) pair, the tag being
+            the position of its matcher in the sequence.
+        """
+        combined = cls()
+        for tag, matcher in enumerate(matchers):
+            for member, order, symbols, separator in matcher._patterns:
+                combined._patterns.append(((tag, member), order, symbols,
+                                           separator))
+        combined.compile()
+        return combined
+
+    def __len__(self):
+        return len(set(pattern[0] for pattern in self._patterns))
+
+    def add(self, first, last, member):
+        """
+        Add a single member to the automaton.
+
+        Parameters
+        ----------
+        first, last : str
+            First and last name of the member.
+        member : object
+            Reported back in each MemberMatch.
+        """
+        first = ' '.join(_fold(str(first)).split())
+        last = ' '.join(_fold(str(last)).split())
+        if len(first) == 0 or len(last) == 0:
+            return
+
+        for order in self.orders:
+            if order == FIRST_LAST:
+                symbols = first + ' ' + last
+                separator = len(first)
+            else:
+                symbols = last + ' ' + first
+                separator = len(last)
+            self._patterns.append((member, order, symbols, separator))
+
+        # The automaton has to be rebuilt.
+        self._goto = None
+
+    def compile(self):
+        """
+        Build the goto, failure, and output functions of the automaton.
+
+        This happens automatically on the first search, but may be done ahead
+        of time, e.g. before pickling the matcher.
+        """
+        goto = [{}]
+        out = [[]]
+        for pattern_id, pattern in enumerate(self._patterns):
+            state = 0
+            for symbol in pattern[2]:
+                if symbol not in goto[state]:
+                    goto.append({})
+                    out.append([])
+                    goto[state][symbol] = len(goto) - 1
+                state = goto[state][symbol]
+            out[state].append(pattern_id)
+
+        # Breadth-first construction of the failure links.
+        fail = [0] * len(goto)
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and symbol not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(symbol, 0)
+                out[child].extend(out[fail[child]])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(ids) for ids in out]
+
+    def _candidates(self, folded, pos, endpos):
+        """
+        Run the automaton, yielding (end, pattern id) for each hit.
+        """
+        if self._goto is None:
+            self.compile()
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+
+        state = 0
+        space = False
+        for idx in range(pos, endpos):
+            symbol = folded[idx]
+            if symbol == ' ':
+                if space:
+                    # Collapse whitespace runs into a single space.
+                    continue
+                space = True
+            else:
+                space = False
+
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            for pattern_id in out[state]:
+                yield idx + 1, pattern_id
+
+    def _span(self, folded, end, pattern):
+        """
+        Walk a hit back from its end, returning the start of the hit and the
+        number of whitespace characters separating the two names.
+        """
+        _, _, symbols, separator = pattern
+        idx = end
+        gap = 0
+        for n in range(len(symbols) - 1, -1, -1):
+            if symbols[n] == ' ':
+                run = idx
+                while idx > 0 and folded[idx - 1] == ' ':
+                    idx -= 1
+                if n == separator:
+                    gap = run - idx
+            else:
+                idx -= 1
+        return idx, gap
+
+    def accept(self, text, start, end, order, gap):
+        """
+        Apply the word-boundary and separator rules to a candidate hit.
+
+        Parameters
+        ----------
+        text : str
+            Text being searched.
+        start, end : int
+            Location of the candidate in the text.
+        order : str
+            Either FIRST_LAST or LAST_FIRST.
+        gap : int
+            Number of whitespace characters between the two names.
+        """
+        if order == FIRST_LAST:
+            return gap == 1 and _boundary(text, start)
+        else:
+            return _boundary(text, end)
+
+    def finditer(self, text, pos=0, endpos=None):
+        """
+        Find every member mentioned in the text.
+
+        Parameters
+        ----------
+        text : str
+            Text to search, such as a line from a race results file.
+        pos, endpos : int
+            Restrict the search to text[pos:endpos].
+
+        Yields
+        ------
+        MemberMatch
+            In order of where each hit ends.
+        """
+        if endpos is None:
+            endpos = len(text)
+        return self._finditer(text, _fold(text), pos, endpos)
+
+    def _finditer(self, text, folded, pos, endpos):
+        for end, pattern_id in self._candidates(folded, pos, endpos):
+            pattern = self._patterns[pattern_id]
+            start, gap = self._span(folded, end, pattern)
+            if start < pos:
+                continue
+            if self.accept(text, start, end, pattern[1], gap):
+                yield MemberMatch(start, end, pattern[0], pattern[1])
+
+    def line_matches(self, text, pos=0, endpos=None):
+        """
+        Scan a whole document in a single pass, widening each hit out to the
+        line that contains it.
+
+        Once a line has a hit, the scan resumes at the start of the next line,
+        so each matching line is reported just once.
+
+        Parameters
+        ----------
+        text : str
+            Text of an entire results file, such as the content of a <pre>
+            element.
+        pos, endpos : int
+            Restrict the scan to text[pos:endpos].
+
+        Yields
+        ------
+        tuple
+            (line start, line end, MemberMatch) in page order.  The line end
+            excludes the newline.
+        """
+        if endpos is None:
+            endpos = len(text)
+        folded = _fold(text)
+        while pos < endpos:
+            for matchobj in self._finditer(text, folded, pos, endpos):
+                break
+            else:
+                return
+            line_start = text.rfind('\n', 0, matchobj.start) + 1
+            line_end = text.find('\n', matchobj.end)
+            if line_end == -1:
+                line_end = len(text)
+            yield line_start, line_end, matchobj
+            pos = line_end + 1
+
+    def tagged_lines(self, text, pos=0, endpos=None):
+        """
+        Scan a whole document in a single pass with a combined matcher,
+        reporting which tags have members mentioned on each line.
+
+        Parameters
+        ----------
+        text : str
+            Text of an entire results file.
+        pos, endpos : int
+            Restrict the scan to text[pos:endpos].
+
+        Yields
+        ------
+        tuple
+            (line start, line end, tags) in page order, where tags is the set
+            of tags (see combine()) of the members found on the line.
+        """
+        if endpos is None:
+            endpos = len(text)
+        line = None
+        tags = set()
+        for matchobj in self._finditer(text, _fold(text), pos, endpos):
+            if line is None or matchobj.start > line[1]:
+                if line is not None:
+                    yield line[0], line[1], frozenset(tags)
+                line_start = text.rfind('\n', 0, matchobj.start) + 1
+                line_end = text.find('\n', matchobj.end)
+                if line_end == -1:
+                    line_end = len(text)
+                line = (line_start, line_end)
+                tags = set()
+            tags.add(matchobj.member[0])
+        if line is not None:
+            yield line[0], line[1], frozenset(tags)
+
+    def tags(self, text, pos=0, endpos=None):
+        """
+        Return the set of tags of the members mentioned in the text, for a
+        combined matcher.
+        """
+        return {matchobj.member[0]
+                for matchobj in self.finditer(text, pos, endpos)}
+
+    def matching_lines(self, text, pos=0, endpos=None):
+        """
+        Yield the unique lines of a document that mention a member, in page
+        order.  See line_matches().
+        """
+        for line_start, line_end, _ in self.line_matches(text, pos, endpos):
+            yield text[line_start:line_end]
+
+    def search(self, text, pos=0, endpos=None):
+        """
+        Return the first MemberMatch in the text, or None.
+        """
+        for matchobj in self.finditer(text, pos, endpos):
+            return matchobj
+        return None
+
+    def match(self, text, pos=0, endpos=None):
+        """
+        Return a MemberMatch anchored at the start of the text, or None.
+        """
+        for matchobj in self.finditer(text, pos, endpos):
+            if matchobj.start == pos:
+                return matchobj
+        return None
+
+
+class PlaceMatcher(MembershipMatcher):
+    """
+    Matches lines that lead off with a place and then the name, such as
+
+        '60.Gene Gugliotta       North Plainfiel,NJ 53 M U '
+
+    i.e. start of line, place, '.', first name, whitespace, last name.
+    """
+    orders = (FIRST_LAST,)
+
+    _place_regex = re.compile(r'\s*(?P<place>\d+)\.')
+
+    def accept(self, text, start, end, order, gap):
+        if not _boundary(text, end):
+            return False
+        line_start = text.rfind('\n', 0, start) + 1
+        return self._place_regex.fullmatch(text, line_start, start) is not None
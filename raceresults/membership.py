@@ -0,0 +1,191 @@
+"""
+Loading of club membership lists.
+"""
+import collections
+import csv
+import hashlib
+import logging
+import os
+import pickle
+import threading
+
+from .matcher import MembershipMatcher, PlaceMatcher
+
+# Bump this whenever the pickled layout of a Membership or of the matchers
+# changes, so that stale cache files are ignored.
+CACHE_VERSION = 1
+
+Member = collections.namedtuple('Member', ['fname', 'lname'])
+
+_EXCEL_SUFFIXES = ('.xls', '.xlsx', '.xlsm', '.xlsb', '.ods')
+
+# Memberships already loaded by this process, keyed by content digest.
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def default_cache_dir():
+    """
+    Directory in which compiled membership lists are cached.
+    """
+    root = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(root, 'raceresults', 'membership')
+
+
+class Membership:
+    """
+    Normalized club membership list plus the matchers compiled from it.
+
+    Attributes
+    ----------
+    members : list
+        Member tuples of first and last names.
+    digest : str
+        SHA-256 digest of the membership file contents.  This identifies the
+        version of the roster.
+    matchers : dict
+        Compiled matchers, keyed by class name.
+    """
+    def __init__(self, members, digest):
+        self.members = members
+        self.digest = digest
+        self.matchers = {}
+        for cls in (MembershipMatcher, PlaceMatcher):
+            matcher = cls((member.fname, member.lname) for member in members)
+            matcher.compile()
+            self.matchers[cls.__name__] = matcher
+
+    def matcher(self, cls=MembershipMatcher):
+        """
+        Return the compiled matcher of the given class.
+        """
+        return self.matchers[cls.__name__]
+
+    @classmethod
+    def load(cls, membership_file, cache_dir=None):
+        """
+        Load a membership file, reusing a previously compiled version of it
+        if the file contents have not changed.
+
+        Parameters
+        ----------
+        membership_file : str
+            CSV or Excel spreadsheet file of club membership
+        cache_dir : str
+            Where compiled membership lists are kept.  Defaults to
+            default_cache_dir().
+
+        Returns
+        -------
+        Membership
+        """
+        with open(membership_file, 'rb') as fptr:
+            content = fptr.read()
+        sha = hashlib.sha256(content)
+        sha.update(str(CACHE_VERSION).encode())
+        digest = sha.hexdigest()
+
+        with _loaded_lock:
+            if digest in _loaded:
+                return _loaded[digest]
+
+            if cache_dir is None:
+                cache_dir = default_cache_dir()
+            path = os.path.join(cache_dir, digest + '.pickle')
+
+            membership = cls._read_cache(path)
+            if membership is None:
+                members = read_members(membership_file)
+                membership = cls(members, digest)
+                cls._write_cache(path, membership)
+
+            _loaded[digest] = membership
+            return membership
+
+    @staticmethod
+    def _read_cache(path):
+        try:
+            with open(path, 'rb') as fptr:
+                return pickle.load(fptr)
+        except Exception:
+            # Missing, truncated or pickled by an older release:  any cache
+            # file that cannot be read is simply a miss.
+            return None
+
+    @staticmethod
+    def _write_cache(path, membership):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as fptr:
+                pickle.dump(membership, fptr, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            msg = 'Could not cache the membership list:  {}'.format(e)
+            logging.getLogger('race_results').warning(msg)
+
+
+def read_members(membership_file):
+    """
+    Read the first and last names from a membership file.
+
+    Plain CSV files are read with the csv module.  pandas is only imported
+    for Excel spreadsheets.
+
+    Parameters
+    ----------
+    membership_file : str
+        CSV or Excel spreadsheet file of club membership
+
+    Returns
+    -------
+    list
+        Member tuples.
+    """
+    rows = None
+    if not membership_file.lower().endswith(_EXCEL_SUFFIXES):
+        rows = _read_csv(membership_file)
+    if rows is None:
+        rows = _read_excel(membership_file)
+
+    header = [str(col).strip().lower() for col in rows[0]]
+    if 'fname' not in header or 'lname' not in header:
+        msg = 'The membership file must have both "FName" and '
+        msg += '"LName" columns (first name and last name).'
+        raise RuntimeError(msg)
+    ifname = header.index('fname')
+    ilname = header.index('lname')
+
+    members = []
+    for row in rows[1:]:
+        if len(row) <= max(ifname, ilname):
+            continue
+        members.append(Member(row[ifname], row[ilname]))
+    return members
+
+
+def _read_csv(membership_file):
+    """
+    Return the rows of a CSV file, or None if it does not look like one.
+    """
+    try:
+        with open(membership_file, 'rt', newline='',
+                  encoding='utf-8-sig') as fptr:
+            rows = [row for row in csv.reader(fptr) if len(row) > 0]
+    except (UnicodeDecodeError, csv.Error):
+        return None
+    if len(rows) == 0:
+        return None
+    return rows
+
+
+def _read_excel(membership_file):
+    """
+    Return the rows of an Excel spreadsheet, blank cells being empty strings.
+    """
+    import pandas as pd
+
+    df = pd.read_excel(membership_file, header=None, dtype=str)
+    df = df.fillna('')
+    return df.values.tolist()
@@ -1,22 +1,63 @@
 """
 Module for compiling NYRR race resuts.
 """
+from concurrent.futures import ThreadPoolExecutor
 import datetime as dt
 import re
-import http
-import http.cookiejar
-import urllib.request
 
 from lxml import etree
 from lxml import html as html2
 
+from .client import HttpClient
 from .common import RaceResults
 
 
+class NyrrClient(HttpClient):
+    """
+    HTTP client dedicated to the NYRR site.
+
+    The search forms only work with the cookies that the site hands out, so
+    NYRR gets a session, and thus a cookie jar, of its own rather than
+    sharing one with the other backends.  Pages are never cached, as a page
+    served from a cache would not set any cookies.  Traffic is recorded into
+    or replayed from the shared client's archive, though, as an archive keeps
+    the cookies.
+    """
+    def fetch(self, url, params=None):
+        """
+        Download a page as text.
+
+        Parameters
+        ----------
+        url : str
+            The URL to retrieve
+        params : dict
+            POST parameters to supply
+
+        Returns
+        -------
+        str
+            The page, decoded as UTF-8 if possible and as latin-1 otherwise.
+        """
+        if params is None:
+            response = self.get(url)
+        else:
+            response = self.post(url, data=params)
+        html = response.content
+        try:
+            html = html.decode('utf-8')
+        except UnicodeDecodeError:
+            html = html.decode('latin1')
+
+        return html
+
+
 class NewYorkRR(RaceResults):
     """
     Handles race results from New York Road Runners website.
     """
+    source = 'NYRR'
+
     def __init__(self, team=None, **kwargs):
         """
         Parameters
@@ -28,11 +69,15 @@ class NewYorkRR(RaceResults):
 
         self.team = team
 
-        # Need to remember the current URL.
-        self.downloaded_url = None
-
-        self.cookies = None
-        self.cookie_jar = None
+        # Searches for the different events run at the same time over one
+        # pool of connections.
+        self.nyrr_client = NyrrClient(pool_maxsize=self.jobs,
+                                      timeout=self.client.timeout,
+                                      archive=self.client.archive,
+                                      profiler=self.profiler)
+        # Its downloads take the same route as the shared client's, e.g.
+        # through a proxy.
+        self.nyrr_client.session.proxies.update(self.client.session.proxies)
 
         # This URL is used in a regular expression that teases out the URLs
         # for all of the results.
@@ -40,11 +85,29 @@ class NewYorkRR(RaceResults):
         self.result_url_base += "aes-programs/results/startup.html"
 
     def run(self):
+        try:
+            RaceResults.run(self)
+        finally:
+            self.close_nyrr_client()
+
+    def collect(self):
+        try:
+            return RaceResults.collect(self)
+        finally:
+            self.close_nyrr_client()
+
+    def close_nyrr_client(self):
         """
-        This page has the URLs for the recent results.
+        Release the connections of the client used for the searches.  The
+        archive, if any, belongs to the shared client and is left open for
+        the other backends.
         """
-        self.initialize_output_file()
+        self.nyrr_client.session.close()
 
+    def compile_web_results(self):
+        """
+        This page has the URLs for the recent results.
+        """
         url = 'http://web2.nyrrc.org'
         url += '/cgi-bin/start.cgi/aes-programs/results/resultsarchive.htm'
 
@@ -62,15 +125,14 @@ class NewYorkRR(RaceResults):
         post_params = {}
         post_params['NYRRYEAR'] = str(self.start_date.year)
         post_params['AESTIVACVNLIST'] = 'NYRRYEAR'
-        data = urllib.parse.urlencode(post_params)
-        data = data.encode()
 
         # Download the race list page for the specified year
-        text = self.download_file(url, data)
+        text = self.download_file(url, post_params)
 
         doc2 = html2.document_fromstring(text)
         links = doc2.cssselect('a')
 
+        urls = []
         for link in links:
             url = link.get('href')
             if self.result_url_base not in url:
@@ -85,13 +147,29 @@ class NewYorkRR(RaceResults):
 
             if self.start_date <= race_date and race_date <= self.stop_date:
                 self.logger.info("Keeping {0}".format(race_name))
-                self.process_event(url)
+                urls.append(url)
             else:
                 self.logger.info("Skipping %s" % race_name)
 
-    def process_event(self, url):
+        # Search the events concurrently, but write them out in the order in
+        # which they were listed.
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for tables in executor.map(self.search_event, urls):
+                if tables is None:
+                    continue
+                with self.profiler.span('write', url=tables[0]):
+                    div = self.webify_results(tables[1], tables[2])
+                    self.insert_race_results(div)
+
+    def search_event(self, url):
         """We have the URL of a single event.  The URL does not lead to the
         results, however, it leads to a search page.
+
+        Returns
+        -------
+        tuple
+            The URL of the search results plus the race metadata and results
+            tables, or None if the team had no results.
         """
         markup = self.download_file(url)
         doc = html2.document_fromstring(markup)
@@ -117,25 +195,23 @@ class NewYorkRR(RaceResults):
         post_params['AESTIVACVNLIST'] = 'overalltype,input.agegroup.m,'
         post_params['AESTIVACVNLIST'] += 'input.agegroup.f,teamgender'
         post_params['AESTIVACVNLIST'] += 'team_code'
-        data = urllib.parse.urlencode(post_params)
-        data = data.encode()
 
-        markup = self.download_file(url, data)
+        markup = self.download_file(url, post_params)
 
         # If there were no results for the specified team, then the html will
         # contain some red text to the effect of "Your search returns no
         # match."
         if re.search("Your search returns no match.", markup) is not None:
-            return
+            return None
 
-        doc = html2.document_fromstring(markup)
+        with self.profiler.span('parse', url=url, bytes=len(markup)):
+            doc = html2.document_fromstring(markup)
         tables = doc.cssselect('table')
 
         if len(tables) < 4:
-            return
+            return None
 
-        div = self.webify_results(tables[1], tables[3])
-        self.insert_race_results(div)
+        return url, tables[1], tables[3]
 
     def webify_results(self, meta_table, results_table):
         """
@@ -237,23 +313,6 @@ class NewYorkRR(RaceResults):
         params : dict
             POST parameters to supply
         """
-        # Store the url in case we need it later.
-        self.downloaded_url = url
-
-        # cookie support needed for NYRR results.
-        if self.cookies is None:
-            self.cookies = http.cookiejar.LWPCookieJar()
-        cookie_processor = urllib.request.HTTPCookieProcessor(self.cookies)
-        opener = urllib.request.build_opener(cookie_processor)
-        urllib.request.install_opener(opener)
-
-        req = urllib.request.Request(url)
-        response = urllib.request.urlopen(req, params)
-        # html = response.readall()
-        html = response.read()
-        try:
-            html = html.decode('utf-8')
-        except UnicodeDecodeError:
-            html = html.decode('latin1')
-
-        return html
+        # cookie support needed for NYRR results.  The NYRR client's session
+        # keeps the cookies from one request to the next.
+        return self.nyrr_client.fetch(url, params)
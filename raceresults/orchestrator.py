@@ -0,0 +1,34 @@
+"""
+Run several backends at once and combine their races into a single report.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from .output import ResultsWriter, skeleton
+
+
+def run_backends(backends, output_file):
+    """
+    Run the backends concurrently, each in its own thread, and write all of
+    their races to one output file.
+
+    Each backend collects its serialized races in memory.  The report is
+    written once all of the backends have finished, with the races in the
+    order in which the backends were given.
+
+    Parameters
+    ----------
+    backends : list
+        RaceResults objects, such as CompuScore and BestRace instances.
+    output_file : str
+        Path to output file of race results.
+    """
+    with ThreadPoolExecutor(max_workers=len(backends)) as executor:
+        futures = [executor.submit(backend.collect) for backend in backends]
+
+    writer = ResultsWriter(output_file, skeleton())
+    try:
+        for future in futures:
+            for fragment in future.result():
+                writer.write_fragment(fragment)
+    finally:
+        writer.close()
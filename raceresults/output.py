@@ -0,0 +1,145 @@
+"""
+Writers for the race results report.
+"""
+from lxml import etree
+
+
+def skeleton():
+    """
+    Construct the skeleton of the report, i.e.
+
+    <html>
+        <head>
+            <link href="rr.css" type="text/css" />
+        </head>
+        <body>
+            STUFF TO GO HERE
+        </body>
+    </html>
+    """
+    ofile = etree.Element('html')
+    head = etree.SubElement(ofile, 'head')
+    link = etree.SubElement(head, 'link')
+    link.set('rel', 'stylesheet')
+    link.set('href', 'rr.css')
+    link.set('type', 'text/css')
+    etree.SubElement(ofile, 'body')
+    return ofile
+
+
+def serialize_race(div):
+    """
+    Serialize a race <div> element to HTML.
+
+    Parameters
+    ----------
+    div : lxml.etree.Element
+        DIV element containing "finished" race results.
+
+    Returns
+    -------
+    str
+        HTML fragment.
+    """
+    result = etree.tostring(div, pretty_print=True, method="html",
+                            encoding='unicode')
+
+    # Aids in readability.
+    result = result.replace('\r', '\n')
+
+    # Replace latin-1 non-breaking space with a space.
+    result = result.replace('\xa0', ' ')
+
+    return result
+
+
+class ResultsWriter:
+    """
+    Append-only writer of the HTML report.
+
+    The skeleton of the document is written up through the opening <body>
+    tag when the writer is created.  Each race is then serialized and
+    appended as it is produced, and the document is closed off by close().
+    Nothing already written is ever read back.
+
+    Attributes
+    ----------
+    path : str
+        Path to the output file.
+    """
+    def __init__(self, path, skeleton):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the output file.
+        skeleton : lxml.etree.Element
+            <html> element with an empty <body> element.
+        """
+        self.path = path
+
+        text = etree.tostring(skeleton, pretty_print=True, method="html",
+                              encoding='unicode')
+        idx = text.index('</body>')
+
+        self._tail = text[idx:]
+        self._fptr = open(path, 'w')
+        self._fptr.write(text[:idx] + '\n')
+        self._fptr.flush()
+
+    def write(self, div):
+        """
+        Append a race to the report.
+
+        Parameters
+        ----------
+        div : lxml.etree.Element
+            DIV element containing "finished" race results.
+        """
+        self.write_fragment(serialize_race(div))
+
+    def write_fragment(self, fragment):
+        """
+        Append an already serialized race to the report.
+        """
+        self._fptr.write(fragment)
+        self._fptr.flush()
+
+    def close(self):
+        """
+        Close off the document.
+        """
+        if self._fptr is None:
+            return
+        self._fptr.write(self._tail)
+        self._fptr.close()
+        self._fptr = None
+
+
+class ResultsCollector:
+    """
+    Keeps serialized races in memory instead of writing them to a file, so
+    that races from several backends can be combined into one report.
+
+    Attributes
+    ----------
+    fragments : list
+        HTML fragment for each race, in the order produced.
+    """
+    def __init__(self):
+        self.fragments = []
+
+    def write(self, div):
+        """
+        Collect a race.
+        """
+        self.fragments.append(serialize_race(div))
+
+    def write_fragment(self, fragment):
+        """
+        Collect an already serialized race.
+        """
+        self.fragments.append(fragment)
+
+    def close(self):
+        pass
@@ -0,0 +1,77 @@
+"""
+A race web page, parsed once and shared by every step that processes it.
+"""
+import bisect
+import re
+
+from lxml import html
+
+
+class RacePage:
+    """
+    Parsed race web page.
+
+    The document is parsed when the page is constructed.  The results text
+    of the first <pre> element and its line offsets are computed the first
+    time they are asked for and then kept.
+
+    Attributes
+    ----------
+    markup : str
+        HTML from a race web page.
+    url : str
+        URL from which the page was downloaded, if known.
+    doc : lxml.html.HtmlElement
+        The parsed document.
+    """
+    def __init__(self, markup, url=None):
+        self.markup = markup
+        self.url = url
+        self.doc = html.document_fromstring(markup)
+
+        self._pre = None
+        self._text = None
+        self._line_offsets = None
+
+    @property
+    def pre(self):
+        """
+        The first <pre> element in the page, or None if there isn't one.
+        """
+        if self._pre is None:
+            elts = self.doc.cssselect('pre')
+            if len(elts) > 0:
+                self._pre = elts[0]
+        return self._pre
+
+    @property
+    def text(self):
+        """
+        Text content of the first <pre> element.
+        """
+        if self._text is None:
+            self._text = self.pre.text_content()
+        return self._text
+
+    @property
+    def line_offsets(self):
+        """
+        Offsets into the text at which each line starts.
+        """
+        if self._line_offsets is None:
+            offsets = [0]
+            offsets.extend(m.end() for m in re.finditer('\n', self.text))
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def line_number(self, pos):
+        """
+        Zero-based number of the line containing the given offset.
+        """
+        return bisect.bisect_right(self.line_offsets, pos) - 1
+
+    def cssselect(self, expr):
+        """
+        Run a CSS selector against the document.
+        """
+        return self.doc.cssselect(expr)
@@ -0,0 +1,123 @@
+"""
+Matching of very large result pages on several processes.
+
+The matching loop is pure Python, so a page with tens of thousands of lines
+keeps one core busy for a noticeable time.  Such a page is split into chunks
+that end on line boundaries, the chunks are matched by a pool of worker
+processes, and the matching lines are merged back in page order.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+import os
+
+# The matcher in a worker process, set once when the worker starts.
+_matcher = None
+
+
+def _init_worker(matcher):
+    global _matcher
+    _matcher = matcher
+
+
+def _match_chunk(chunk, tagged):
+    if tagged:
+        return [(chunk[start:end], tags)
+                for start, end, tags in _matcher.tagged_lines(chunk)]
+    return list(_matcher.matching_lines(chunk))
+
+
+def line_chunks(text, nchunks):
+    """
+    Split text into about nchunks pieces, each ending at the end of a line.
+
+    Parameters
+    ----------
+    text : str
+        Text of an entire results file.
+    nchunks : int
+        Number of pieces wanted.
+
+    Returns
+    -------
+    list
+        The pieces, which join back up into the text.
+    """
+    size = max(len(text) // max(nchunks, 1), 1)
+    chunks = []
+    pos = 0
+    while pos < len(text):
+        end = text.find('\n', min(pos + size, len(text)) - 1)
+        end = len(text) if end == -1 else end + 1
+        chunks.append(text[pos:end])
+        pos = end
+    return chunks
+
+
+class MatchPool:
+    """
+    Pool of worker processes, each holding a copy of one matcher.
+
+    The matcher is sent to each worker just once, when the worker starts,
+    rather than with every chunk.
+
+    Attributes
+    ----------
+    processes : int
+        Number of worker processes.
+    chunks_per_process : int
+        Each page is split into this many chunks for each process, so that
+        the work stays balanced when some chunks have more hits than others.
+    """
+    chunks_per_process = 4
+
+    def __init__(self, matcher, processes=None):
+        """
+        Parameters
+        ----------
+        matcher : MembershipMatcher
+            The compiled matcher, possibly a combined one.
+        processes : int
+            Number of worker processes.  Defaults to the number of CPUs.
+        """
+        if processes is None:
+            processes = os.cpu_count() or 1
+        self.processes = processes
+        # The workers are not forked from this process, whose download
+        # threads may hold locks that a forked child would never see
+        # released.  The matcher is pickled over to them instead.
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+        else:
+            context = multiprocessing.get_context('spawn')
+        self._executor = ProcessPoolExecutor(max_workers=processes,
+                                             mp_context=context,
+                                             initializer=_init_worker,
+                                             initargs=(matcher,))
+
+    def _map(self, text, tagged):
+        chunks = line_chunks(text, self.processes * self.chunks_per_process)
+        results = self._executor.map(_match_chunk, chunks,
+                                     itertools.repeat(tagged))
+        return itertools.chain.from_iterable(results)
+
+    def matching_lines(self, text):
+        """
+        The lines of a document that mention a member, in page order, as with
+        MembershipMatcher.matching_lines.
+        """
+        return list(self._map(text, False))
+
+    def tagged_lines(self, text):
+        """
+        The lines of a document that mention a member, in page order, each
+        paired with the set of tags of the members mentioned.  See
+        MembershipMatcher.tagged_lines.
+        """
+        return list(self._map(text, True))
+
+    def close(self):
+        """
+        Shut down the worker processes.
+        """
+        self._executor.shutdown()
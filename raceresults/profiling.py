@@ -0,0 +1,146 @@
+"""
+Per-phase timing of a run, and the summary report built from it.
+"""
+import collections
+import contextlib
+import json
+import threading
+import time
+
+# The phases a race page goes through.
+PHASES = ('download', 'parse', 'author', 'match', 'write')
+
+Span = collections.namedtuple('Span', ['phase', 'start', 'duration', 'tags'])
+
+
+def percentile(values, q):
+    """
+    Percentile of a sorted list of values, interpolating between the two
+    nearest ranks.
+
+    Parameters
+    ----------
+    values : list
+        Sorted values.
+    q : float
+        Percentile between 0 and 100.
+    """
+    if len(values) == 0:
+        return None
+    pos = (len(values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+class Profiler:
+    """
+    Records how long each phase of processing a race page takes.
+
+    The profiler may be shared between threads, and between the backends and
+    the HTTP client.
+
+    Attributes
+    ----------
+    spans : list
+        Span tuples in the order in which they finished.  The tags are a
+        dictionary, usually holding the URL and the size in bytes of the
+        page, and for CoolRunning the author of the results.
+    """
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, phase, **tags):
+        """
+        Time the enclosed block as one span of the given phase.
+
+        The tags dictionary is yielded, so that tags only known by the end of
+        the block, such as the author of a page, can be added to it.
+
+        Example
+        -------
+            with profiler.span('parse', url=url, bytes=len(markup)):
+                page = RacePage(markup, url=url)
+        """
+        start = time.perf_counter()
+        try:
+            yield tags
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.spans.append(Span(phase, start - self._start, duration,
+                                       tags))
+
+    def report(self, slowest=10):
+        """
+        Summarize the spans.
+
+        Parameters
+        ----------
+        slowest : int
+            Number of pages to list in the slowest pages section.
+
+        Returns
+        -------
+        dict
+            Per-phase count, total, mean, median, 90th and 99th percentiles
+            and maximum times, plus the pages that took longest over all of
+            their phases.
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        by_phase = collections.defaultdict(list)
+        nbytes = collections.Counter()
+        pages = {}
+        for span in spans:
+            by_phase[span.phase].append(span.duration)
+            nbytes[span.phase] += span.tags.get('bytes') or 0
+
+            url = span.tags.get('url')
+            if url is None:
+                continue
+            page = pages.setdefault(url, {'url': url, 'total_s': 0,
+                                          'phases': {}})
+            page['total_s'] += span.duration
+            page['phases'][span.phase] = (page['phases'].get(span.phase, 0)
+                                          + span.duration)
+            for key, value in span.tags.items():
+                if key != 'url' and value is not None:
+                    page[key] = value
+
+        phases = {}
+        order = list(PHASES) + sorted(set(by_phase) - set(PHASES))
+        for phase in order:
+            if phase not in by_phase:
+                continue
+            durations = sorted(by_phase[phase])
+            phases[phase] = {
+                'count': len(durations),
+                'total_s': sum(durations),
+                'mean_s': sum(durations) / len(durations),
+                'p50_s': percentile(durations, 50),
+                'p90_s': percentile(durations, 90),
+                'p99_s': percentile(durations, 99),
+                'max_s': durations[-1],
+                'bytes': nbytes[phase],
+            }
+
+        ranked = sorted(pages.values(), key=lambda page: page['total_s'],
+                        reverse=True)
+
+        return {
+            'wall_time_s': time.perf_counter() - self._start,
+            'phases': phases,
+            'slowest_pages': ranked[:slowest],
+        }
+
+    def write_report(self, path, slowest=10):
+        """
+        Write the summary report to a JSON file.
+        """
+        with open(path, 'w') as fptr:
+            json.dump(self.report(slowest=slowest), fptr, indent=2)
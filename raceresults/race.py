@@ -0,0 +1,48 @@
+"""
+The state of a single race as it is processed.
+"""
+
+
+class RaceContext:
+    """
+    Everything known about one race page while it is processed.
+
+    A context is passed explicitly from step to step, from the download
+    through to the output, rather than being kept on the backend.  A single
+    backend can therefore work on several races at once.
+
+    Attributes
+    ----------
+    url : str
+        URL from which the page was downloaded, if known.
+    content : bytes
+        The page as downloaded, if kept.
+    text : str
+        The page as decoded text, if kept.
+    source : str
+        Results site, such as "CoolRunning".
+    date : datetime.date
+        Date of the race, if known.
+    doc : lxml.html.HtmlElement
+        The parsed document, once it has been parsed.
+    page : RacePage
+        The parsed page, for backends that use one.
+    author : str
+        Identifier for the authority or racing company that produced the
+        results, where the site provides one.
+    """
+    def __init__(self, url=None, content=None, text=None, source=None,
+                 date=None):
+        self.url = url
+        self.content = content
+        self.text = text
+        self.source = source
+        self.date = date
+
+        self.doc = None
+        self.page = None
+        self.author = None
+
+    def __repr__(self):
+        return 'RaceContext(url={!r}, source={!r}, date={!r})'.format(
+            self.url, self.source, self.date)
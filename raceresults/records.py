@@ -0,0 +1,212 @@
+"""
+Structured records of matched finishers, and writers that stream them to
+CSV, JSON Lines or Parquet files.
+"""
+import csv
+import datetime as dt
+import json
+import os
+import re
+
+# A place leading off a line, such as "   60 " or "  60.".
+_PLACE_REGEX = re.compile(r'\s*(?P<place>\d+)(?:\.|\s|$)')
+
+# Finish times such as "17:29", "1:02:03" or "17:29.4".
+_TIME_REGEX = re.compile(r'(?<![\d:.])(?P<time>\d{1,2}(?::\d{2}){1,2}'
+                         r'(?:\.\d+)?)(?![\d:])')
+
+
+def parse_place(text):
+    """
+    Return the place with which a result leads off, or None.
+    """
+    matchobj = _PLACE_REGEX.match(text)
+    if matchobj is None:
+        return None
+    return int(matchobj.group('place'))
+
+
+def parse_time(text, pos=0):
+    """
+    Return the first finish time in the text at or after pos, or None.
+    """
+    matchobj = _TIME_REGEX.search(text, pos)
+    if matchobj is None:
+        return None
+    return matchobj.group('time')
+
+
+class ResultRecord:
+    """
+    One club member's result in one race.
+
+    Attributes
+    ----------
+    club : str
+        Name of the member's club.
+    member_id : int
+        Position of the member in the club's membership list.
+    member : str
+        Member's name as it appears in the membership list.
+    race : str
+        Name of the race.
+    date : datetime.date
+        Date of the race, if known.
+    source : str
+        Results site, such as "CoolRunning".
+    url : str
+        URL of the race results.
+    raw : str
+        The result as published, either a line of text or the cells of a
+        table row separated by " | ".
+    place : int
+        Overall place, if it could be parsed.
+    time : str
+        Finish time, if it could be parsed.
+    """
+    __slots__ = ('club', 'member_id', 'member', 'race', 'date', 'source',
+                 'url', 'raw', 'place', 'time')
+
+    def __init__(self, club, member_id, member, race, date, source, url, raw,
+                 place=None, time=None):
+        self.club = club
+        self.member_id = member_id
+        self.member = member
+        self.race = race
+        self.date = date
+        self.source = source
+        self.url = url
+        self.raw = raw
+        self.place = place
+        self.time = time
+
+    def __repr__(self):
+        return 'ResultRecord({})'.format(', '.join(
+            '{}={!r}'.format(field, getattr(self, field))
+            for field in self.__slots__))
+
+    def __eq__(self, other):
+        if not isinstance(other, ResultRecord):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def as_dict(self):
+        """
+        The record as a dictionary, with the date in ISO format.
+        """
+        record = {field: getattr(self, field) for field in self.__slots__}
+        if isinstance(record['date'], dt.date):
+            record['date'] = record['date'].isoformat()
+        return record
+
+
+FIELDS = ResultRecord.__slots__
+
+
+class CsvRecordWriter:
+    """
+    Streams records to a CSV file with a header row.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._fptr = open(path, 'w', newline='')
+        self._writer = csv.DictWriter(self._fptr, fieldnames=FIELDS)
+        self._writer.writeheader()
+
+    def write(self, record):
+        self._writer.writerow(record.as_dict())
+
+    def close(self):
+        if self._fptr is not None:
+            self._fptr.close()
+            self._fptr = None
+
+
+class JsonLinesRecordWriter:
+    """
+    Streams records to a JSON Lines file, one object per line.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._fptr = open(path, 'w')
+
+    def write(self, record):
+        self._fptr.write(json.dumps(record.as_dict()) + '\n')
+
+    def close(self):
+        if self._fptr is not None:
+            self._fptr.close()
+            self._fptr = None
+
+
+class ParquetRecordWriter:
+    """
+    Streams records to a Parquet file, a row group at a time.
+
+    Requires pyarrow, which is only imported when a Parquet file is written.
+    """
+    def __init__(self, path, row_group_size=10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            msg = 'Writing Parquet files requires pyarrow.'
+            raise RuntimeError(msg)
+
+        self.path = path
+        self.row_group_size = row_group_size
+        self._pa = pa
+        self._schema = pa.schema([('club', pa.string()),
+                                  ('member_id', pa.int64()),
+                                  ('member', pa.string()),
+                                  ('race', pa.string()),
+                                  ('date', pa.date32()),
+                                  ('source', pa.string()),
+                                  ('url', pa.string()),
+                                  ('raw', pa.string()),
+                                  ('place', pa.int64()),
+                                  ('time', pa.string())])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+
+    def write(self, record):
+        self._rows.append(record.as_tuple())
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if len(self._rows) == 0:
+            return
+        columns = list(zip(*self._rows))
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type)
+             for column, field in zip(columns, self._schema)],
+            schema=self._schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def close(self):
+        if self._writer is not None:
+            self._flush()
+            self._writer.close()
+            self._writer = None
+
+
+_WRITERS = {'.csv': CsvRecordWriter,
+            '.jsonl': JsonLinesRecordWriter,
+            '.parquet': ParquetRecordWriter}
+
+
+def open_record_writer(path):
+    """
+    Open a record writer, the format being chosen by the file extension,
+    i.e. one of ".csv", ".jsonl" or ".parquet".
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _WRITERS:
+        msg = 'Unsupported records format "{}", use one of {}.'
+        raise RuntimeError(msg.format(ext, ', '.join(sorted(_WRITERS))))
+    return _WRITERS[ext](path)
@@ -0,0 +1,704 @@
+"""
+Local stand-in for the results sites, for load testing the downloads.
+
+The server answers as an HTTP proxy, so the backends' own URLs, such as
+http://www.coolrunning.com/results/15/ma.shtml, reach it unchanged once a
+client is pointed at it, either with
+
+    client.session.proxies.update(server.proxies)
+
+or, for the command line scripts, with the HTTP_PROXY and HTTPS_PROXY
+environment variables.  Only plain HTTP is served; HTTPS requests are
+refused rather than passed on to the real sites.  It serves synthetic, but
+well-formed, pages for
+
+    * CoolRunning state lists and race pages, with secondary result files
+    * Compuscore event listings and details, plain or gzipped, and the
+      result files they point to
+    * BestRace schedules and race pages
+    * Active searches, event pages and paginated results
+    * the NYRR results archive and its search forms, which need the cookie
+      handed out with the archive page
+
+Every page is generated from its URL, so the same URL always gets the same
+page.  Club members are planted among the finishers so that the backends
+have something to match.
+
+Usage:
+
+    python -m raceresults.standin [--port N] [--latency S] [--error-rate F]
+                                  [--finishers N] [--races-per-day N]
+                                  [--pages N] [--members FILE]
+"""
+import argparse
+import collections
+import datetime as dt
+import gzip
+import http.server
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+
+_SYLLABLES = ['an', 'bel', 'car', 'dan', 'el', 'fra', 'gus', 'hal', 'ing',
+              'jo', 'kel', 'lo', 'mar', 'ni', 'ol', 'pe', 'qui', 'ros',
+              'sam', 'ter', 'ul', 'vin', 'wal', 'xa', 'yor', 'zel']
+
+_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+           'Oct', 'Nov', 'Dec']
+
+_NYRR_BASE = ('http://web2.nyrrc.org/cgi-bin/start.cgi/'
+              'aes-programs/results/startup.html')
+_NYRR_FORMS = 'http://web2.nyrrc.org/cgi-bin/htmlos.cgi/'
+
+# Name of the cookie without which the NYRR search forms refuse to answer.
+NYRR_COOKIE = 'AESTIVASESSION'
+
+
+def _days(start, stop):
+    """
+    Every day from start through stop.
+    """
+    day = start
+    while day <= stop:
+        yield day
+        day += dt.timedelta(days=1)
+
+
+def _year(year):
+    return _days(dt.date(year, 1, 1), dt.date(year, 12, 31))
+
+
+def _race_letter(number):
+    return chr(ord('A') + number % 26)
+
+
+class SyntheticSites:
+    """
+    Pages of the synthetic results sites.
+
+    Each route returns a tuple of the status, the response headers and the
+    body.
+
+    Attributes
+    ----------
+    members : list
+        (first, last) names planted among the finishers.
+    finishers : int
+        Finishers in each race.
+    races_per_day : int
+        Races listed for each day.
+    pages : int
+        Pages over which the Active results of a race are spread.
+    member_every : int
+        Every this many finishers, one is a club member.
+    gzip_every : int
+        Every this many Compuscore responses, one is served gzipped.  Zero
+        means none are.
+    skip_every : int
+        Every this many CoolRunning races, one is by an author whose results
+        are skipped.  Zero means none are.
+    seed : int
+        Seed for the synthetic names and the NYRR session tokens.
+    """
+    def __init__(self, members=(), finishers=200, races_per_day=1, pages=3,
+                 member_every=50, gzip_every=2, skip_every=0, seed=0):
+        self.members = list(members)
+        self.finishers = finishers
+        self.races_per_day = races_per_day
+        self.pages = pages
+        self.member_every = member_every
+        self.gzip_every = gzip_every
+        self.skip_every = skip_every
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.routes = [
+            ('www.coolrunning.com',
+             r'/results/(?P<yy>\d{2})/(?P<state>[a-z]{2})\.shtml',
+             self.coolrunning_state),
+            ('www.coolrunning.com',
+             r'/results/(?P<yy>\d{2})/(?P<state>[a-z]{2})/'
+             r'(?P<mon>[A-Z][a-z]{2})(?P<day>\d{1,2})_'
+             r'Race(?P<race>[A-Z])_set(?P<number>\d+)\.shtml',
+             self.coolrunning_race),
+            ('www.compuscore.com', r'/api/races/events',
+             self.compuscore_events),
+            ('www.compuscore.com', r'/api/races/event-detail',
+             self.compuscore_details),
+            ('www.compuscore.com', r'/cs(?P<year>\d{4})/(?P<id>\d+)\.htm',
+             self.compuscore_race),
+            ('www.bestrace.com', r'/(?P<year>\d{4})schedule\.html',
+             self.bestrace_schedule),
+            ('www.bestrace.com',
+             r'/results/\d{2}/(?P<date>\d{6})RACE(?P<race>[A-Z])\.HTM',
+             self.bestrace_race),
+            ('results.active.com', r'/search', self.active_search),
+            ('results.active.com', r'/events/(?P<id>\d+)',
+             self.active_event),
+            ('results.active.com', r'/events/(?P<id>\d+)/results',
+             self.active_results),
+            ('web2.nyrrc.org',
+             r'/cgi-bin/start\.cgi/aes-programs/results/resultsarchive\.htm',
+             self.nyrr_archive),
+            ('web2.nyrrc.org', r'/cgi-bin/htmlos\.cgi/year',
+             self.nyrr_year),
+            ('web2.nyrrc.org',
+             r'/cgi-bin/start\.cgi/aes-programs/results/startup\.html',
+             self.nyrr_event),
+            ('web2.nyrrc.org', r'/cgi-bin/htmlos\.cgi/search',
+             self.nyrr_search),
+        ]
+        self.routes = [(host, re.compile(pattern + '$'), route)
+                       for host, pattern, route in self.routes]
+
+    def dispatch(self, method, host, path, query, form, cookies):
+        """
+        Answer a request.
+
+        Parameters
+        ----------
+        method : str
+            'GET' or 'POST'.
+        host : str
+            Host name, such as 'www.coolrunning.com'.
+        path : str
+            Path of the URL.
+        query, form : dict
+            Query parameters and POST parameters.
+        cookies : dict
+            Cookies sent with the request.
+
+        Returns
+        -------
+        tuple
+            Status, headers and body.
+        """
+        for route_host, regex, route in self.routes:
+            if route_host != host:
+                continue
+            matchobj = regex.match(path)
+            if matchobj is not None:
+                request = {'method': method, 'query': query, 'form': form,
+                           'cookies': cookies, 'path': path}
+                return route(request, **matchobj.groupdict())
+        return self.page(404, '<html><body>Not Found</body></html>')
+
+    @staticmethod
+    def page(status, markup, headers=None):
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'text/html; charset=utf-8')
+        return status, headers, markup.encode('utf-8')
+
+    def maybe_gzip(self, key, body, content_type):
+        """
+        Gzip a Compuscore response if it is one of those to be gzipped.  The
+        body is gzipped as is, without a Content-Encoding header, as with a
+        .gz file.
+        """
+        headers = {'Content-Type': content_type}
+        if (self.gzip_every > 0
+                and zlib.crc32(key.encode()) % self.gzip_every == 0):
+            body = gzip.compress(body)
+            headers['Content-Type'] = 'application/x-gzip'
+        return 200, headers, body
+
+    def runners(self, key, count=None):
+        """
+        Names of the finishers in a race, with the members planted among
+        them.
+
+        Parameters
+        ----------
+        key : str
+            Identifies the race, so that it always gets the same finishers.
+        count : int
+            Number of finishers, by default the configured number.
+        """
+        if count is None:
+            count = self.finishers
+        rng = random.Random('{}:{}'.format(self.seed, key))
+        names = []
+        for j in range(count):
+            if (len(self.members) > 0 and self.member_every > 0
+                    and j % self.member_every == 0):
+                member = self.members[(j // self.member_every + len(key))
+                                      % len(self.members)]
+                names.append(tuple(member))
+                continue
+            first = ''.join(rng.choice(_SYLLABLES)
+                            for _ in range(rng.randint(1, 2)))
+            last = ''.join(rng.choice(_SYLLABLES)
+                           for _ in range(rng.randint(2, 3)))
+            names.append((first.title(), last.title()))
+        return names
+
+    # CoolRunning
+
+    def coolrunning_state(self, request, yy, state):
+        links = []
+        for day in _year(2000 + int(yy)):
+            for number in range(self.races_per_day):
+                href = '/results/{}/{}/{}{}_Race{}_set1.shtml'.format(
+                    yy, state, _MONTHS[day.month - 1], day.day,
+                    _race_letter(number))
+                links.append('<a href="{}">Race {}</a><br>'
+                             .format(href, _race_letter(number)))
+        return self.page(200, '<html><body>{}</body></html>'
+                         .format('\n'.join(links)))
+
+    def coolrunning_race(self, request, yy, state, mon, day, race, number):
+        key = request['path']
+        author = 'NSTC'
+        index = _MONTHS.index(mon) * 31 + int(day)
+        if self.skip_every > 0 and index % self.skip_every == 0:
+            author = 'colonial'
+
+        count = self.finishers if number == '1' else self.finishers // 10
+        lines = []
+        for place, (first, last) in enumerate(self.runners(key, count), 1):
+            name = '{} {}'.format(first, last)[:22]
+            lines.append('{:5d} {:4d} {:22s} 31 M   1/5    M3039   17:29  '
+                         '5:38'.format(place, place, name))
+
+        kind = 'Results' if number == '1' else 'Awards'
+        name = 'Race {} {}'.format(race, kind)
+        markup = (
+            '<html><head><title>Cool Running | {name}</title>\n'
+            '<meta name="Author" content="{author}">\n</head>\n'
+            '<body>\n<h1>{name}</h1>\n'
+            '<h2>Beverly, {state}, {mon} {day}, 20{yy}</h2>\n'
+            '[<a href="./{mon}{day}_Race{race}_set1.shtml">Results</a> ]\n'
+            '[<a href="./{mon}{day}_Race{race}_set2.shtml">Awards</a> ]\n'
+            '<pre>\n{name}\n\n'
+            'Place  Bib Name                   Ag S Div/Tot  Div     '
+            'Time  Pace\n'
+            '===== ==== ====================== == = ======== ===== '
+            '======= =====\n'
+            '{lines}\n</pre>\n</body></html>'
+        ).format(name=name, author=author, state=state.upper(), mon=mon,
+                 day=day, yy=yy, race=race, lines='\n'.join(lines))
+        return self.page(200, markup)
+
+    # Compuscore
+
+    def event_ids(self, start, stop):
+        for day in _days(start, stop):
+            for number in range(self.races_per_day):
+                yield int(day.strftime('%Y%m%d')) * 100 + number
+
+    def compuscore_events(self, request):
+        start, stop = request['query']['date_range'].split(',')
+        start = dt.datetime.strptime(start, '%Y-%m-%d').date()
+        stop = dt.datetime.strptime(stop, '%Y-%m-%d').date()
+        events = [{'id': event_id}
+                  for event_id in self.event_ids(start, stop)]
+        body = json.dumps({'events': events}).encode('utf-8')
+        return self.maybe_gzip(request['path'] + str(start), body,
+                               'application/json')
+
+    def compuscore_details(self, request):
+        ids = request['query']['ids'].split(',')
+        events = []
+        for event_id in ids:
+            year = event_id[:4]
+            name = 'RACE {} 5K RUN'.format(event_id)
+            result_file = {'webfile': {
+                'domain': 'www.compuscore.com',
+                'resource': '/cs{}/{}.htm'.format(year, event_id)}}
+            events.append({'id': int(event_id), 'name': name,
+                           'races': [{'name': name,
+                                      'result_files': [result_file]}]})
+        body = json.dumps({'events': events}).encode('utf-8')
+        return self.maybe_gzip(request['query']['ids'], body,
+                               'application/json')
+
+    def compuscore_race(self, request, year, id):
+        lines = []
+        runners = self.runners(request['path'])
+        for place, (first, last) in enumerate(runners, start=1):
+            lines.append('{:5d}.{:22s} North Plainfiel,NJ 53 M U  17:29'
+                         .format(place, '{} {}'.format(first, last)[:22]))
+        name = 'RACE {} 5K RUN'.format(id)
+        markup = ('<html><body><h2>{0}</h2><h3>{1}</h3>'
+                  '<strong><a name="overall">{0}</a></strong>'
+                  '<pre><strong>Overall</strong>\n'
+                  '<strong>Place Name                   City            '
+                  'Age S  Time</strong>\n'
+                  '<strong>===== ====================== =============== '
+                  '=== = ======</strong>\n'
+                  '{2}\n</pre></body></html>').format(name, id[:8],
+                                                      '\n'.join(lines))
+        return self.maybe_gzip(request['path'], markup.encode('utf-8'),
+                               'text/html; charset=utf-8')
+
+    # BestRace
+
+    def bestrace_schedule(self, request, year):
+        links = []
+        for day in _year(int(year)):
+            for number in range(self.races_per_day):
+                href = ('http://www.bestrace.com/results/{}/{}RACE{}.HTM'
+                        .format(year[2:], day.strftime('%y%m%d'),
+                                _race_letter(number)))
+                links.append('<a href="{}">Race {}</a><br>'
+                             .format(href, _race_letter(number)))
+        return self.page(200, '<html><body>{}</body></html>'
+                         .format('\n'.join(links)))
+
+    def bestrace_race(self, request, date, race):
+        lines = []
+        runners = self.runners(request['path'])
+        for place, (first, last) in enumerate(runners, start=1):
+            lines.append('{:5d} {:22s} 31 M Somerset NJ    17:29'
+                         .format(place, '{} {}'.format(first, last)[:22]))
+        markup = ('<html><head><title>  Race {0} 5K     - {1}   </title>'
+                  '</head><body><pre><a name="overall"></a></pre>'
+                  '<pre><b>Place Name                   Ag S City'
+                  '           Time\n'
+                  '===== ====================== == = ============== '
+                  '=====</b>\n{2}\n</pre></body></html>'
+                  ).format(race, date, '\n'.join(lines))
+        return self.page(200, markup)
+
+    # Active
+
+    def active_search(self, request):
+        query = request['query']
+        state = query.get('search[query]', 'NJ')
+        start = dt.datetime.strptime(query['search[start_date]'],
+                                     '%Y-%m-%d').date()
+        stop = dt.datetime.strptime(query['search[end_date]'],
+                                    '%Y-%m-%d').date()
+        rows = []
+        for event_id in self.event_ids(start, stop):
+            rows.append(
+                '<div class="result-row">'
+                '<div class="result-title">'
+                '<h5><a href="/events/{0}">Event {0} 5K</a></h5>'
+                '<div class="result-sub-location">Newark {1}</div></div>'
+                '<div class="result-extras"><div class="result-extra date">'
+                '<span class="title">Date:</span> {2}</div></div>'
+                '</div>'.format(event_id, state, str(event_id)[:8]))
+        return self.page(200, '<html><body>{}</body></html>'
+                         .format(''.join(rows)))
+
+    def active_event(self, request, id):
+        markup = ('<html><body><div class="event-nav">'
+                  '<a href="/events/{0}">Event Overview</a>'
+                  '<a href="/events/{0}/results">5K Results</a>'
+                  '</div></body></html>').format(id)
+        return self.page(200, markup)
+
+    def active_results(self, request, id):
+        page = int(request['query'].get('page', 1))
+        runners = self.runners('/events/{}/results'.format(id))
+        per_page = -(-len(runners) // self.pages)
+        start = (page - 1) * per_page
+
+        rows = ['<tr><th>Place</th><th>Bib</th><th>Name</th><th>Time</th>'
+                '</tr>']
+        for place, (first, last) in enumerate(
+                runners[start:start + per_page], start=start + 1):
+            rows.append('<tr><td>{}</td><td>{}</td><td>{} {}</td>'
+                        '<td>17:29</td></tr>'.format(place, place, first,
+                                                     last))
+
+        links = ['<a href="/events/{}/results?page={}">{}</a>'
+                 .format(id, number, number)
+                 for number in range(1, self.pages + 1)]
+        if page < self.pages:
+            links.append('<a rel="next" href="/events/{}/results?page={}">'
+                         'Next</a>'.format(id, page + 1))
+
+        markup = ('<html><body><div class="page-heading"><div class="headers">'
+                  '<h1>Event {0} 5K</h1><h3><time>{1}</time></h3>'
+                  '</div></div>'
+                  '<table class="participant-list">{2}</table>'
+                  '<div class="pagination">{3}</div>'
+                  '</body></html>').format(id, id[:8], ''.join(rows),
+                                           ''.join(links))
+        return self.page(200, markup)
+
+    # NYRR
+
+    def nyrr_archive(self, request):
+        with self._lock:
+            token = '{:08x}'.format(self._rng.getrandbits(32))
+        markup = ('<html><body>'
+                  '<form name="findRaces" action="{0}races"></form>'
+                  '<form name="findOtherRaces" action="{0}year"></form>'
+                  '</body></html>').format(_NYRR_FORMS)
+        headers = {'Set-Cookie': '{}={}; Path=/'.format(NYRR_COOKIE, token)}
+        return self.page(200, markup, headers)
+
+    def nyrr_forbidden(self, request):
+        if NYRR_COOKIE not in request['cookies']:
+            return self.page(403, '<html><body>Your session has expired.'
+                             '</body></html>')
+        return None
+
+    def nyrr_year(self, request):
+        refusal = self.nyrr_forbidden(request)
+        if refusal is not None:
+            return refusal
+        year = int(request['form'].get('NYRRYEAR', '2015'))
+        links = []
+        for event_id in self.event_ids(dt.date(year, 1, 1),
+                                       dt.date(year, 12, 31)):
+            date = dt.datetime.strptime(str(event_id)[:8], '%Y%m%d')
+            links.append('<a href="{}?result.id={}">Race {}</a> {}<br>'
+                         .format(_NYRR_BASE, event_id, event_id,
+                                 date.strftime('%m/%d/%y')))
+        return self.page(200, '<html><body>{}</body></html>'
+                         .format('\n'.join(links)))
+
+    def nyrr_event(self, request):
+        event_id = request['query'].get('result.id', '')
+        markup = ('<html><body><form action="{}search?result.id={}">'
+                  '</form></body></html>').format(_NYRR_FORMS, event_id)
+        return self.page(200, markup)
+
+    def nyrr_search(self, request):
+        refusal = self.nyrr_forbidden(request)
+        if refusal is not None:
+            return refusal
+        event_id = request['query'].get('result.id', '')
+        team = request['form'].get('team_code', '')
+
+        rows = ['<tr><td></td><td><a>Last Name</a></td>'
+                '<td><a>First Name</a></td><td>Team</td><td>Time</td></tr>']
+        runners = self.runners(event_id)
+        if self.member_every > 0:
+            runners = runners[::self.member_every]
+        for place, (first, last) in enumerate(runners, start=1):
+            rows.append('<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td>'
+                        '<td>20:00</td></tr>'.format(place, last, first,
+                                                     team))
+        markup = ('<html><body><table></table>'
+                  '<table><tr><td></td><td></td><td>'
+                  '<span>Race {0}</span><span>Team {1}</span>'
+                  '<span>5K, Central Park</span></td></tr></table>'
+                  '<table></table><table>{2}</table>'
+                  '</body></html>').format(event_id, team, ''.join(rows))
+        return self.page(200, markup)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    Passes each request on to the stand-in server.
+    """
+    # Keep connections alive, as the real sites do, so that connection
+    # pooling is exercised.
+    protocol_version = 'HTTP/1.1'
+    timeout = 30
+
+    def do_GET(self):
+        self.server.standin.respond(self, 'GET')
+
+    def do_POST(self):
+        self.server.standin.respond(self, 'POST')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hang up early on purpose, e.g. once the start of a page
+        # shows that it is not wanted.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandinServer:
+    """
+    Local HTTP server standing in for all of the results sites at once.
+
+    Attributes
+    ----------
+    sites : SyntheticSites
+        The pages served.
+    latency : float
+        Seconds to wait before answering each request.
+    error_rate : float
+        Fraction of requests answered with "503 Service Unavailable".
+    hits : collections.Counter
+        Number of requests answered, by host.
+    errors : int
+        Number of requests answered with an error on purpose.
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0,
+                 error_rate=0.0, seed=0, **kwargs):
+        """
+        Parameters
+        ----------
+        host : str
+            Address on which to listen.
+        port : int
+            Port on which to listen.  Zero picks a free port.
+        latency : float
+            Seconds to wait before answering each request.
+        error_rate : float
+            Fraction of requests answered with "503 Service Unavailable".
+        seed : int
+            Seed for the synthetic names and the injected errors.
+        kwargs : dict
+            Passed along to SyntheticSites, e.g. finishers or members.
+        """
+        self.sites = SyntheticSites(seed=seed, **kwargs)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hits = collections.Counter()
+        self.errors = 0
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.standin = self
+
+    @property
+    def url(self):
+        """
+        URL of the server, e.g. http://127.0.0.1:8000
+        """
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    @property
+    def proxies(self):
+        """
+        Proxy settings for a requests session, routing the results sites to
+        this server.
+
+        HTTPS is routed here too, although it is not served:  the server
+        does not tunnel CONNECT requests, so an HTTPS download fails rather
+        than quietly reaching the real site.
+        """
+        return {'http': self.url, 'https': self.url}
+
+    def start(self):
+        """
+        Serve requests on a background thread.
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and release the port.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, handler, method):
+        """
+        Answer the request being handled.
+        """
+        # Proxied requests carry the full URL, direct ones just the path.
+        parts = urllib.parse.urlsplit(handler.path)
+        host = parts.hostname or handler.headers.get('Host', '')
+        host = host.split(':')[0]
+
+        form = {}
+        if method == 'POST':
+            length = int(handler.headers.get('Content-Length', 0))
+            body = handler.rfile.read(length).decode('latin1')
+            form = dict(urllib.parse.parse_qsl(body, keep_blank_values=True))
+        query = dict(urllib.parse.parse_qsl(parts.query,
+                                            keep_blank_values=True))
+        cookies = {}
+        for cookie in handler.headers.get_all('Cookie', []):
+            for pair in cookie.split(';'):
+                name, _, value = pair.strip().partition('=')
+                cookies[name] = value
+
+        with self._lock:
+            self.hits[host] += 1
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        if failed:
+            status, headers, body = self.sites.page(
+                503, '<html><body>Service Unavailable</body></html>')
+        else:
+            status, headers, body = self.sites.dispatch(
+                method, host, parts.path, query, form, cookies)
+
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def main():
+    from .membership import read_members
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address on which to listen')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='port on which to listen, default is 8000')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds to wait before each answer')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with a 503')
+    parser.add_argument('--finishers', type=int, default=200,
+                        help='finishers in each race, default is 200')
+    parser.add_argument('--races-per-day', type=int, default=1,
+                        help='races listed for each day, default is 1')
+    parser.add_argument('--pages', type=int, default=3,
+                        help='pages of Active results per race, default 3')
+    parser.add_argument('--members',
+                        help='membership list whose members are planted '
+                             'among the finishers')
+    args = parser.parse_args()
+
+    members = []
+    if args.members is not None:
+        members = [(member.fname, member.lname)
+                   for member in read_members(args.members)]
+
+    server = StandinServer(host=args.host, port=args.port,
+                           latency=args.latency, error_rate=args.error_rate,
+                           finishers=args.finishers,
+                           races_per_day=args.races_per_day,
+                           pages=args.pages, members=members)
+    print('Serving on {0}; set HTTP_PROXY={0} and HTTPS_PROXY={0} to use it.'
+          .format(server.url))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
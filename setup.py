@@ -16,8 +16,9 @@ setup(
     description='Race results parsing',
     install_requires=['lxml>=2.3.4',
                       'requests>=2.2.0',
-                      'cssselect>=0.9.1',
-                      'pandas>=0.15.2'],
+                      'cssselect>=0.9.1'],
+    extras_require={'excel': ['pandas>=0.15.2'],
+                    'parquet': ['pyarrow']},
     classifiers=["Programming Language :: Python",
                  "Programming Language :: Python :: 3.4",
                  "Programming Language :: Python :: Implementation :: CPython",
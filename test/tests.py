@@ -1,16 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
 import contextlib  
 import csv
+import datetime
+import gzip
+import io
+import json
 import os  
 import pkg_resources as pkg
+import subprocess
 import sys
 import tempfile
+import time
 import unittest
 from unittest import mock
 
-from lxml import html
+from lxml import etree, html
+import requests
 
 from raceresults import command_line as cmd
- 
+from raceresults.active import ActiveRR
+from raceresults.archive import HttpArchive
+from raceresults.cache import HttpCache
+from raceresults.client import HttpClient
+from raceresults.common import RaceResults
+from raceresults import crrr, csrr
+from raceresults.crrr import CoolRunning
+from raceresults.csrr import CompuScore
+from raceresults import membership
+from raceresults.orchestrator import run_backends
+from raceresults.index import Race, RaceIndex, coolrunning_races
+from raceresults.ledger import Ledger
+from raceresults.matcher import MembershipMatcher, PlaceMatcher
+from raceresults.nyrr import NewYorkRR
+from raceresults.parallel import MatchPool, line_chunks
+from raceresults.records import JsonLinesRecordWriter
+from raceresults.standin import StandinServer
+
+_cache_home = None
+_environ = None
+
+
+def setUpModule():
+    # Compiled membership lists are cached under XDG_CACHE_HOME unless told
+    # otherwise.  Keep them out of the user's home directory.
+    global _cache_home, _environ
+    _cache_home = tempfile.TemporaryDirectory()
+    _environ = mock.patch.dict(os.environ,
+                               {'XDG_CACHE_HOME': _cache_home.name})
+    _environ.start()
+
+
+def tearDownModule():
+    _environ.stop()
+    _cache_home.cleanup()
+
+
+# The Massachusetts master list and the two result files of the one race on
+# it that the command line tests process.
+LANDMARK_PAGES = ['massachusetts_2015.html', 'Oct17_Landma_set1.shtml',
+                  'Oct17_Landma_set2.shtml']
+
+
+def data_responses(names):
+    """
+    Mock responses with the text of files in test/data, one for each name.
+    """
+    responses = []
+    for name in names:
+        response = mock.Mock()
+        fname = pkg.resource_filename(__name__, 'data/' + name)
+        with open(fname, 'rt') as fptr:
+            response.text = fptr.read()
+        responses.append(response)
+    return responses
+
+
+def make_response(content, status_code=200):
+    """
+    A response with the given body, as if it had already been downloaded.
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+def compuscore_page(name='HANGOVER 5K',
+                    line='    1.Jeff Pellis          Ocean,NJ 53 M U  17:29'):
+    """
+    A Compuscore result file with a single finisher, as bytes.
+    """
+    return ('<html><body><h2>{0}</h2><h3>Jan 1</h3>'
+            '<strong><a name="overall">{0}</a></strong>'
+            '<pre><strong>Overall</strong>\n<strong>Place Name</strong>\n'
+            '<strong>===== ====</strong>\n'
+            '{1}\n'
+            '</pre></body></html>').format(name, line).encode('utf-8')
+
+
 class TestCRRR(unittest.TestCase):
 
     def create_membership_file(self, filename, members):
@@ -22,7 +110,7 @@ class TestCRRR(unittest.TestCase):
                 fname, lname = member.split()
             writer.writerow({'FName': fname, 'LName': lname})
 
-    @mock.patch('raceresults.crrr.requests.get')
+    @mock.patch('raceresults.client.HttpClient.get')
     def test_crrr(self, mock_get):
         """
         Smoke test for csrr command line script
@@ -64,7 +152,182 @@ class TestCRRR(unittest.TestCase):
                 
                 self.assertTrue("Dan Chruniak" in output)
 
-    @mock.patch('raceresults.crrr.requests.get')
+    @mock.patch('raceresults.client.HttpClient.get')
+    def test_crrr_two_clubs(self, mock_get):
+        """
+        Each page is downloaded once and each club gets its own report.
+        """
+        mock_get.side_effect = data_responses(LANDMARK_PAGES)
+
+        with tempfile.TemporaryDirectory() as tdir:
+            with chdir(tdir):
+                self.create_membership_file('a.csv', ['Dan Chruniak'])
+                self.create_membership_file('b.csv', ['Kevin Richardson'])
+                args = ['', '-y', '2015', '-m', '10', '-d', '17', '17',
+                        '--ml', 'a.csv', '-o', 'a.html',
+                        '--ml', 'b.csv', '-o', 'b.html',
+                        '--verbose', 'warning']
+                with mock.patch('sys.argv', args):
+                    cmd.run_coolrunning()
+
+                with open('a.html') as fptr:
+                    output_a = fptr.read()
+                with open('b.html') as fptr:
+                    output_b = fptr.read()
+
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertIn('Dan Chruniak', output_a)
+        self.assertNotIn('Kevin Richardson', output_a)
+        self.assertIn('Kevin Richardson', output_b)
+        self.assertNotIn('Dan Chruniak', output_b)
+
+    @mock.patch('raceresults.client.HttpClient.get')
+    def test_crrr_processes(self, mock_get):
+        """
+        Matching pages on several processes gives the same report.
+        """
+        outputs = []
+        for extra in [[], ['--processes', '2', '--parallel-threshold', '0']]:
+            mock_get.side_effect = data_responses(LANDMARK_PAGES)
+
+            with tempfile.TemporaryDirectory() as tdir:
+                with chdir(tdir):
+                    self.create_membership_file('a.csv', ['Dan Chruniak'])
+                    self.create_membership_file('b.csv', ['Kevin Richardson'])
+                    args = ['', '-y', '2015', '-m', '10', '-d', '17', '17',
+                            '--ml', 'a.csv', '-o', 'a.html',
+                            '--ml', 'b.csv', '-o', 'b.html',
+                            '--verbose', 'warning'] + extra
+                    with mock.patch('sys.argv', args):
+                        cmd.run_coolrunning()
+
+                    with open('a.html') as fptr1, open('b.html') as fptr2:
+                        outputs.append((fptr1.read(), fptr2.read()))
+
+        self.assertIn('Dan Chruniak', outputs[0][0])
+        self.assertEqual(outputs[0], outputs[1])
+
+    @mock.patch('raceresults.client.HttpClient.get')
+    def test_crrr_incremental(self, mock_get):
+        """
+        A second incremental run skips the races processed by the first.
+        """
+        mock_get.side_effect = data_responses(LANDMARK_PAGES * 2)
+
+        with tempfile.TemporaryDirectory() as tdir:
+            with chdir(tdir):
+                self.create_membership_file('test.csv', ['Dan Chruniak'])
+                outputs = []
+                for output_file in ['first.html', 'second.html']:
+                    args = ['', '-y', '2015', '-m', '10', '-d', '17', '17',
+                            '--ml', 'test.csv', '-o', output_file,
+                            '--verbose', 'warning',
+                            '--incremental', '--ledger', 'ledger.sqlite']
+                    with mock.patch('sys.argv', args):
+                        cmd.run_coolrunning()
+                    with open(output_file) as fptr:
+                        outputs.append(fptr.read())
+
+        self.assertIn('Dan Chruniak', outputs[0])
+        self.assertNotIn('Dan Chruniak', outputs[1])
+
+    def test_crrr_skipped_author(self):
+        """
+        Races by skipped authors are remembered in the ledger, so that later
+        runs do not download them, nor their other result files.
+        """
+        url = 'http://www.coolrunning.com/results/15/ma/Oct17_Colon_set1.shtml'
+        head = b'<html><head><meta name="Author" content="colonial" />'
+
+        def peeked(url, peek=None):
+            # The client abandons the download once the peek says so.
+            self.assertTrue(peek(head))
+            return None
+
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            self.create_membership_file(memb_file, ['Dan Chruniak'])
+            ledger_file = os.path.join(tdir, 'ledger.sqlite')
+            for j in range(2):
+                o = CoolRunning(membership_list=memb_file,
+                                output_file=os.path.join(tdir, 'out.html'),
+                                membership_cache=os.path.join(tdir, 'cache'),
+                                ledger=Ledger(ledger_file), verbose='error')
+                with mock.patch.object(o.client, 'get',
+                                       side_effect=peeked) as mock_get:
+                    with ThreadPoolExecutor() as executor:
+                        self.assertEqual(o.fetch_race(executor, url),
+                                         (None, []))
+                        set2 = url.replace('set1', 'set2')
+                        self.assertEqual(o.fetch_race(executor, set2),
+                                         (None, []))
+                o.ledger.close()
+                self.assertEqual(mock_get.call_count, 1 - j)
+
+    def test_crrr_read_ahead(self):
+        """
+        Only a few races are downloaded ahead of the one being processed.
+        """
+        races = [Race(datetime.date(2015, 10, 17), 'ma',
+                      'http://www.coolrunning.com/results/15/ma/'
+                      'Oct17_Race{}_set1.shtml'.format(j), 1)
+                 for j in range(20)]
+        fetched = []
+        ahead = []
+
+        def fetch_race(executor, url, skip=()):
+            fetched.append(url)
+            response = mock.Mock()
+            response.text = url
+            return response, []
+
+        def compile_race_results(race):
+            ahead.append(len(fetched) - len(ahead) - 1)
+
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            self.create_membership_file(memb_file, ['Dan Chruniak'])
+            o = CoolRunning(membership_list=memb_file, verbose='error',
+                            output_file=os.path.join(tdir, 'results.html'),
+                            jobs=2)
+            with mock.patch.object(o, 'fetch_race', side_effect=fetch_race), \
+                    mock.patch.object(o, 'compile_race_results',
+                                      side_effect=compile_race_results):
+                o.process_races(races)
+
+        self.assertEqual(len(ahead), 20)
+        self.assertLessEqual(max(ahead), 4)
+
+    @mock.patch('raceresults.client.HttpClient.get')
+    def test_crrr_records(self, mock_get):
+        """
+        Results are also written out as structured records.
+        """
+        mock_get.side_effect = data_responses(LANDMARK_PAGES)
+
+        with tempfile.TemporaryDirectory() as tdir:
+            with chdir(tdir):
+                self.create_membership_file('test.csv', ['Dan Chruniak'])
+                args = ['', '-y', '2015', '-m', '10', '-d', '17', '17',
+                        '--ml', 'test.csv', '-o', 'results.html',
+                        '--verbose', 'warning', '--records', 'results.jsonl']
+                with mock.patch('sys.argv', args):
+                    cmd.run_coolrunning()
+
+                with open('results.jsonl') as fptr:
+                    records = [json.loads(line) for line in fptr]
+
+        record = records[0]
+        self.assertEqual(record['club'], 'test')
+        self.assertEqual(record['member'], 'Dan Chruniak')
+        self.assertEqual(record['race'], 'Landmark School 5K')
+        self.assertEqual(record['date'], '2015-10-17')
+        self.assertEqual(record['source'], 'CoolRunning')
+        self.assertEqual(record['place'], 1)
+        self.assertEqual(record['time'], '17:29')
+        self.assertTrue(record['url'].endswith('Oct17_Landma_set1.shtml'))
+
+    @mock.patch('raceresults.client.HttpClient.get')
     def test_crrr_marie_marie(self, mock_get):
         """
         Verify elimination of Marie Marie false positive
@@ -99,7 +362,7 @@ class TestCRRR(unittest.TestCase):
                 
                 self.assertTrue("Marie Marie" not in output)
 
-    @mock.patch('raceresults.crrr.requests.get')
+    @mock.patch('raceresults.client.HttpClient.get')
     def test_crrr_annette_richards(self, mock_get):
         """
         Verify elimination of Annette Richards false positive
@@ -147,7 +410,7 @@ class TestCSRR(unittest.TestCase):
                 fname, lname = member.split()
             writer.writerow({'FName': fname, 'LName': lname})
 
-    @mock.patch('raceresults.csrr.requests.get')
+    @mock.patch('raceresults.client.HttpClient.get')
     def test_csrr(self, mock_get):
         """
         Smoke test for csrr command line script
@@ -190,6 +453,794 @@ class TestCSRR(unittest.TestCase):
                 self.assertTrue("Jeff Pellis" in output)
         pass
 
+    def test_batched_event_details(self):
+        """
+        Event details are looked up several to a request, and the result files
+        are processed in event order.
+        """
+        def event(event_id, resource):
+            files = [] if resource is None else [
+                {'webfile': {'domain': 'www.compuscore.com',
+                             'resource': resource}}]
+            return {'id': event_id, 'name': 'Event {}'.format(event_id),
+                    'races': [{'name': '5K', 'result_files': files}]}
+
+        pages = {'/cs2015/a.htm': compuscore_page('RACE A'),
+                 '/cs2015/b.htm': compuscore_page('RACE B')}
+        requested = []
+
+        def get(url):
+            requested.append(url)
+            if 'api/races/events' in url:
+                body = {'events': [{'id': 1}, {'id': 2}, {'id': 3}]}
+            elif url.endswith('event-detail?ids=1,2,3'):
+                # Event 3 is left out of the batch.
+                body = {'events': [event(2, '/cs2015/b.htm'), event(1, None)]}
+            elif url.endswith('event-detail?ids=3'):
+                # Compuscore gzips some payloads without saying so.
+                body = {'events': [event(3, '/cs2015/a.htm')]}
+                return make_response(gzip.compress(json.dumps(body).encode()))
+            else:
+                return make_response(
+                    pages[url[len('http://www.compuscore.com'):]])
+            return make_response(json.dumps(body).encode('utf-8'))
+
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            self.create_membership_file(memb_file, ['Jeff Pellis'])
+            output_file = os.path.join(tdir, 'results.html')
+            o = CompuScore(membership_list=memb_file,
+                           output_file=output_file,
+                           membership_cache=os.path.join(tdir, 'cache'),
+                           start_date=datetime.date(2015, 1, 1),
+                           stop_date=datetime.date(2015, 1, 1),
+                           verbose='error', jobs=2)
+            with mock.patch.object(o.client, 'get', side_effect=get):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    o.run()
+
+            with open(output_file) as fptr:
+                output = fptr.read()
+
+        details = [url for url in requested if 'event-detail' in url]
+        self.assertEqual(len(details), 2)
+        self.assertLess(output.index('RACE B'), output.index('RACE A'))
+        self.assertEqual(output.count('Jeff Pellis'), 2)
+
+    def test_rejected_event_batch(self):
+        """
+        Events are looked up one at a time if a batched lookup fails.
+        """
+        def get(url):
+            event_ids = url.split('ids=')[1]
+            if ',' in event_ids:
+                return make_response(b'<html>Bad Request</html>', 400)
+            body = {'events': [{'id': int(event_ids), 'races': []}]}
+            return make_response(json.dumps(body).encode('utf-8'))
+
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            self.create_membership_file(memb_file, ['Jeff Pellis'])
+            o = CompuScore(membership_list=memb_file,
+                           output_file=os.path.join(tdir, 'results.html'),
+                           membership_cache=os.path.join(tdir, 'cache'),
+                           verbose='error')
+            with mock.patch.object(o.client, 'get', side_effect=get) as m:
+                details = o.get_event_details([1, 2, 3])
+
+        self.assertEqual([detail['id'] for detail in details], [1, 2, 3])
+        self.assertEqual(m.call_count, 4)
+
+    def test_read_ahead(self):
+        """
+        Only a few result files are downloaded ahead of the one being
+        processed, and they are processed in event order.
+        """
+        details = [{'name': 'Event {}'.format(j),
+                    'races': [{'name': '5K', 'result_files': [
+                        {'webfile': {'domain': 'www.compuscore.com',
+                                     'resource': '/cs2015/{}.htm'.format(j)}}
+                    ]}]}
+                   for j in range(20)]
+        fetched = []
+        ahead = []
+        processed = []
+
+        def get(url):
+            fetched.append(url)
+            return make_response(compuscore_page())
+
+        def compile_race_results(race):
+            ahead.append(len(fetched) - len(ahead) - 1)
+            processed.append(race.url)
+
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            self.create_membership_file(memb_file, ['Jeff Pellis'])
+            o = CompuScore(membership_list=memb_file,
+                           output_file=os.path.join(tdir, 'results.html'),
+                           membership_cache=os.path.join(tdir, 'cache'),
+                           start_date=datetime.date(2015, 1, 1),
+                           stop_date=datetime.date(2015, 1, 1),
+                           verbose='error', jobs=2)
+            with mock.patch.object(o, 'get_json_from_url',
+                                   return_value={'events': []}), \
+                    mock.patch.object(o, 'get_event_details',
+                                      return_value=details), \
+                    mock.patch.object(o.client, 'get', side_effect=get), \
+                    mock.patch.object(o, 'compile_race_results',
+                                      side_effect=compile_race_results):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    o.compile_web_results()
+
+        self.assertEqual(processed, ['http://www.compuscore.com/cs2015/{}.htm'
+                                     .format(j) for j in range(20)])
+        self.assertLessEqual(max(ahead), 4)
+
+    def test_concurrent_races(self):
+        """
+        Races processed from several threads at once keep to themselves.
+        """
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            self.create_membership_file(memb_file, ['Jeff Pellis'])
+            output_file = os.path.join(tdir, 'results.html')
+            o = CompuScore(membership_list=memb_file, output_file=output_file,
+                           membership_cache=os.path.join(tdir, 'cache'),
+                           verbose='error')
+            races = [o.new_race('http://www.compuscore.com/race{}.htm'
+                                .format(j),
+                                content=compuscore_page('RACE {}'.format(j)))
+                     for j in range(20)]
+            o.initialize_output_file()
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(o.compile_race_results, races))
+            o.finalize_output_file()
+
+            with open(output_file) as fptr:
+                doc = html.document_fromstring(fptr.read())
+
+        divs = doc.cssselect('div.race')
+        self.assertEqual(len(divs), 20)
+        for div in divs:
+            name = div.cssselect('h2')[0].text
+            href = div.cssselect('a')[0].get('href')
+            self.assertEqual(href, 'http://www.compuscore.com/race{}.htm'
+                             .format(name.split()[1]))
+
+    def test_gzipped_result_file(self):
+        """
+        Gzipped result files are recognized by their magic number and
+        decompressed a piece at a time, even if split mid-member.
+        """
+        page = compuscore_page()
+        content = gzip.compress(page[:100]) + gzip.compress(page[100:])
+
+        gzipped, chunks = csrr.read_body(content[j:j + 7]
+                                         for j in range(0, len(content), 7))
+        self.assertTrue(gzipped)
+        self.assertEqual(b''.join(chunks), page)
+
+        gzipped, chunks = csrr.read_body([page[:1], page[1:]])
+        self.assertFalse(gzipped)
+        self.assertEqual(b''.join(chunks), page)
+
+    def test_records(self):
+        """
+        Records are written for Compuscore lines with any amount of
+        whitespace between the first and last names.
+        """
+        page = compuscore_page(
+            line='   12.John   Smith         Ocean,NJ 53 M U  17:29')
+
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            self.create_membership_file(memb_file, ['John Smith'])
+            records_file = os.path.join(tdir, 'results.jsonl')
+            o = CompuScore(membership_list=memb_file,
+                           output_file=os.path.join(tdir, 'results.html'),
+                           membership_cache=os.path.join(tdir, 'cache'),
+                           records=JsonLinesRecordWriter(records_file),
+                           verbose='error')
+            o.initialize_output_file()
+            o.compile_race_results(o.new_race(
+                'http://www.compuscore.com/cs2015/hangover.htm',
+                content=page, date=datetime.date(2015, 1, 1)))
+            o.finalize_output_file()
+
+            with open(records_file) as fptr:
+                records = [json.loads(line) for line in fptr]
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['member'], 'John Smith')
+        self.assertEqual(records[0]['place'], 12)
+        self.assertEqual(records[0]['date'], '2015-01-01')
+
+
+class TestMatcher(unittest.TestCase):
+
+    def test_first_last(self):
+        """
+        First and last names are separated by a single whitespace character.
+        """
+        matcher = MembershipMatcher([('Ed', 'Ford'), ('Richard', 'Carlisle')])
+        line = '   12 ed ford        New Bedford, MA 23:23'
+        matchobj = matcher.search(line)
+        self.assertEqual(matchobj.member, 0)
+        self.assertEqual(line[matchobj.start:matchobj.end], 'ed ford')
+
+        line = '1637    ANNETTE RICHARD                   CARLISLE  MA'
+        self.assertIsNone(matcher.search(line))
+
+    def test_last_first(self):
+        """
+        Last and first names may be separated by any amount of whitespace.
+        """
+        matcher = MembershipMatcher([('Dan', 'Chruniak'), ('Ed', 'Ford')])
+        line = '    1 313 CHRUNIAK     DAN  31 M   1/5    M3039   17:29  5:38'
+        self.assertEqual(matcher.search(line).member, 0)
+        self.assertIsNone(matcher.search('Bedford Eddie 23:23'))
+
+    def test_place(self):
+        """
+        Compuscore lines lead off with the place.
+        """
+        matcher = PlaceMatcher([('Gene', 'Gugliotta')])
+        line = '  60.Gene Gugliotta       North Plainfiel,NJ 53 M U '
+        self.assertIsNotNone(matcher.search(line))
+        line = '  60 Gene Gugliotta       North Plainfiel,NJ 53 M U '
+        self.assertIsNone(matcher.search(line))
+
+    def test_matching_lines(self):
+        """
+        A whole document is scanned once, each matching line reported once.
+        """
+        matcher = MembershipMatcher([('Dan', 'Chruniak'), ('Ed', 'Ford')])
+        text = ('  1 Dan Chruniak  Ed Ford\n'
+                '  2 Dan\nChruniak\n'
+                '  3 Ford Ed\r')
+        lines = list(matcher.matching_lines(text))
+        self.assertEqual(lines, ['  1 Dan Chruniak  Ed Ford', '  3 Ford Ed\r'])
+
+    def test_tagged_lines(self):
+        """
+        A combined matcher reports which clubs are mentioned on each line.
+        """
+        club1 = MembershipMatcher([('Dan', 'Chruniak'), ('Ed', 'Ford')])
+        club2 = MembershipMatcher([('Ed', 'Ford'), ('Kevin', 'Richardson')])
+        matcher = MembershipMatcher.combine([club1, club2])
+        text = ('  1 Dan Chruniak\n'
+                '  2 Kevin Richardson\n'
+                '  3 Bob Smith\n'
+                '  4 Ed Ford\n')
+        lines = [(text[start:end], tags)
+                 for start, end, tags in matcher.tagged_lines(text)]
+        self.assertEqual(lines, [('  1 Dan Chruniak', {0}),
+                                 ('  2 Kevin Richardson', {1}),
+                                 ('  4 Ed Ford', {0, 1})])
+        self.assertEqual(matcher.tags('Kevin Richardson'), {1})
+
+    def test_line_chunks(self):
+        """
+        Chunks end on line boundaries and join back up into the text.
+        """
+        text = ''.join('{:5d} Runner Number {}\n'.format(j, j)
+                       for j in range(100)) + 'no newline'
+        chunks = line_chunks(text, 7)
+        self.assertEqual(''.join(chunks), text)
+        self.assertTrue(all(chunk.endswith('\n') for chunk in chunks[:-1]))
+        self.assertGreater(len(chunks), 4)
+        self.assertEqual(line_chunks('', 3), [])
+
+    def test_match_pool(self):
+        """
+        Matching on several processes finds the same lines in the same order
+        as matching on one.
+        """
+        club1 = MembershipMatcher([('Dan', 'Chruniak'), ('Ed', 'Ford')])
+        club2 = MembershipMatcher([('Ed', 'Ford'), ('Kevin', 'Richardson')])
+        matcher = MembershipMatcher.combine([club1, club2])
+        names = ['Dan Chruniak', 'Bob Smith', 'Kevin Richardson', 'Ed Ford',
+                 'Jane Doe']
+        text = ''.join('{:5d} {}\n'.format(j, names[j % len(names)])
+                       for j in range(2000))
+
+        pool = MatchPool(club1, processes=2)
+        try:
+            self.assertEqual(pool.matching_lines(text),
+                             list(club1.matching_lines(text)))
+        finally:
+            pool.close()
+
+        pool = MatchPool(matcher, processes=2)
+        try:
+            expected = [(text[start:end], tags)
+                        for start, end, tags in matcher.tagged_lines(text)]
+            self.assertEqual(pool.tagged_lines(text), expected)
+        finally:
+            pool.close()
+
+class TestRaceIndex(unittest.TestCase):
+
+    def test_coolrunning_master_list(self):
+        """
+        Races are parsed out of a state master list.
+        """
+        fname = pkg.resource_filename(__name__, 'data/massachusetts_2015.html')
+        with open(fname, 'rt') as fptr:
+            races = coolrunning_races(fptr.read())
+        url = ('http://www.coolrunning.com'
+               '/results/15/ma/Oct17_Landma_set1.shtml')
+        self.assertEqual(races, [Race(datetime.date(2015, 10, 17), 'ma', url,
+                                      1)])
+
+    def test_between(self):
+        """
+        Date ranges may span months and years.
+        """
+        markup = ''.join('<a href="/results/{}/ma/{}_Race_set1.shtml">'
+                         .format(year, day)
+                         for year, day in [('16', 'Jan2'), ('15', 'Dec31'),
+                                           ('15', 'Nov30'), ('15', 'Dec1'),
+                                           ('16', 'Feb2'), ('15', 'Dec31')])
+        index = RaceIndex(coolrunning_races(markup))
+        self.assertEqual(len(index), 5)
+
+        races = index.between(datetime.date(2015, 12, 1),
+                              datetime.datetime(2016, 1, 2, 12))
+        dates = [race.date for race in races]
+        self.assertEqual(dates, [datetime.date(2015, 12, 1),
+                                 datetime.date(2015, 12, 31),
+                                 datetime.date(2016, 1, 2)])
+
+class TestHttpCache(unittest.TestCase):
+
+    def make_response(self, status_code, content=b''):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = content
+        response.headers['ETag'] = '"abc"'
+        response.encoding = 'utf-8'
+        return response
+
+    def test_conditional_get(self):
+        """
+        Fresh pages come from the cache, stale ones are revalidated.
+        """
+        with tempfile.TemporaryDirectory() as tdir:
+            client = HttpClient(cache=HttpCache(tdir, ttl=3600))
+            url = 'http://www.coolrunning.com/results/15/ma.shtml'
+            with mock.patch.object(client.session, 'get') as mock_get:
+                mock_get.return_value = self.make_response(200, b'races')
+                self.assertEqual(client.get(url).text, 'races')
+                self.assertEqual(client.get(url).text, 'races')
+                self.assertEqual(mock_get.call_count, 1)
+
+                client.cache.ttl = 0
+                mock_get.return_value = self.make_response(304)
+                self.assertEqual(client.get(url).text, 'races')
+                self.assertEqual(mock_get.call_count, 2)
+                headers = mock_get.call_args[1]['headers']
+                self.assertEqual(headers['If-None-Match'], '"abc"')
+
+    def test_eviction(self):
+        """
+        The least recently used pages are evicted.
+        """
+        with tempfile.TemporaryDirectory() as tdir:
+            cache = HttpCache(tdir, max_size=10)
+            cache.store('http://a', self.make_response(200, b'123456'))
+            cache.store('http://b', self.make_response(200, b'123456'))
+            self.assertIsNone(cache.lookup('http://a'))
+            self.assertIsNotNone(cache.lookup('http://b'))
+
+    def test_evicted_during_lookup(self):
+        """
+        An entry evicted by another thread just after it was read is still
+        returned.
+        """
+        with tempfile.TemporaryDirectory() as tdir:
+            cache = HttpCache(tdir)
+            cache.store('http://a', self.make_response(200, b'123456'))
+            with mock.patch('os.utime', side_effect=FileNotFoundError):
+                entry = cache.lookup('http://a')
+        self.assertEqual(entry.content, b'123456')
+
+    def test_peek(self):
+        """
+        A download is abandoned as soon as a peek at the start of the body
+        says so, and is otherwise read in full.
+        """
+        def streamed(content):
+            response = requests.Response()
+            response.status_code = 200
+            response.raw = io.BytesIO(content)
+            return response
+
+        skip = (b'<html><head><meta name="Author" content="colonial" />'
+                b'</head><body>' + b'x' * 100000 + b'</body></html>')
+        keep = skip.replace(b'colonial', b'NSTC')
+
+        def peek(head):
+            author = crrr.head_author(head)
+            if author is None:
+                return None
+            return author == 'colonial'
+
+        client = HttpClient()
+        client.peek_chunk_size = 16
+        url = 'http://www.coolrunning.com/results/15/ma/Oct17_Landma.shtml'
+        with mock.patch.object(client.session, 'get') as mock_get:
+            mock_get.return_value = streamed(skip)
+            self.assertIsNone(client.get(url, peek=peek))
+            self.assertTrue(mock_get.call_args[1]['stream'])
+
+            mock_get.return_value = streamed(keep)
+            self.assertEqual(client.get(url, peek=peek).content, keep)
+
+    def test_record_replay(self):
+        """
+        Recorded traffic, POST bodies and cookies included, is replayed
+        without the network.
+        """
+        form = 'http://web2.nyrrc.org/cgi-bin/htmlos.cgi/search'
+        page = 'http://web2.nyrrc.org/cgi-bin/start.cgi/results.html'
+        params = {'team_code': 'RARI', 'items.display': '500'}
+
+        with tempfile.TemporaryDirectory() as tdir:
+            client = HttpClient(archive=HttpArchive(tdir))
+            with mock.patch.object(client.session, 'get') as mock_get, \
+                    mock.patch.object(client.session, 'post') as mock_post:
+                response = self.make_response(200, b'search form')
+                response.cookies.set('session', 'abc')
+                mock_get.return_value = response
+                mock_post.return_value = self.make_response(200, b'finishers')
+                client.get(page)
+                client.post(form, data=params)
+            client.close()
+
+            client = HttpClient(archive=HttpArchive(tdir, replay=True))
+            with mock.patch.object(client.session, 'get') as mock_get, \
+                    mock.patch.object(client.session, 'post') as mock_post:
+                self.assertEqual(client.get(page).text, 'search form')
+                self.assertEqual(client.session.cookies['session'], 'abc')
+
+                # The form fields may be given in any order.
+                data = dict(reversed(list(params.items())))
+                self.assertEqual(client.post(form, data=data).text,
+                                 'finishers')
+                self.assertEqual(mock_get.call_count, 0)
+                self.assertEqual(mock_post.call_count, 0)
+
+                with self.assertRaises(RuntimeError):
+                    client.post(form, data={'team_code': 'NYAC'})
+
+    @mock.patch('raceresults.client.HttpClient.get')
+    def test_record_closed(self, mock_get):
+        """
+        The archive being recorded is closed when a command line run ends.
+        """
+        mock_get.side_effect = data_responses(LANDMARK_PAGES)
+
+        with tempfile.TemporaryDirectory() as tdir:
+            with chdir(tdir):
+                with open('test.csv', 'w') as fptr:
+                    fptr.write('FName,LName\nDan,Chruniak\n')
+                args = ['', '-y', '2015', '-m', '10', '-d', '17', '17',
+                        '--ml', 'test.csv', '-o', 'results.html',
+                        '--verbose', 'warning', '--record', 'archive']
+                with mock.patch.object(HttpArchive, 'close', autospec=True,
+                                       side_effect=HttpArchive.close) as m, \
+                        mock.patch('sys.argv', args):
+                    cmd.run_coolrunning()
+
+        self.assertEqual(m.call_count, 1)
+        self.assertIsNone(m.call_args[0][0]._index)
+
+
+class TestOrchestrator(unittest.TestCase):
+
+    def test_run_backends(self):
+        """
+        Races from all backends end up in one report, in backend order.
+        """
+        class Backend(RaceResults):
+            def __init__(self, name, delay):
+                RaceResults.__init__(self)
+                self.name = name
+                self.delay = delay
+
+            def compile_web_results(self):
+                time.sleep(self.delay)
+                div = etree.Element('div')
+                div.set('class', 'race')
+                div.text = self.name
+                self.insert_race_results(div)
+
+        backends = [Backend('CompuScore', 0.2), Backend('BestRace', 0)]
+        with tempfile.TemporaryDirectory() as tdir:
+            output_file = os.path.join(tdir, 'results.html')
+            run_backends(backends, output_file)
+            doc = html.parse(output_file)
+        races = [div.text for div in doc.getroot().cssselect('div.race')]
+        self.assertEqual(races, ['CompuScore', 'BestRace'])
+
+class TestMembership(unittest.TestCase):
+
+    def test_cache(self):
+        """
+        A compiled membership list is reloaded from the cache.
+        """
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            with open(memb_file, 'w') as fptr:
+                fptr.write('FName,LName\nRichard,Carlisle\n')
+            cache_dir = os.path.join(tdir, 'cache')
+
+            first = membership.Membership.load(memb_file, cache_dir=cache_dir)
+            membership._loaded.clear()
+            with mock.patch('raceresults.membership.read_members') as m:
+                second = membership.Membership.load(memb_file,
+                                                    cache_dir=cache_dir)
+                self.assertEqual(m.call_count, 0)
+
+        self.assertEqual(first.digest, second.digest)
+        self.assertEqual(second.members, [('Richard', 'Carlisle')])
+        self.assertIsNotNone(second.matcher().search('CARLISLE  RICHARD'))
+
+    def test_stale_cache(self):
+        """
+        A cached membership list that cannot be unpickled is recompiled.
+        """
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            with open(memb_file, 'w') as fptr:
+                fptr.write('FName,LName\nRichard,Carlisle\n')
+            cache_dir = os.path.join(tdir, 'cache')
+
+            membership._loaded.clear()
+            first = membership.Membership.load(memb_file, cache_dir=cache_dir)
+            membership._loaded.clear()
+
+            # As if pickled by a release with a module since removed.
+            path = os.path.join(cache_dir, first.digest + '.pickle')
+            with open(path, 'wb') as fptr:
+                fptr.write(b'cno_such_module\nMembership\n.')
+
+            second = membership.Membership.load(memb_file,
+                                                cache_dir=cache_dir)
+
+        self.assertEqual(second.members, [('Richard', 'Carlisle')])
+
+
+class TestProfiler(unittest.TestCase):
+
+    @mock.patch('raceresults.client.HttpClient.get')
+    def test_profile_report(self, mock_get):
+        """
+        The timing report covers each phase and tags pages with the author.
+        """
+        mock_get.side_effect = data_responses(LANDMARK_PAGES)
+
+        with tempfile.TemporaryDirectory() as tdir:
+            with chdir(tdir):
+                with open('test.csv', 'w') as fptr:
+                    fptr.write('FName,LName\nDan,Chruniak\n')
+                args = ['', '-y', '2015', '-m', '10', '-d', '17', '17',
+                        '--ml', 'test.csv', '-o', 'results.html',
+                        '--verbose', 'warning',
+                        '--profile-report', 'profile.json']
+                with mock.patch('sys.argv', args):
+                    cmd.run_coolrunning()
+
+                with open('profile.json') as fptr:
+                    report = json.load(fptr)
+
+        for phase in ['parse', 'author', 'match', 'write']:
+            self.assertIn(phase, report['phases'])
+        self.assertEqual(report['phases']['parse']['count'], 2)
+        self.assertEqual(report['phases']['write']['count'], 2)
+        self.assertEqual(len(report['slowest_pages']), 2)
+        for page in report['slowest_pages']:
+            self.assertEqual(page['author'], 'NSTC')
+            self.assertTrue(page['url'].endswith('.shtml'))
+
+class TestActive(unittest.TestCase):
+
+    def test_paginated_results(self):
+        """
+        Numbered pages are downloaded ahead, pages beyond those linked to from
+        the lead-in page are still followed, and matches stay in page order.
+        """
+        def page(number, names, links):
+            rows = ''.join('<tr><td>{}</td><td>M</td><td>{}</td></tr>'
+                           .format(j, name) for j, name in enumerate(names))
+            anchors = ''.join('<a rel="{}" href="/events/1/results?page={}">'
+                              '{}</a>'.format(rel, n, text)
+                              for rel, n, text in links)
+            return ('<html><body><div class="page-heading"><div class="headers">'
+                    '<h1>Turkey Trot</h1><h3><time>11/27/2014</time></h3>'
+                    '</div></div><table class="participant-list">'
+                    '<tr><th>Place</th><th>Bib</th><th>Name</th></tr>{}'
+                    '</table><div class="pagination">{}</div></body></html>'
+                    ).format(rows, anchors).encode('utf-8')
+
+        pages = {
+            '/events/1/results': page(
+                1, ['Lauren Rome'],
+                [('', 2, '2'), ('', 3, '3'), ('next', 2, 'Next')]),
+            '/events/1/results?page=2': page(
+                2, ['Jane Doe'], [('next', 3, 'Next')]),
+            '/events/1/results?page=3': page(
+                3, ['Rome Lauren'], [('next', 4, 'Next')]),
+            '/events/1/results?page=4': page(4, ['Lauren Rome'], []),
+        }
+        requested = []
+
+        def get(url, **kwargs):
+            requested.append(url)
+            response = mock.Mock()
+            response.status_code = 200
+            response.content = pages[url[len('http://results.active.com'):]]
+            return response
+
+        with tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'test.csv')
+            with open(memb_file, 'w') as fptr:
+                fptr.write('FName,LName\nLauren,Rome\n')
+            output_file = os.path.join(tdir, 'results.html')
+            o = ActiveRR(date_range=[datetime.date(2014, 11, 27)] * 2,
+                         membership_list=memb_file, output_file=output_file,
+                         states=['NJ'], verbose='error', jobs=2)
+            with mock.patch.object(o.client, 'get', side_effect=get):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    o.initialize_output_file()
+                    o.process_results_page(
+                        'http://results.active.com/events/1/results')
+                    o.finalize_output_file()
+
+            with open(output_file) as fptr:
+                doc = html.document_fromstring(fptr.read())
+
+        self.assertEqual(len(requested), 4)
+        self.assertEqual(len(set(requested)), 4)
+        names = [tr[2].text_content() for tr in doc.cssselect('tr')]
+        self.assertEqual(names, ['Name', 'Lauren Rome', 'Rome Lauren',
+                                 'Lauren Rome'])
+
+class TestNYRR(unittest.TestCase):
+
+    def test_concurrent_searches(self):
+        """
+        Events are searched concurrently through a client of NYRR's own, and
+        written out in the order in which they were listed.
+        """
+        base = ('http://web2.nyrrc.org/cgi-bin/start.cgi/'
+                'aes-programs/results/startup.html')
+        archive = ('<html><body><form name="findOtherRaces" action="/year">'
+                   '</form></body></html>')
+        year = ('<html><body>'
+                '<a href="{0}?event=a">Race A</a> 12/13/14<br>'
+                '<a href="{0}?event=b">Race B</a> 12/13/14<br>'
+                '<a href="{0}?event=c">Race C</a> 12/20/14<br>'
+                '</body></html>').format(base)
+
+        def results(name):
+            return ('<html><body><table></table>'
+                    '<table><tr><td></td><td></td><td><span>{}</span>'
+                    '<span>Team RARI</span><span>5K</span></td></tr></table>'
+                    '<table></table>'
+                    '<table><tr><td></td><td><a>Last</a></td>'
+                    '<td><a>First</a></td><td>Time</td></tr>'
+                    '<tr><td>1</td><td>Redona</td><td>Leah</td>'
+                    '<td>20:00</td></tr></table>'
+                    '</body></html>').format(name)
+
+        def fetch(url, params=None):
+            if url.endswith('resultsarchive.htm'):
+                return archive
+            if url == '/year':
+                return year
+            if url.startswith(base):
+                event = url[-1]
+                # The first event is the slowest to answer.
+                if event == 'a':
+                    time.sleep(0.1)
+                return ('<html><body><form action="/search?{}"></form>'
+                        '</body></html>').format(event)
+            return results('Race ' + url[-1].upper())
+
+        with tempfile.TemporaryDirectory() as tdir:
+            output_file = os.path.join(tdir, 'results.html')
+            o = NewYorkRR(start_date=datetime.date(2014, 12, 13),
+                          stop_date=datetime.date(2014, 12, 13),
+                          team='RARI', output_file=output_file,
+                          verbose='error', jobs=2)
+            self.assertIsNot(o.nyrr_client.session, o.client.session)
+            with mock.patch.object(o.nyrr_client, 'fetch',
+                                   side_effect=fetch), \
+                    mock.patch.object(o.nyrr_client.session,
+                                      'close') as mock_close:
+                o.run()
+
+            with open(output_file) as fptr:
+                output = fptr.read()
+
+        self.assertLess(output.index('Race A'), output.index('Race B'))
+        self.assertNotIn('Race C', output)
+
+        # The searches' connections are released once the run is over.
+        self.assertEqual(mock_close.call_count, 1)
+
+
+class TestStandin(unittest.TestCase):
+
+    def test_backends_over_sockets(self):
+        """
+        Backends download from the stand-in server through real sockets,
+        gzipped Compuscore files and NYRR cookies included.
+        """
+        members = [('Jeff', 'Pellis'), ('Leah', 'Redona')]
+        start = datetime.date(2015, 1, 1)
+        stop = datetime.date(2015, 1, 3)
+        server = StandinServer(members=members, finishers=100,
+                               member_every=25, races_per_day=2)
+        with server, tempfile.TemporaryDirectory() as tdir:
+            memb_file = os.path.join(tdir, 'members.csv')
+            with open(memb_file, 'w') as fptr:
+                fptr.write('FName,LName\nJeff,Pellis\nLeah,Redona\n')
+
+            client = HttpClient()
+            client.session.proxies.update(server.proxies)
+
+            csrr_file = os.path.join(tdir, 'csrr.html')
+            CompuScore(start_date=start, stop_date=stop,
+                       membership_list=memb_file, output_file=csrr_file,
+                       membership_cache=os.path.join(tdir, 'cache'),
+                       verbose='error', http_client=client, jobs=4).run()
+
+            nyrr_file = os.path.join(tdir, 'nyrr.html')
+            NewYorkRR(start_date=start, stop_date=stop, team='RARI',
+                      output_file=nyrr_file, verbose='error',
+                      http_client=client, jobs=4).run()
+
+            # The search forms refuse a client without the cookie.
+            response = requests.post(
+                'http://web2.nyrrc.org/cgi-bin/htmlos.cgi/search',
+                data={'team_code': 'RARI'}, proxies=server.proxies)
+            self.assertEqual(response.status_code, 403)
+
+            # HTTPS is never passed on to the real sites.
+            with self.assertRaises(requests.exceptions.ProxyError):
+                client.session.get('https://www.coolrunning.com/')
+
+            with open(csrr_file) as fptr:
+                doc = html.document_fromstring(fptr.read())
+            self.assertEqual(len(doc.cssselect('div.race')), 6)
+            self.assertIn('Jeff Pellis', doc.text_content())
+
+            with open(nyrr_file) as fptr:
+                doc = html.document_fromstring(fptr.read())
+            self.assertEqual(len(doc.cssselect('div.race')), 6)
+
+        self.assertEqual(server.hits['www.compuscore.com'], 8)
+        self.assertGreater(server.hits['web2.nyrrc.org'], 12)
+
+
+class TestImports(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        """
+        Only the backends that a script uses get imported, and pandas is not
+        needed for CSV membership lists.
+        """
+        code = ('import sys, raceresults.command_line, raceresults.nyrr; '
+                'print(sorted(m for m in sys.modules '
+                'if m in ("pandas", "raceresults.crrr")))')
+        out = subprocess.check_output([sys.executable, '-c', code],
+                                      universal_newlines=True)
+        self.assertEqual(out.strip(), '[]')
+
 @contextlib.contextmanager  
 def chdir(dirname=None):  
     curdir = os.getcwd()  